@@ -1,6 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html # Untuk menampilkan gambar di admin
-from .models import UserProfile, Category, Shop, AppProduct, ProductImage, ProductReview, RentalOrder, OrderItem
+from .models import UserProfile, Category, Shop, AppProduct, ProductImage, ProductReview, RentalOrder, OrderItem, ReservationHold
 
 # Kustomisasi untuk UserProfile
 class UserProfileAdmin(admin.ModelAdmin):
@@ -55,7 +55,7 @@ class ProductImageInline(admin.TabularInline): # Atau admin.StackedInline untuk
 
 # Kustomisasi untuk AppProduct
 class AppProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'shop_name', 'category_name', 'price', 'available', 'rating', 'total_individual_rentals', 'image_count')
+    list_display = ('name', 'shop_name', 'category_name', 'price', 'available', 'stock_quantity', 'rating', 'total_individual_rentals', 'image_count')
     list_filter = ('available', 'category', 'shop', 'rating')
     search_fields = ('name', 'description', 'shop__name', 'category__name')
     list_select_related = ('shop', 'category') # Optimasi query
@@ -90,9 +90,13 @@ class ShopAdmin(admin.ModelAdmin):
         return obj.owner.username
     owner_username.short_description = 'Owner'
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_product_count()
+
     def product_count_in_shop(self, obj):
-        return obj.products.count() # Menggunakan related_name dari AppProduct.shop
+        return obj.product_count # Dari anotasi Shop.objects.with_product_count()
     product_count_in_shop.short_description = 'Products'
+    product_count_in_shop.admin_order_field = 'product_count'
 
     def image_preview_admin(self, obj):
         if obj.image:
@@ -149,6 +153,21 @@ class OrderItemInline(admin.TabularInline):
     item_total_display.short_description = 'Item Total'
 
 
+def order_transition_action(target, description):
+    # Action admin yang memindahkan order terpilih lewat RentalOrderQuerySet.transition()
+    def action(modeladmin, request, queryset):
+        changed = queryset.transition(target)
+        skipped = queryset.count() - len(changed)
+        modeladmin.message_user(request, f"{len(changed)} order(s) marked as {target}.", messages.SUCCESS)
+        if skipped:
+            modeladmin.message_user(
+                request, f"{skipped} order(s) skipped: their status does not allow moving to {target}.", messages.WARNING
+            )
+    action.__name__ = f'mark_{target}'
+    action.short_description = description
+    return action
+
+
 # Kustomisasi untuk RentalOrder
 class RentalOrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user_username', 'status', 'total_price_display', 'item_count', 'created_at_formatted')
@@ -159,8 +178,15 @@ class RentalOrderAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at' # Navigasi cepat berdasarkan tanggal
     readonly_fields = ('user', 'total_price', 'created_at', 'updated_at',
                        'first_name', 'last_name', 'email_at_checkout', 'phone_at_checkout',
-                       'billing_address', 'billing_city', 'billing_state', 'billing_zip', 'payment_reference')
+                       'billing_address', 'billing_city', 'billing_state', 'billing_zip', 'payment_reference',
+                       'status') # Status diubah lewat actions agar mengikuti RentalOrder.STATUS_TRANSITIONS
     ordering = ('-created_at',)
+    actions = [
+        order_transition_action('confirmed', 'Confirm selected orders'),
+        order_transition_action('active', 'Mark selected orders as active'),
+        order_transition_action('completed', 'Mark selected orders as completed'),
+        order_transition_action('cancelled', 'Cancel selected orders'),
+    ]
 
     def user_username(self, obj):
         return obj.user.username
@@ -182,6 +208,16 @@ class RentalOrderAdmin(admin.ModelAdmin):
 
 admin.site.register(RentalOrder, RentalOrderAdmin)
 
+
+# Hold stok checkout; hanya untuk dilihat, dibuat lewat API dan dihapus oleh expire_holds
+class ReservationHoldAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'product', 'quantity', 'start_date', 'end_date', 'expires_at')
+    list_select_related = ('user', 'product')
+    readonly_fields = ('user', 'product', 'quantity', 'start_date', 'end_date', 'expires_at', 'created_at')
+    ordering = ('expires_at',)
+
+admin.site.register(ReservationHold, ReservationHoldAdmin)
+
 # Model ProductImage dan OrderItem biasanya tidak perlu didaftarkan secara terpisah
 # jika sudah dikelola melalui Inlines di model induknya (AppProduct dan RentalOrder).
 # Jika Anda ingin bisa menambah/mengeditnya secara mandiri, Anda bisa mendaftarkannya:
@@ -0,0 +1,154 @@
+"""
+Rekalkulasi massal untuk kolom agregat yang biasanya dijaga secara inkremental oleh signal.
+
+Fungsi di sini menerima kelas model sebagai argumen dan dipakai oleh management command.
+Migrasi tidak mengimpor modul ini: backfill di migrasi menyimpan salinan logikanya sendiri.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.utils import timezone
+
+# Status order yang dihitung sebagai rental terjadi (rollup ShopDailyStat dan ShopRentalDayStat)
+COUNTED_STATUSES = frozenset({'confirmed', 'active', 'completed'})
+# Status order yang dihitung oleh Shop.total_rentals / AppProduct.total_individual_rentals (melar_api/counters.py)
+RENTAL_COUNTED_STATUSES = frozenset({'active', 'completed'})
+
+STAT_FIELDS = ('revenue', 'rentals', 'units', 'rental_days')
+
+# Kolom OrderItem yang dibutuhkan add_stat_item, dalam urutan argumennya
+STAT_ITEM_COLUMNS = (
+    'product__shop_id', 'product_id', 'order__created_at', 'quantity',
+    'price_per_day_at_rental', 'start_date', 'end_date',
+)
+# Kolom OrderItem yang dibutuhkan add_rental_day_item, dalam urutan argumennya
+RENTAL_DAY_ITEM_COLUMNS = ('product__shop_id', 'product_id', 'quantity', 'start_date', 'end_date')
+BATCH_SIZE = 1000
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def _aggregate_subquery(queryset, group_field, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_field).annotate(value=aggregate).values('value')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def recompute_ratings(product_model, shop_model, review_model):
+    """
+    Recomputes rating_sum, rating_count and rating of every product and shop from
+    ProductReview in one UPDATE per table. Returns (products_updated, shops_updated).
+    """
+    product_reviews = review_model.objects.filter(product=OuterRef('pk'))
+    product_sum = _aggregate_subquery(product_reviews, 'product', Sum('rating'))
+    product_count = _aggregate_subquery(product_reviews, 'product', Count('id'))
+    products_updated = product_model.objects.update(
+        rating_sum=product_sum,
+        rating_count=product_count,
+        rating=Cast(product_sum, FloatField()) / Greatest(product_count, 1),
+    )
+
+    shop_reviews = review_model.objects.filter(product__shop=OuterRef('pk'))
+    shop_sum = _aggregate_subquery(shop_reviews, 'product__shop', Sum('rating'))
+    shop_count = _aggregate_subquery(shop_reviews, 'product__shop', Count('id'))
+    shops_updated = shop_model.objects.update(
+        rating_sum=shop_sum,
+        rating_count=shop_count,
+        rating=Cast(shop_sum, FloatField()) / Greatest(shop_count, 1),
+    )
+    return products_updated, shops_updated
+
+
+def recompute_rental_counters(product_model, shop_model, order_item_model):
+    """
+    Recomputes total_individual_rentals of every product and total_rentals of every shop
+    (one per OrderItem of an order in RENTAL_COUNTED_STATUSES) in one UPDATE per table.
+    Returns (products_updated, shops_updated).
+    """
+    counted = order_item_model.objects.filter(order__status__in=RENTAL_COUNTED_STATUSES)
+    products_updated = product_model.objects.update(total_individual_rentals=_aggregate_subquery(
+        counted.filter(product=OuterRef('pk')), 'product', Count('id')
+    ))
+    shops_updated = shop_model.objects.update(total_rentals=_aggregate_subquery(
+        counted.filter(product__shop=OuterRef('pk')), 'product__shop', Count('id')
+    ))
+    return products_updated, shops_updated
+
+
+def empty_stat_row():
+    return {'revenue': Decimal('0'), 'rentals': 0, 'units': 0, 'rental_days': 0}
+
+
+def add_stat_item(totals, shop_id, product_id, created_at, quantity, price_per_day, start_date, end_date):
+    """
+    Adds one OrderItem (given as STAT_ITEM_COLUMNS) to `totals`, keyed by (shop, product, order day).
+    """
+    days = (end_date - start_date).days + 1
+    row = totals[(shop_id, product_id, timezone.localdate(created_at))]
+    row['revenue'] += price_per_day * days * quantity
+    row['rentals'] += 1
+    row['units'] += quantity
+    row['rental_days'] += days * quantity
+
+
+def rebuild_daily_stats(order_item_model, stat_model, shop_ids=None):
+    """
+    Recomputes the ShopDailyStat rollup from scratch (all shops, or only `shop_ids`).
+    Returns the number of rollup rows written.
+    """
+    items = order_item_model.objects.filter(order__status__in=COUNTED_STATUSES)
+    stats = stat_model.objects.all()
+    if shop_ids is not None:
+        items = items.filter(product__shop_id__in=shop_ids)
+        stats = stats.filter(shop_id__in=shop_ids)
+    totals = defaultdict(empty_stat_row)
+    for row in items.order_by().values_list(*STAT_ITEM_COLUMNS).iterator(chunk_size=BATCH_SIZE):
+        add_stat_item(totals, *row)
+
+    with transaction.atomic():
+        stats.delete()
+        stat_model.objects.bulk_create([
+            stat_model(shop_id=shop_id, product_id=product_id, day=day, **values)
+            for (shop_id, product_id, day), values in totals.items()
+        ], batch_size=BATCH_SIZE)
+    return len(totals)
+
+
+def add_rental_day_item(totals, shop_id, product_id, quantity, start_date, end_date):
+    """
+    Adds one OrderItem (given as RENTAL_DAY_ITEM_COLUMNS) to `totals`, keyed by (shop, product, rental day).
+    """
+    day = start_date
+    while day <= end_date:
+        totals[(shop_id, product_id, day)] += quantity
+        day += ONE_DAY
+
+
+def rebuild_rental_day_stats(order_item_model, stat_model, shop_ids=None):
+    """
+    Recomputes the ShopRentalDayStat rollup from scratch (all shops, or only `shop_ids`).
+    Returns the number of rollup rows written.
+    """
+    items = order_item_model.objects.filter(order__status__in=COUNTED_STATUSES)
+    stats = stat_model.objects.all()
+    if shop_ids is not None:
+        items = items.filter(product__shop_id__in=shop_ids)
+        stats = stats.filter(shop_id__in=shop_ids)
+    totals = defaultdict(int)
+    for row in items.order_by().values_list(*RENTAL_DAY_ITEM_COLUMNS).iterator(chunk_size=BATCH_SIZE):
+        add_rental_day_item(totals, *row)
+
+    with transaction.atomic():
+        stats.delete()
+        stat_model.objects.bulk_create([
+            stat_model(shop_id=shop_id, product_id=product_id, day=day, units=units)
+            for (shop_id, product_id, day), units in totals.items()
+        ], batch_size=BATCH_SIZE)
+    return len(totals)
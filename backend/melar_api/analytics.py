@@ -0,0 +1,152 @@
+"""
+Rollup analitik harian untuk dashboard toko.
+
+ShopDailyStat menyimpan satu baris per (toko, produk, hari order dibuat) berisi pendapatan,
+jumlah rental, unit dan hari sewa dari order berstatus COUNTED_STATUSES; ShopRentalDayStat
+menyimpan unit yang tersewa per (toko, produk, hari sewa) untuk utilisasi. Baris diperbarui
+secara inkremental saat status order berubah (signal order_status_changed), sehingga
+endpoint statistik hanya membaca rollup dan tidak pernah mengagregasi OrderItem.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, Least
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .aggregates import (
+    COUNTED_STATUSES, RENTAL_DAY_ITEM_COLUMNS, STAT_FIELDS, STAT_ITEM_COLUMNS, add_rental_day_item,
+    add_stat_item, empty_stat_row,
+)
+from .availability import capacity
+from .models import AppProduct, OrderItem, RentalOrder, ShopDailyStat, ShopRentalDayStat
+from .signals import order_status_changed
+
+
+def order_deltas(order_id):
+    """
+    Rollup contribution of one order: {(shop_id, product_id, day): {field: value}}.
+    """
+    totals = defaultdict(empty_stat_row)
+    for row in OrderItem.objects.filter(order_id=order_id).values_list(*STAT_ITEM_COLUMNS):
+        add_stat_item(totals, *row)
+    return totals
+
+
+def order_rental_day_deltas(order_id):
+    """
+    Booked units of one order per rental day: {(shop_id, product_id, day): {'units': value}}.
+    """
+    totals = defaultdict(int)
+    for row in OrderItem.objects.filter(order_id=order_id).values_list(*RENTAL_DAY_ITEM_COLUMNS):
+        add_rental_day_item(totals, *row)
+    return {key: {'units': units} for key, units in totals.items()}
+
+
+def apply_deltas(deltas, sign, model=ShopDailyStat, fields=STAT_FIELDS):
+    """
+    Adds (sign=1) or subtracts (sign=-1) `deltas` from the rollup rows of `model` with F() updates,
+    creating missing rows.
+    """
+    with transaction.atomic():
+        for (shop_id, product_id, day), values in deltas.items():
+            key = {'shop_id': shop_id, 'product_id': product_id, 'day': day}
+            updates = {field: F(field) + sign * values[field] for field in fields}
+            if model.objects.filter(**key).update(**updates) or sign < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    model.objects.create(**key, **values)
+            except IntegrityError:
+                # Baris baru saja dibuat oleh transaksi lain; tambahkan lewat UPDATE
+                model.objects.filter(**key).update(**updates)
+
+
+def apply_order(order_id, sign):
+    apply_deltas(order_deltas(order_id), sign)
+    apply_deltas(order_rental_day_deltas(order_id), sign, model=ShopRentalDayStat, fields=('units',))
+
+
+@receiver(order_status_changed)
+def update_rollup_on_status_change(sender, order_id, previous_status, status, **kwargs):
+    was_counted = previous_status in COUNTED_STATUSES
+    is_counted = status in COUNTED_STATUSES
+    if was_counted != is_counted:
+        # Setelah commit: item order baru sudah tersimpan dan rollback tidak meninggalkan delta
+        sign = 1 if is_counted else -1
+        transaction.on_commit(lambda: apply_order(order_id, sign))
+
+
+@receiver(pre_delete, sender=RentalOrder)
+def update_rollup_on_order_delete(sender, instance, **kwargs):
+    # Item masih ada di pre_delete (belum ikut terhapus oleh cascade)
+    if instance.status in COUNTED_STATUSES:
+        apply_order(instance.pk, -1)
+
+
+def shop_stats(shop, start_date, end_date):
+    """
+    Dashboard figures of `shop` for orders placed between start_date and end_date (inclusive).
+    Reads only the rollup, so the cost depends on the date range, not on the order history.
+
+    Utilisation is the unit-days rented within the range (whenever the order was placed) divided
+    by the unit-days available (stock x days; untracked stock counts as one unit), between 0 and 1.
+    """
+    days = (end_date - start_date).days + 1
+    stats = ShopDailyStat.objects.filter(shop=shop, day__gte=start_date, day__lte=end_date).order_by()
+    sums = {field: Sum(field) for field in STAT_FIELDS}
+
+    per_day = {row['day']: row for row in stats.values('day').annotate(**sums)}
+    revenue_per_day = []
+    for offset in range(days):
+        day = start_date + datetime.timedelta(days=offset)
+        row = per_day.get(day, {})
+        revenue_per_day.append({
+            'day': day, 'revenue': row.get('revenue') or Decimal('0'), 'rentals': row.get('rentals') or 0,
+        })
+
+    per_product = {row['product_id']: row for row in stats.values('product_id').annotate(**sums)}
+    # Unit tersewa per hari dibatasi kapasitas produk: booking lama tanpa cek stok tidak membuat utilisasi > 1
+    rented = dict(
+        ShopRentalDayStat.objects.filter(shop=shop, day__gte=start_date, day__lte=end_date).order_by()
+        .values('product_id')
+        .annotate(unit_days=Sum(Least('units', Coalesce('product__stock_quantity', Value(1)))))
+        .values_list('product_id', 'unit_days')
+    )
+    products = []
+    available_unit_days = 0
+    product_rows = AppProduct.objects.filter(shop=shop).order_by('name', 'id').values_list('id', 'name', 'stock_quantity')
+    for product_id, name, stock_quantity in product_rows:
+        row = per_product.get(product_id, {})
+        available = capacity(stock_quantity) * days
+        available_unit_days += available
+        rented_unit_days = rented.get(product_id) or 0
+        products.append({
+            'product_id': product_id,
+            'name': name,
+            'revenue': row.get('revenue') or Decimal('0'),
+            'rentals': row.get('rentals') or 0,
+            'units': row.get('units') or 0,
+            'rental_days': row.get('rental_days') or 0,
+            'rented_unit_days': rented_unit_days,
+            'utilisation': round(rented_unit_days / available, 4) if available else 0,
+        })
+
+    total = {field: sum(item[field] for item in products) for field in STAT_FIELDS}
+    rented_unit_days = sum(item['rented_unit_days'] for item in products)
+    return {
+        'shop_id': shop.pk,
+        'from': start_date,
+        'to': end_date,
+        'totals': {
+            **total,
+            'average_rental_days': round(total['rental_days'] / total['units'], 2) if total['units'] else 0,
+            'rented_unit_days': rented_unit_days,
+            'utilisation': round(rented_unit_days / available_unit_days, 4) if available_unit_days else 0,
+        },
+        'revenue_per_day': revenue_per_day,
+        'products': products,
+    }
@@ -1,6 +1,31 @@
 # backend/melar_api/apps.py
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using='default', **kwargs):
+    from .search import ensure_product_fts
+    ensure_product_fts(using)
+
 
 class MelarApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'melar_api'
\ No newline at end of file
+    name = 'melar_api'
+
+    def ready(self):
+        # Trigger FTS bisa hilang saat tabel produk dibangun ulang oleh migrasi, jadi pasang lagi setelah migrate
+        post_migrate.connect(ensure_search_index, sender=self)
+        # Mendaftarkan signal invalidasi cache respons katalog
+        from . import cache  # noqa: F401
+        # Mendaftarkan signal invalidasi cache token (logout, user dinonaktifkan, token dihapus)
+        from . import authentication  # noqa: F401
+        # Mendaftarkan signal pembuatan thumbnail setelah upload gambar
+        from . import thumbnails  # noqa: F401
+        # Mendaftarkan signal rollup statistik harian toko
+        from . import analytics  # noqa: F401
+        # Mendaftarkan PRAGMA SQLite per koneksi (profil produksi)
+        from . import sqlite  # noqa: F401
+        # Mendaftarkan counter order baru untuk /metrics
+        from . import metrics  # noqa: F401
+        # Mendaftarkan counter rental produk/toko (total_individual_rentals, total_rentals)
+        from . import counters  # noqa: F401
@@ -0,0 +1,120 @@
+"""
+Versi async dari jalur baca katalog yang paling sering dipanggil, di bawah /api/v1/async/.
+
+Dijalankan di bawah ASGI (melar_project/asgi.py), request yang menunggu database tidak
+menahan thread worker. Setiap view memakai ulang viewset sinkron yang sama (queryset, filter,
+`?fields=`/`?expand=`, pagination, serializer), jadi JSON-nya identik dengan endpoint biasa.
+Hanya pengambilan data yang dijalankan secara async (`aget`, `async for`,
+CreatedAtCursorPagination.apaginate_queryset).
+
+Endpoint ini publik dan selalu dilayani sebagai anonim (tanpa autentikasi), sehingga respons
+juga memakai cache respons katalog (melar_api/cache.py).
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from .cache import CachedResponseMixin, _record, cache_settings, cached_response_key, get_cache, get_versions
+from .db_routers import replica_reads
+from .views import AppProductViewSet, CategoryViewSet, ProductReviewViewSet, ShopViewSet
+
+
+class AsyncCatalogView(View):
+    """
+    Serves the `list` or `retrieve` action of `viewset_class` with the async ORM.
+    """
+    viewset_class = None
+    basename = None
+    action = 'list'
+
+    async def get(self, request, *args, **kwargs):
+        # Tanpa authenticator: request.user langsung AnonymousUser, tidak ada query token
+        drf_request = Request(request, authenticators=())
+        view = self.viewset_class(
+            request=drf_request, args=args, kwargs=kwargs, action=self.action, basename=self.basename,
+            format_kwarg=None,
+        )
+        view.headers = {}
+        try:
+            # Respons yang masuk cache dibaca dari primary (lihat melar_api/db_routers.py)
+            with replica_reads(not self.is_cacheable(view)):
+                response = await self.cached_response(view)
+        except Exception as exc:
+            response = exception_handler(exc, {'view': view, 'args': args, 'kwargs': kwargs, 'request': drf_request})
+            if response is None:
+                raise
+        response.accepted_renderer = JSONRenderer()
+        response.accepted_media_type = JSONRenderer.media_type
+        response.renderer_context = {'view': view, 'request': drf_request, 'response': response}
+        return response.render()
+
+    def is_cacheable(self, view):
+        return isinstance(view, CachedResponseMixin) and view.is_cacheable_request(view.request)
+
+    async def cached_response(self, view):
+        if not self.is_cacheable(view):
+            return Response(await self.get_data(view))
+        cache = get_cache()
+        versions = await sync_to_async(get_versions)(view.cache_dependencies)
+        key = cached_response_key(view, view.request, versions)
+        data = await cache.aget(key)
+        if data is not None:
+            _record('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        _record('misses')
+        data = await self.get_data(view)
+        await cache.aset(key, data, timeout=cache_settings()['TIMEOUT'])
+        return Response(data)
+
+    async def get_data(self, view):
+        queryset = view.filter_queryset(view.get_queryset())
+        if self.action == 'retrieve':
+            try:
+                instance = await queryset.aget(pk=view.kwargs['pk'])
+            except queryset.model.DoesNotExist:
+                raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+            view.check_object_permissions(view.request, instance)
+            return view.get_serializer(instance).data
+
+        paginator = view.paginator
+        if paginator is None:
+            return view.get_serializer([instance async for instance in queryset], many=True).data
+        page = await paginator.apaginate_queryset(queryset, view.request, view=view)
+        return paginator.get_paginated_response(view.get_serializer(page, many=True).data).data
+
+
+class AsyncProductListView(AsyncCatalogView):
+    viewset_class = AppProductViewSet
+    basename = 'appproduct'
+
+
+class AsyncProductDetailView(AsyncProductListView):
+    action = 'retrieve'
+
+
+class AsyncShopListView(AsyncCatalogView):
+    viewset_class = ShopViewSet
+    basename = 'shop'
+
+
+class AsyncShopDetailView(AsyncShopListView):
+    action = 'retrieve'
+
+
+class AsyncCategoryListView(AsyncCatalogView):
+    viewset_class = CategoryViewSet
+    basename = 'category'
+
+
+class AsyncReviewListView(AsyncCatalogView):
+    """
+    Reviews, optionally of one product (`?product_id=`), as in /api/v1/reviews/.
+    """
+    viewset_class = ProductReviewViewSet
+    basename = 'productreview'
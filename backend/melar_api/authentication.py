@@ -0,0 +1,130 @@
+"""
+Token authentication dengan cache.
+
+TokenAuthentication bawaan DRF menjalankan satu query (token JOIN user) di setiap request.
+CachedTokenAuthentication menyimpan user hasil lookup tersebut di cache Django selama TTL tertentu,
+sehingga request dengan token yang sama tidak menjalankan query sama sekali. User dimuat dengan
+`defer('password')`, jadi hash password tidak ikut masuk cache (dan save() pada user itu tidak
+menimpanya). Entri cache dihapus ketika token dihapus (mis. logout dj_rest_auth) atau user
+disimpan/dihapus (mis. dinonaktifkan, password/izin berubah).
+
+Invalidasi hanya berlaku untuk semua worker bila cache-nya dipakai bersama. Dengan cache
+local-memory (tanpa MELAR_SINGLE_PROCESS) cache ini tidak dipakai dan setiap request membaca token
+dari database seperti TokenAuthentication biasa.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import is_process_local
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TTL': 300,
+}
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def auth_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'MELAR_AUTH_CACHE', {})}
+
+
+def get_cache():
+    """
+    The token cache, or None when it would be local to this process (see module docstring).
+    """
+    cache = caches[auth_cache_settings()['ALIAS']]
+    if is_process_local(cache) and not getattr(settings, 'MELAR_SINGLE_PROCESS', False):
+        return None
+    return cache
+
+
+def auth_cache_stats():
+    """
+    Returns hit/miss counters of this process together with the hit rate.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def token_cache_key(key):
+    # Jangan pernah menyimpan token mentah sebagai nama kunci cache
+    return 'melar:auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def user_cache_key(user_id):
+    return f'melar:auth:user:{user_id}'
+
+
+def invalidate_token(key):
+    cache = get_cache()
+    if cache is not None:
+        cache.delete(token_cache_key(key))
+
+
+def invalidate_user(user_id):
+    cache = get_cache()
+    if cache is None:
+        return
+    user_key = user_cache_key(user_id)
+    token_key = cache.get(user_key)
+    if token_key:
+        cache.delete_many([token_key, user_key])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication that resolves tokens from the cache.
+    """
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        user = cache.get(cache_key)
+        if user is not None:
+            _record('hits')
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            # Token tidak dimuat dari database; cukup key-nya (primary key) untuk request.auth
+            return (user, self.get_model()(key=key, user_id=user.pk))
+
+        _record('misses')
+        token = self.get_model().objects.select_related('user').defer('user__password').filter(key=key).first()
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        ttl = auth_cache_settings()['TTL']
+        cache.set_many({cache_key: token.user, user_cache_key(token.user_id): cache_key}, timeout=ttl)
+        return (token.user, token)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_changed_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
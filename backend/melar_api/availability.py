@@ -0,0 +1,157 @@
+"""
+Ketersediaan (kalender) rental per produk.
+
+Sebuah produk punya `stock_quantity` unit; pada satu hari, jumlah unit dari OrderItem yang
+tidak dibatalkan ditambah ReservationHold yang masih aktif tidak boleh melebihinya. Produk
+tanpa `stock_quantity` (stok tidak dilacak) diperlakukan seperti satu unit yang dipesan utuh:
+setiap booking memakai seluruh kapasitasnya, berapa pun quantity-nya.
+Semua query di sini berjalan di atas index (product, start_date, end_date) kedua tabel itu,
+sehingga hanya baris yang beririsan dengan rentang tanggal yang diminta yang dibaca.
+"""
+import datetime
+from collections import defaultdict
+from functools import reduce
+import operator
+
+from django.db.models import Q
+
+from .models import OrderItem, ReservationHold
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def overlapping_items(product_ids, start_date, end_date):
+    """
+    Returns non-cancelled OrderItems of the given products whose rental period
+    overlaps [start_date, end_date] (both inclusive).
+    """
+    return (
+        OrderItem.objects
+        .filter(product_id__in=product_ids, start_date__lte=end_date, end_date__gte=start_date)
+        .exclude(order__status='cancelled')
+    )
+
+
+def merge_ranges(ranges):
+    """
+    Merges overlapping or back-to-back (start, end) date ranges into a sorted list.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + ONE_DAY:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def free_ranges(booked, start_date, end_date):
+    """
+    Returns the gaps between merged `booked` ranges inside [start_date, end_date].
+    """
+    free = []
+    cursor = start_date
+    for booked_start, booked_end in booked:
+        if booked_start > cursor:
+            free.append((cursor, booked_start - ONE_DAY))
+        cursor = max(cursor, booked_end + ONE_DAY)
+    if cursor <= end_date:
+        free.append((cursor, end_date))
+    return free
+
+
+def active_holds(product_ids, start_date, end_date):
+    """
+    Returns unexpired ReservationHolds of the given products overlapping [start_date, end_date].
+    """
+    return ReservationHold.objects.active().filter(
+        product_id__in=product_ids, start_date__lte=end_date, end_date__gte=start_date
+    )
+
+
+def booked_units(quantity, stock_quantity):
+    # Tanpa stok yang dilacak, satu booking selalu memakai satu-satunya "unit"
+    return 1 if stock_quantity is None else quantity
+
+
+def capacity(stock_quantity):
+    return 1 if stock_quantity is None else stock_quantity
+
+
+def usage_segments(rows, start_date, end_date):
+    """
+    Splits [start_date, end_date] into (start, end, units) segments of constant usage, given
+    (start, end, quantity) bookings. Days without any booking are left out.
+    """
+    changes = defaultdict(int)
+    for start, end, quantity in rows:
+        start, end = max(start, start_date), min(end, end_date)
+        if start <= end:
+            changes[start] += quantity
+            changes[end + ONE_DAY] -= quantity
+    segments = []
+    units = 0
+    days = sorted(changes)
+    for day, next_day in zip(days, days[1:]):
+        units += changes[day]
+        if units > 0:
+            segments.append((day, next_day - ONE_DAY, units))
+    return segments
+
+
+def product_availability(product_id, start_date, end_date, stock_quantity=None):
+    """
+    `booked` lists the days on which all `stock_quantity` units are rented or held.
+    """
+    fields = ('start_date', 'end_date', 'quantity')
+    rows = list(overlapping_items([product_id], start_date, end_date).values_list(*fields))
+    rows += active_holds([product_id], start_date, end_date).values_list(*fields)
+    rows = [(start, end, booked_units(quantity, stock_quantity)) for start, end, quantity in rows]
+    booked = merge_ranges(
+        (start, end) for start, end, units in usage_segments(rows, start_date, end_date)
+        if units >= capacity(stock_quantity)
+    )
+    return {
+        'product_id': product_id,
+        'from': start_date,
+        'to': end_date,
+        'stock_quantity': stock_quantity,
+        'booked': [{'start_date': start, 'end_date': end} for start, end in booked],
+        'free': [{'start_date': start, 'end_date': end} for start, end in free_ranges(booked, start_date, end_date)],
+    }
+
+
+def find_booking_conflicts(items, stock):
+    """
+    Checks requested rentals against the stock of their products with two queries.
+
+    `items` is a list of dicts with `product_id`, `quantity`, `start_date` and `end_date`;
+    `stock` maps product ids to `stock_quantity` (None: not tracked). Existing bookings and active holds count
+    against the stock. Returns a list of (index, item) for every requested rental that would
+    exceed the stock on some day, counting the earlier rentals of the same request.
+    """
+    if not items:
+        return []
+    conditions = reduce(operator.or_, (
+        Q(product_id=item['product_id'], start_date__lte=item['end_date'], end_date__gte=item['start_date'])
+        for item in items
+    ))
+    fields = ('product_id', 'start_date', 'end_date', 'quantity')
+    holds = ReservationHold.objects.active().filter(conditions)
+    booked = defaultdict(list)
+    rows = list(OrderItem.objects.filter(conditions).exclude(order__status='cancelled').values_list(*fields))
+    for product_id, start, end, quantity in rows + list(holds.values_list(*fields)):
+        booked[product_id].append((start, end, booked_units(quantity, stock.get(product_id))))
+
+    conflicts = []
+    for index, item in enumerate(items):
+        stock_quantity = stock.get(item['product_id'])
+        units = booked_units(item['quantity'], stock_quantity)
+        ranges = booked[item['product_id']]
+        peak = max((used for _, _, used in usage_segments(ranges, item['start_date'], item['end_date'])), default=0)
+        if peak + units > capacity(stock_quantity):
+            conflicts.append((index, item))
+        # Item berikutnya di order yang sama ikut memakai stok yang diminta item ini
+        ranges.append((item['start_date'], item['end_date'], units))
+    return conflicts
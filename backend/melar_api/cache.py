@@ -0,0 +1,262 @@
+"""
+Cache respons untuk endpoint katalog yang dibaca user anonim.
+
+Kunci cache terdiri dari action, host, path + query string, dan "version stamp" dari setiap
+model yang memengaruhi respons. Version stamp dinaikkan oleh signal post_save/pre_delete,
+sehingga entri lama tidak pernah perlu dihapus satu per satu: entri itu otomatis tidak
+terpakai lagi dan akan kedaluwarsa sendiri.
+
+Selain itu setiap perubahan mencatat waktu perubahan per objek katalog yang respons-nya ikut berubah
+(mis. ulasan -> produk dan tokonya). Stamp per objek ini dipakai validator ETag/Last-Modified
+(melar_api/conditional.py), sehingga satu tulisan tidak membatalkan ETag semua objek lain.
+
+Version stamp harus disimpan di cache yang dipakai bersama semua worker (file/Redis, lihat CACHES
+di settings). Cache local-memory hanya diterima bila MELAR_SINGLE_PROCESS aktif; selain itu
+get_cache() menolak dengan ImproperlyConfigured daripada diam-diam melayani data basi.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+from .db_routers import replica_reads
+from .models import AppProduct, Category, ProductImage, ProductReview, Shop
+
+VERSIONED_MODELS = (Category, Shop, AppProduct, ProductImage, ProductReview)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    # Stampede protection: hanya satu request yang menghitung ulang sebuah kunci,
+    # request lain menunggu maksimal WAIT detik sebelum ikut menghitung sendiri
+    'LOCK_TIMEOUT': 10,
+    'WAIT': 2.0,
+    'POLL_INTERVAL': 0.05,
+}
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'MELAR_RESPONSE_CACHE', {})}
+
+
+def is_process_local(cache):
+    return isinstance(cache, LocMemCache)
+
+
+def get_cache():
+    alias = cache_settings()['ALIAS']
+    cache = caches[alias]
+    if is_process_local(cache) and not getattr(settings, 'MELAR_SINGLE_PROCESS', False):
+        raise ImproperlyConfigured(
+            f"Cache alias '{alias}' is local to one process; catalog version stamps must be shared by all "
+            "workers. Use a file/Redis cache or set MELAR_SINGLE_PROCESS = True for single-process deployments."
+        )
+    return cache
+
+
+def response_cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def _version_key(model):
+    return f'melar:version:{model._meta.label_lower}'
+
+
+def _fresh_version():
+    # Nilai awal berbasis waktu: jika kunci versi sempat ter-evict, versi baru tetap lebih besar
+    # dari versi lama sehingga entri lama tidak bisa terbaca kembali
+    return time.time_ns() // 1000
+
+
+def get_versions(models):
+    cache = get_cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def _changed_key(model, pk=None):
+    key = f'melar:changed:{model._meta.label_lower}'
+    return key if pk is None else f'{key}:{pk}'
+
+
+def bump_version(model, objects=None):
+    cache = get_cache()
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+    now = time.time()
+    if objects is None:
+        cache.set(_changed_key(model), now, timeout=None)
+    else:
+        cache.set_many({
+            _changed_key(changed_model, pk): now for changed_model, pks in objects.items() for pk in pks
+        }, timeout=None)
+
+
+def last_changed(model, pks):
+    """
+    Latest time (epoch seconds) at which one of the objects `pks` of `model` (or all of them at once)
+    was marked changed. A missing stamp (evicted or never set) counts as "now", so clients never get a stale 304.
+    """
+    cache = get_cache()
+    keys = [_changed_key(model), *(_changed_key(model, pk) for pk in pks)]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            now = time.time()
+            cache.add(key, now, timeout=None)
+            stamps[key] = cache.get(key, now)
+    return max(stamps.values())
+
+
+def invalidate(model, objects=None):
+    """
+    Bumps the version immediately and again when the surrounding transaction commits,
+    so a response computed from not-yet-committed data cannot survive the commit.
+    `objects` ({model: pks}) are the catalog objects whose responses changed; None means every object of `model`.
+    """
+    if objects is not None:
+        objects = {changed_model: list(pks) for changed_model, pks in objects.items()}
+    bump_version(model, objects)
+    transaction.on_commit(lambda: bump_version(model, objects))
+
+
+def affected_objects(sender, instance):
+    """
+    {model: pks} of the catalog objects whose responses show `instance`.
+    """
+    if sender is Category:
+        return {
+            Category: [instance.pk],
+            Shop: instance.shops_in_category.values_list('pk', flat=True),
+            AppProduct: instance.products_in_category.values_list('pk', flat=True),
+        }
+    if sender is Shop:
+        # Nama toko tampil di setiap produknya
+        return {Shop: [instance.pk], AppProduct: instance.products.values_list('pk', flat=True)}
+    if sender is AppProduct:
+        return {AppProduct: [instance.pk], Shop: [instance.shop_id]} # product_count toko
+    if sender is ProductImage:
+        return {AppProduct: [instance.product_id]}
+    # Ulasan mengubah rating produk dan tokonya
+    return {
+        AppProduct: [instance.product_id],
+        Shop: AppProduct.objects.filter(pk=instance.product_id).values_list('shop_id', flat=True),
+    }
+
+
+# pre_delete (bukan post_delete): objek terkait harus dicari sebelum baris dihapus atau di-SET_NULL
+@receiver(post_save)
+@receiver(pre_delete)
+def invalidate_on_change(sender, instance, raw=False, **kwargs):
+    if sender in VERSIONED_MODELS and not raw:
+        invalidate(sender, affected_objects(sender, instance))
+
+
+@receiver(m2m_changed, sender=Shop.categories.through)
+def invalidate_on_shop_categories_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate(Shop, {Shop: [instance.pk]})
+    elif pk_set is not None:
+        invalidate(Shop, {Shop: pk_set})
+    else:
+        invalidate(Shop) # category.shops_in_category.clear(): toko yang terlepas tidak diketahui lagi
+
+
+def cached_response_key(view, request, versions):
+    raw = '|'.join([
+        view.basename or view.__class__.__name__, view.action or '',
+        request.get_host(), request.get_full_path(), ','.join(str(v) for v in versions),
+    ])
+    return 'melar:response:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+class CachedResponseMixin:
+    """
+    Serves `list`/`retrieve` (and any action wrapped with `cached_response`) for anonymous
+    users from the cache. Set `cache_dependencies` to every model the response is built from.
+    """
+    cache_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def is_cacheable_request(self, request):
+        return (
+            cache_settings()['ENABLED']
+            and request.method == 'GET'
+            and not request.user.is_authenticated
+            # Di dalam transaksi yang belum di-commit, data yang terbaca belum tentu final
+            and not connection.in_atomic_block
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable_request(request):
+            return handler(request, *args, **kwargs)
+        # Isi cache berlaku untuk version stamp terbaru; replika yang tertinggal akan menyimpan data basi
+        with replica_reads(False):
+            return self._cached_response(handler, request, *args, **kwargs)
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        config = cache_settings()
+        cache = get_cache()
+        key = cached_response_key(self, request, get_versions(self.cache_dependencies))
+        data = cache.get(key)
+        if data is not None:
+            _record('hits')
+            return self._response_from_cache(data)
+        _record('misses')
+
+        lock_key = key + ':lock'
+        if cache.add(lock_key, 1, timeout=config['LOCK_TIMEOUT']):
+            try:
+                response = handler(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.data, timeout=config['TIMEOUT'])
+                return response
+            finally:
+                cache.delete(lock_key)
+
+        # Request lain sedang mengisi kunci yang sama; tunggu hasilnya daripada ikut menghitung
+        deadline = time.monotonic() + config['WAIT']
+        while time.monotonic() < deadline:
+            time.sleep(config['POLL_INTERVAL'])
+            data = cache.get(key)
+            if data is not None:
+                return self._response_from_cache(data)
+        return handler(request, *args, **kwargs)
+
+    def _response_from_cache(self, data):
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
@@ -0,0 +1,100 @@
+"""
+Conditional GET (ETag / Last-Modified) untuk endpoint katalog.
+
+Validator hanya dihitung dari baris yang benar-benar ada di respons: objeknya untuk `retrieve`,
+halaman yang diminta untuk daftar ber-pagination (satu query `pk` + `updated_at` lewat paginator yang
+sama). Perubahan yang tidak menyentuh `updated_at` (gambar, ulasan, nama kategori/toko, counter)
+dicatat sebagai stamp per objek oleh melar_api/cache.py, jadi tulisan ke objek lain tidak mengubah
+validator. Body respons tidak perlu diserialisasi sama sekali untuk menjawab 304.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import NotFound
+
+from .cache import last_changed
+from .db_routers import replica_reads
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified to `list`/`retrieve` responses and answers
+    If-None-Match / If-Modified-Since with 304 Not Modified.
+    Expects the model to have an `updated_at` field.
+    """
+    last_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_validator_rows(self, request):
+        """
+        (pk, last modified) of the rows the response is built from: the object for `retrieve`,
+        the requested page for paginated lists, every row otherwise.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        fields = ['pk', self.last_modified_field]
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            rows = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).values(*fields)
+        elif self.paginator is not None:
+            # Kolom urutan ikut dibaca: paginator membentuk cursor dari baris terakhir halaman
+            ordering = self.paginator.get_ordering(request, queryset, self)
+            fields += [name.lstrip('-') for name in ordering]
+            rows = self.paginator.paginate_queryset(queryset.values(*dict.fromkeys(fields)), request, view=self)
+        else:
+            rows = queryset.values(*fields)
+        return [(row['pk'], row[self.last_modified_field]) for row in rows]
+
+    def get_validators(self, request):
+        try:
+            rows = self.get_validator_rows(request)
+        except (ValueError, TypeError, ValidationError, NotFound):
+            return None, None # Lookup/cursor tidak valid (mis. /products/abc/): view sendiri yang menjawab
+        if self.action == 'retrieve' and not rows:
+            return None, None # Biarkan view mengembalikan 404 seperti biasa
+        pks = [pk for pk, _ in rows]
+        # Perubahan lewat .update()/stamp per objek tidak menyentuh updated_at; ambil waktu terbaru dari keduanya
+        changed = last_changed(self.get_queryset().model, pks)
+        raw = '|'.join([
+            request.get_host(), request.get_full_path(), request.accepted_renderer.format,
+            ','.join(f'{pk}:{modified.isoformat() if modified else ""}' for pk, modified in rows), str(changed),
+        ])
+        # ETag lemah: respons yang sama secara semantik, bukan jaminan identik byte per byte
+        etag = 'W/' + quote_etag(hashlib.sha256(raw.encode()).hexdigest()[:32])
+        timestamps = [modified.timestamp() for _, modified in rows if modified] + [changed]
+        # Tanggal HTTP hanya presisi detik, jadi bulatkan ke bawah seperti decorator condition() milik Django
+        return etag, int(max(timestamps))
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return handler(request, *args, **kwargs)
+        # Validator dan body dibaca dari primary: ETag dari replika yang tertinggal (dengan version
+        # stamp terbaru) akan terus menjawab 304 untuk data basi
+        with replica_reads(False):
+            return self._conditional_response(handler, request, *args, **kwargs)
+
+    def _conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return self.set_validator_headers(not_modified, etag, last_modified)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.set_validator_headers(response, etag, last_modified)
+        return response
+
+    def set_validator_headers(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -0,0 +1,162 @@
+"""
+Counter rental yang dijaga inkremental: AppProduct.total_individual_rentals dan Shop.total_rentals.
+
+Setiap OrderItem dihitung satu rental bagi produk dan tokonya selama ordernya berstatus
+RENTAL_COUNTED_STATUSES (active/completed). Saat status order masuk atau keluar dari himpunan
+itu (signal order_status_changed), selisihnya ditambahkan dengan `UPDATE ... SET x = x + n`,
+sehingga urutan "paling sering disewa" (`?ordering=-total_individual_rentals`) cukup membaca index.
+
+Secara default selisih ditulis setelah commit order. Dengan MELAR_RENTAL_COUNTERS['FLUSH_INTERVAL']
+> 0, selisih ditampung di memori proses dan ditulis sekaligus paling cepat tiap FLUSH_INTERVAL detik
+(atau saat MAX_PENDING baris menunggu): satu UPDATE untuk semua produk/toko dengan selisih yang sama,
+jadi produk yang sedang ramai tidak membuat setiap checkout antre pada baris yang sama. Timer daemon
+menulis sisa selisih setelah FLUSH_INTERVAL walaupun tidak ada order baru. Selisih yang
+belum ter-flush hilang bila proses mati mendadak; `manage.py reconcile_rental_counters` menghitung
+ulang semua counter dari OrderItem.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .aggregates import RENTAL_COUNTED_STATUSES
+from .cache import invalidate
+from .models import AppProduct, OrderItem, RentalOrder, Shop
+from .signals import order_status_changed
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'FLUSH_INTERVAL': 0.0, # detik; 0 = tulis langsung setelah commit
+    'MAX_PENDING': 500, # Flush lebih awal bila sebanyak ini baris produk/toko menunggu
+}
+
+COUNTER_FIELDS = {AppProduct: 'total_individual_rentals', Shop: 'total_rentals'}
+
+
+def counter_settings():
+    return {**DEFAULTS, **getattr(settings, 'MELAR_RENTAL_COUNTERS', {})}
+
+
+def apply_counter_deltas(deltas):
+    """
+    Applies {model: {pk: delta}} with one UPDATE per (model, delta value). Counters never go below zero.
+    """
+    with transaction.atomic():
+        for model, model_deltas in deltas.items():
+            field = COUNTER_FIELDS[model]
+            by_delta = defaultdict(list)
+            for pk, delta in model_deltas.items():
+                if delta:
+                    by_delta[delta].append(pk)
+            for delta, pks in sorted(by_delta.items()):
+                model.objects.filter(pk__in=sorted(pks)).update(**{field: Greatest(F(field) + delta, 0)})
+    # .update() tidak memicu post_save; respons katalog yang memuat counter harus dihitung ulang
+    for model, model_deltas in deltas.items():
+        invalidate(model, {model: model_deltas.keys()})
+
+
+class CounterBuffer:
+    """
+    Pending counter deltas of this process.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {model: Counter() for model in COUNTER_FIELDS}
+        self.last_flush = time.monotonic()
+        self.timer = None
+
+    def add(self, deltas):
+        with self.lock:
+            for model, model_deltas in deltas.items():
+                self.pending[model].update(model_deltas)
+        self.flush()
+        self.schedule()
+
+    def schedule(self):
+        """
+        Starts a timer that flushes the pending deltas once FLUSH_INTERVAL has passed.
+        """
+        interval = counter_settings()['FLUSH_INTERVAL']
+        with self.lock:
+            if self.timer is not None or not any(self.pending.values()):
+                return
+            delay = max(self.last_flush + interval - time.monotonic(), 0)
+            self.timer = threading.Timer(delay, self.flush_on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush_on_timer(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self.flush()
+        finally:
+            # Thread timer memakai koneksi database sendiri
+            connection.close()
+        self.schedule()
+
+    def flush(self, force=False):
+        config = counter_settings()
+        with self.lock:
+            size = sum(len(model_deltas) for model_deltas in self.pending.values())
+            due = (
+                force or size >= config['MAX_PENDING']
+                or time.monotonic() - self.last_flush >= config['FLUSH_INTERVAL']
+            )
+            if not size or not due:
+                return
+            pending = self.pending
+            self.pending = {model: Counter() for model in COUNTER_FIELDS}
+            self.last_flush = time.monotonic()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        try:
+            apply_counter_deltas(pending)
+        except Exception:
+            # Counter bukan data kritis: simpan lagi selisihnya untuk flush berikutnya
+            logger.exception("Could not flush rental counters; keeping %s pending rows", size)
+            with self.lock:
+                for model, model_deltas in pending.items():
+                    self.pending[model].update(model_deltas)
+
+
+buffer = CounterBuffer()
+atexit.register(buffer.flush, force=True)
+
+
+def order_counter_deltas(order_id, sign):
+    products, shops = Counter(), Counter()
+    for product_id, shop_id in OrderItem.objects.filter(order_id=order_id).values_list('product_id', 'product__shop_id'):
+        products[product_id] += sign
+        shops[shop_id] += sign
+    return {AppProduct: products, Shop: shops}
+
+
+@receiver(order_status_changed)
+def count_rentals_on_status_change(sender, order_id, previous_status, status, **kwargs):
+    was_counted = previous_status in RENTAL_COUNTED_STATUSES
+    is_counted = status in RENTAL_COUNTED_STATUSES
+    if was_counted != is_counted:
+        # Setelah commit: rollback tidak meninggalkan selisih di counter
+        sign = 1 if is_counted else -1
+        transaction.on_commit(lambda: buffer.add(order_counter_deltas(order_id, sign)))
+
+
+@receiver(pre_delete, sender=RentalOrder)
+def count_rentals_on_order_delete(sender, instance, **kwargs):
+    # Status dibaca dari database: RentalOrderQuerySet.transition() tidak memperbarui instance di memori
+    status = RentalOrder.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    if status in RENTAL_COUNTED_STATUSES:
+        # Item masih ada di pre_delete; hitung sekarang, tulis setelah commit
+        deltas = order_counter_deltas(instance.pk, -1)
+        transaction.on_commit(lambda: buffer.add(deltas))
@@ -0,0 +1,86 @@
+"""
+Routing baca/tulis ke replika database.
+
+Query baca diarahkan ke replika hanya di dalam `replica_reads()`, yang dibuka oleh
+ReplicaReadMixin untuk request GET/HEAD/OPTIONS pada viewset katalog. Satu replika dipilih per
+request (settings.MELAR_READ_REPLICAS) agar semua bacaan dalam request itu konsisten.
+
+Read-your-writes: begitu ada tulisan lewat ORM (db_for_write), sisa bacaan dalam request
+yang sama kembali ke primary. Di luar scope (request tulis, viewset lain, management
+command) semua query tetap ke `default`.
+
+Respons yang disimpan di cache respons atau diberi ETag/Last-Modified dibaca dari primary
+(`replica_reads(False)` di melar_api/cache.py dan melar_api/conditional.py): keduanya dikunci
+dengan version stamp yang sudah mencerminkan tulisan terbaru, sedangkan replika bisa tertinggal.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# Model autentikasi selalu dibaca dari primary: token/sesi yang baru dibuat harus langsung berlaku
+PRIMARY_ONLY_APPS = {'authtoken', 'sessions'}
+
+_replica = ContextVar('melar_read_replica', default=None)
+_wrote = ContextVar('melar_wrote_to_primary', default=False)
+
+
+def read_replicas():
+    return list(getattr(settings, 'MELAR_READ_REPLICAS', ()))
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Lets reads inside the block go to one randomly chosen replica (no-op without replicas).
+    """
+    replicas = read_replicas()
+    replica = random.choice(replicas) if enabled and replicas else None
+    replica_token = _replica.set(replica)
+    wrote_token = _wrote.set(False)
+    try:
+        yield replica
+    finally:
+        _wrote.reset(wrote_token)
+        _replica.reset(replica_token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads inside `replica_reads()` to the chosen replica, everything else to `default`.
+    Replicas are never migrated: they are copies of the primary.
+    """
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or _wrote.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if _replica.get() is not None:
+            _wrote.set(True)
+        # Eksplisit ke primary: objek yang dibaca dari replika tidak boleh ditulis balik ke sana
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *read_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in read_replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    ViewSet mixin that serves safe-method requests from a read replica.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(request.method in SAFE_METHODS):
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,170 @@
+"""
+Sparse fieldset (`?fields=`) dan kontrol ekspansi (`?expand=`) untuk serializer utama.
+
+- `?fields=id,name,price` membatasi key yang dikembalikan.
+- `?expand=images,owner_info` hanya meng-expand relasi yang disebut; relasi lain yang bisa
+  di-expand diciutkan menjadi primary key. Tanpa `?expand=` semua relasi tetap di-expand
+  (format respons lama).
+
+Setiap serializer mendeskripsikan kolom/relasi yang dibutuhkan tiap field di `fieldset_plan`,
+sehingga queryset view ikut menyusut: `only()` untuk kolom, dan select_related/prefetch yang
+tidak diminta dilewati.
+"""
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_name_list(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+class Fieldset:
+    """
+    Output fields (`fields`) and expanded relations (`expand`) requested by the client.
+    `None` means "not restricted".
+    """
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.expand is None
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return self.expand is None or name in self.expand
+
+
+def _prefetch_key(lookup):
+    return lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that honours `?fields=` / `?expand=` on safe requests when used as
+    the top-level serializer.
+
+    - `expandable_fields`: name -> factory of the collapsed (primary key) field, or None
+      when the subclass collapses it itself in `to_representation`.
+    - `computed_fields`: keys added in `to_representation` rather than declared as fields.
+    - `fieldset_plan` / `collapsed_fieldset_plan`: name -> {'only', 'select_related',
+      'prefetch_related'} needed to render the field (expanded / collapsed).
+      Concrete model fields without an entry just need their own column.
+    """
+    expandable_fields = {}
+    computed_fields = ()
+    fieldset_plan = {}
+    collapsed_fieldset_plan = {}
+
+    @classmethod
+    def output_field_names(cls):
+        if '_output_field_names' not in cls.__dict__:
+            readable = [name for name, field in cls(context={}).get_fields().items() if not field.write_only]
+            cls._output_field_names = tuple(readable) + tuple(cls.computed_fields)
+        return cls._output_field_names
+
+    @classmethod
+    def get_fieldset(cls, request):
+        if request is None or request.method not in SAFE_METHODS:
+            return Fieldset()
+        fields = parse_name_list(request, 'fields')
+        expand = parse_name_list(request, 'expand')
+        errors = {}
+        if fields is not None:
+            unknown = fields - set(cls.output_field_names())
+            if unknown:
+                errors['fields'] = f"Unknown field(s): {', '.join(sorted(unknown))}. Available: {', '.join(cls.output_field_names())}."
+        if expand is not None:
+            unknown = expand - set(cls.expandable_fields)
+            if unknown:
+                errors['expand'] = f"Cannot expand: {', '.join(sorted(unknown))}. Expandable: {', '.join(cls.expandable_fields)}."
+        if errors:
+            raise ValidationError(errors)
+        return Fieldset(fields, expand)
+
+    @property
+    def fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            # Hanya serializer teratas (atau child dari ListSerializer teratas) yang mengikuti query param
+            parent = self.parent
+            is_root = parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+            request = self.context.get('request') if is_root else None
+            self._fieldset = self.get_fieldset(request)
+        return self._fieldset
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.fieldset
+        if fieldset.is_default:
+            return fields
+        for name, collapsed in self.expandable_fields.items():
+            if collapsed is not None and name in fields and not fieldset.expands(name):
+                fields[name] = collapsed()
+        if fieldset.fields is not None:
+            for name in [name for name, field in fields.items() if not field.write_only and name not in fieldset.fields]:
+                del fields[name]
+        return fields
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fieldset, keep=()):
+        """
+        Reduces `queryset` to the columns, joins and prefetches needed to render `fieldset`.
+        `keep` lists extra columns that must stay loaded (ordering, permission checks).
+        """
+        if fieldset.is_default:
+            return queryset
+        model = queryset.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+        columns = {model._meta.pk.name}
+        columns.update(name.lstrip('-') for name in keep if isinstance(name, str) and name.lstrip('-') in concrete)
+        select_related = set()
+        prefetches = {}
+        for name in cls.output_field_names():
+            if not fieldset.includes(name):
+                continue
+            if name in cls.expandable_fields and not fieldset.expands(name) and name in cls.collapsed_fieldset_plan:
+                plan = cls.collapsed_fieldset_plan[name]
+            else:
+                plan = cls.fieldset_plan.get(name, {'only': (name,)} if name in concrete else {})
+            columns.update(plan.get('only', ()))
+            select_related.update(plan.get('select_related', ()))
+            for lookup in plan.get('prefetch_related', ()):
+                key = _prefetch_key(lookup)
+                # Lookup penuh (string) menang atas Prefetch yang hanya memuat id
+                if key not in prefetches or not isinstance(lookup, Prefetch):
+                    prefetches[key] = lookup
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches.values())
+        if fieldset.fields is not None:
+            queryset = queryset.only(*sorted(columns))
+        return queryset
+
+
+class SparseFieldsetViewMixin:
+    """
+    ViewSet mixin that shrinks the queryset to what the requested fieldset needs.
+    `fieldset_keep` names columns the view itself reads (e.g. for permission checks).
+    """
+    fieldset_keep = ()
+
+    def get_fieldset(self):
+        return self.get_serializer_class().get_fieldset(self.request)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        keep = list(self.fieldset_keep) + list(queryset.query.order_by)
+        keep += [ordering] if isinstance(ordering, str) else list(ordering)
+        return self.get_serializer_class().optimize_queryset(queryset, self.get_fieldset(), keep=keep)
@@ -0,0 +1,131 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .search import search_products
+
+# Rentang integer 64-bit yang diterima database untuk parameter query bilangan bulat
+MIN_INT_PARAM = -2 ** 63
+MAX_INT_PARAM = 2 ** 63 - 1
+
+
+class TieBreakOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter yang selalu menambahkan `id` sebagai pemecah seri,
+    sehingga urutan tetap stabil untuk cursor pagination.
+    """
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = list(ordering)
+        if not any(field.lstrip('-') == 'id' for field in ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return tuple(ordering)
+
+
+def parse_bool_param(request, name):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    lowered = value.lower()
+    if lowered in ('true', '1', 'yes'):
+        return True
+    if lowered in ('false', '0', 'no'):
+        return False
+    raise ValidationError({name: "Must be true or false."})
+
+
+def parse_decimal_param(request, name):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "A valid number is required."})
+    # NaN/Infinity lolos Decimal() tetapi tidak bisa dibandingkan dengan kolom harga
+    if not number.is_finite():
+        raise ValidationError({name: "A valid number is required."})
+    return number
+
+
+def parse_int_param(request, name):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValidationError({name: "A valid integer is required."})
+    if not MIN_INT_PARAM <= number <= MAX_INT_PARAM:
+        raise ValidationError({name: "A valid integer is required."})
+    return number
+
+
+def parse_date_param(request, name, default=None):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: "Date has wrong format. Use YYYY-MM-DD."})
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    Server-side filtering for AppProduct lists.
+
+    Supported query parameters:
+    - `search`: full-text search over name and description (see melar_api.search)
+    - `category`: category id or name
+    - `min_price` / `max_price`: price per day range (inclusive)
+    - `available`: true/false
+    - `shop`: shop id
+    - `location`: part of the shop location, e.g. "Jakarta"
+    - `min_rating`: minimum average review rating (uses the maintained `rating` column)
+    """
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        category = params.get('category')
+        if category:
+            # isdigit() juga menerima digit Unicode seperti "²"; hanya angka ASCII yang dianggap id
+            if category.isascii() and category.isdigit():
+                queryset = queryset.filter(category_id=parse_int_param(request, 'category'))
+            else:
+                queryset = queryset.filter(category__name__iexact=category)
+
+        min_price = parse_decimal_param(request, 'min_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        max_price = parse_decimal_param(request, 'max_price')
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+
+        available = parse_bool_param(request, 'available')
+        if available is not None:
+            # `__in` agar SQLite menulis `available IN (1)` (bukan kolom boolean polos) sehingga
+            # index (category, available, price) bisa dipakai
+            queryset = queryset.filter(available__in=[available])
+
+        shop_id = parse_int_param(request, 'shop')
+        if shop_id is not None:
+            queryset = queryset.filter(shop_id=shop_id)
+
+        min_rating = parse_decimal_param(request, 'min_rating')
+        if min_rating is not None:
+            queryset = queryset.filter(rating__gte=float(min_rating))
+
+        location = params.get('location')
+        if location:
+            queryset = queryset.filter(shop__location__icontains=location)
+
+        search = params.get('search')
+        if search:
+            queryset = search_products(queryset, search)
+
+        return queryset
@@ -0,0 +1,143 @@
+"""
+Reservation hold: stok yang ditahan sementara sejak checkout dimulai sampai order dibuat.
+
+POST /api/v1/holds/ menahan semua item keranjang sekaligus selama MELAR_HOLDS['TTL'] detik
+(semua atau tidak sama sekali) dan menggantikan hold user sebelumnya. Selama hold aktif, unit
+itu dihitung terpakai oleh cek kapasitas (melar_api/availability.py), jadi pembeli lain tidak
+bisa mengambilnya. Saat order dibuat, unit dari hold user dengan produk dan tanggal yang sama
+dikonversi menjadi item order (tanpa cek bentrok ulang bila semua item tertutup hold); hold lain
+milik user tetap berlaku; hold yang kedaluwarsa dihapus oleh `manage.py expire_holds`.
+
+Keputusan kapasitas untuk satu produk dibuat berurutan: baris AppProduct dikunci dengan
+SELECT ... FOR UPDATE (di SQLite, transaksi tulis sudah saling menunggu), lalu cek dan insert
+terjadi di transaksi yang sama.
+"""
+import datetime
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .availability import find_booking_conflicts
+from .models import AppProduct, ReservationHold
+
+DEFAULTS = {
+    'TTL': 15 * 60, # detik
+}
+
+
+def holds_settings():
+    return {**DEFAULTS, **getattr(settings, 'MELAR_HOLDS', {})}
+
+
+def lock_stock(product_ids):
+    """
+    Locks the product rows (in id order, so concurrent checkouts cannot deadlock) and
+    returns {product_id: stock_quantity}. Must run inside a transaction.
+    """
+    rows = AppProduct.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')
+    return dict(rows.values_list('pk', 'stock_quantity'))
+
+
+def booking_conflict_error(conflicts, field='order_items_data'):
+    return ValidationError({field: [
+        f"Product {item['product_id']} is already booked between {item['start_date']} and {item['end_date']}."
+        for _, item in conflicts
+    ]})
+
+
+def consume_holds(items, holds):
+    """
+    Takes the units of `items` from the matching holds (same product and dates).
+    Returns (covered, used): whether every item was fully matched, and {hold: units taken}.
+    """
+    by_key = defaultdict(list)
+    for hold in holds:
+        by_key[(hold.product_id, hold.start_date, hold.end_date)].append([hold, hold.quantity])
+    covered = True
+    used = Counter()
+    for item in items:
+        needed = item['quantity']
+        for entry in by_key[(item['product_id'], item['start_date'], item['end_date'])]:
+            taken = min(needed, entry[1])
+            if taken:
+                entry[1] -= taken
+                used[entry[0]] += taken
+                needed -= taken
+        if needed:
+            covered = False
+    return covered, used
+
+
+def release_holds(used):
+    """
+    Takes the used units off their holds and deletes the holds that are used up.
+    Returns False when a hold no longer had those units (changed or removed meanwhile).
+    """
+    released = True
+    for hold, taken in used.items():
+        # Dikurangi di database, bukan dari nilai yang dibaca: hold bisa diubah request lain sejak dibaca
+        if not ReservationHold.objects.filter(pk=hold.pk, quantity__gte=taken).update(quantity=F('quantity') - taken):
+            released = False
+    if used:
+        ReservationHold.objects.filter(pk__in=[hold.pk for hold in used], quantity=0).delete()
+    return released
+
+
+def place_holds(user, items):
+    """
+    Replaces the holds of `user` with holds on `items`, or raises ValidationError when
+    any item exceeds the remaining stock. Returns the created holds.
+    """
+    expires_at = timezone.now() + datetime.timedelta(seconds=holds_settings()['TTL'])
+    with transaction.atomic():
+        stock = lock_stock({item['product_id'] for item in items})
+        ReservationHold.objects.filter(user=user).delete()
+        conflicts = find_booking_conflicts(items, stock)
+        if conflicts:
+            raise booking_conflict_error(conflicts, field='items')
+        return ReservationHold.objects.bulk_create([
+            ReservationHold(
+                user=user, product_id=item['product_id'], quantity=item['quantity'],
+                start_date=item['start_date'], end_date=item['end_date'], expires_at=expires_at,
+            )
+            for item in items
+        ])
+
+
+def claim_order_stock(user, items):
+    """
+    Reserves the stock for a new order of `user`, inside the caller's transaction.
+    The units covered by the user's matching holds are taken from those holds; when every
+    item is covered the order is accepted as is, otherwise the full capacity check runs.
+    Holds of the user that the order does not use are kept.
+    """
+    stock = lock_stock({item['product_id'] for item in items})
+    holds = ReservationHold.objects.active().filter(user=user, product_id__in=stock).order_by('pk')
+    covered, used = consume_holds(items, holds)
+    # Unit yang dikonversi dilepas dulu, sehingga cek kapasitas menghitungnya sekali (sebagai item order);
+    # bila cek gagal, transaksi pemanggil ikut membatalkan perubahan ini
+    # Hold yang sudah tidak memuat unitnya tidak menjamin apa pun: jalankan cek kapasitas penuh
+    if not release_holds(used):
+        covered = False
+    if not covered:
+        conflicts = find_booking_conflicts(items, stock)
+        if conflicts:
+            raise booking_conflict_error(conflicts)
+
+
+def expire_holds(batch_size=1000):
+    """
+    Deletes expired holds in batches; returns how many were removed.
+    """
+    removed = 0
+    while True:
+        pks = list(
+            ReservationHold.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return removed
+        removed += ReservationHold.objects.filter(pk__in=pks).delete()[0]
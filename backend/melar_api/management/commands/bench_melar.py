@@ -0,0 +1,166 @@
+import datetime
+import json
+import math
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import NoReverseMatch, reverse
+
+from melar_api.models import AppProduct, RentalOrder, Shop
+from melar_api.urls import router
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of `samples` (pct between 0 and 100).
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def router_routes():
+    """
+    (name, url name, detail, basename) for every list/detail route and GET extra action
+    registered on the API router.
+    """
+    routes = []
+    for _, viewset, basename in router.registry:
+        routes.append((f'{basename}-list', f'{basename}-list', False, basename))
+        routes.append((f'{basename}-detail', f'{basename}-detail', True, basename))
+        for extra in viewset.get_extra_actions():
+            if 'get' in extra.mapping:
+                routes.append((f'{basename}-{extra.url_name}', f'{basename}-{extra.url_name}', extra.detail, basename))
+    return routes
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every GET route of the API router plus the login endpoint in-process and prints "
+        "p50/p95 latency, query counts and response sizes as JSON. Run it against a seeded database (seed_melar)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per route.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per route before measuring.")
+        parser.add_argument('--username', default='seed-admin', help="User for routes that need authentication.")
+        parser.add_argument('--password', default='melar-seed')
+        parser.add_argument('--route', action='append', default=[],
+                            help="Only benchmark routes whose name contains this text (repeatable).")
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        self.iterations = options['iterations']
+        self.warmup = options['warmup']
+        login_path = reverse('rest_login')
+        credentials = {'username': options['username'], 'password': options['password']}
+
+        # Request dijalankan di proses ini lewat test Client, jadi host 'testserver' harus diizinkan
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            login = self.measure('auth-login', 'POST', login_path, None, credentials)
+            token = login.pop('key', None)
+            if token is None:
+                raise CommandError(f"Login as '{options['username']}' failed (HTTP {login['status']}); seed data first.")
+            results = [login]
+            samples = {}
+            for name, url_name, detail, basename in router_routes():
+                if options['route'] and not any(part in name for part in options['route']):
+                    continue
+                try:
+                    path = self.route_path(url_name, detail, basename, samples, token)
+                except NoReverseMatch:
+                    continue
+                if path is None:
+                    results.append({'name': name, 'method': 'GET', 'path': None, 'skipped': 'no sample object'})
+                    continue
+                results.append(self.measure(name, 'GET', path, token))
+
+        report = {
+            'meta': {
+                'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': self.iterations,
+                'warmup': self.warmup,
+                'dataset': {
+                    'shops': Shop.objects.count(), 'products': AppProduct.objects.count(),
+                    'orders': RentalOrder.objects.count(),
+                },
+            },
+            'routes': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        self.stdout.write(output)
+
+    def route_path(self, url_name, detail, basename, samples, token):
+        if not detail:
+            return reverse(url_name)
+        if basename not in samples:
+            samples[basename] = self.sample_pk(reverse(f'{basename}-list'), token)
+        if samples[basename] is None:
+            return None
+        return reverse(url_name, kwargs={'pk': samples[basename]})
+
+    def sample_pk(self, list_path, token):
+        """
+        Primary key of the first object the benchmark user sees on `list_path`.
+        """
+        response = Client().get(list_path, HTTP_AUTHORIZATION=f'Token {token}')
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        items = data.get('results', []) if isinstance(data, dict) else data
+        return items[0].get('id') if items else None
+
+    def request(self, method, path, token, data):
+        # Client baru per request: login tidak boleh meninggalkan session cookie untuk request berikutnya
+        client = Client()
+        extra = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        if method == 'POST':
+            return client.post(path, data=json.dumps(data), content_type='application/json', **extra)
+        return client.get(path, **extra)
+
+    def measure(self, name, method, path, token, data=None):
+        # Coba anonim dulu; route yang menolak anonim diukur dengan token
+        response = self.request(method, path, None, data)
+        auth = 'anonymous'
+        if response.status_code in (401, 403) and token:
+            auth = 'token'
+        else:
+            token = None
+        for _ in range(self.warmup):
+            response = self.request(method, path, token, data)
+
+        timings, queries = [], []
+        for _ in range(self.iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(method, path, token, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+
+        result = {
+            'name': name,
+            'method': method,
+            'path': path,
+            'auth': auth,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': {'p50': percentile(queries, 50), 'max': max(queries)},
+            'bytes': len(response.content),
+        }
+        if method == 'POST' and response.status_code == 200:
+            result['key'] = response.json().get('key')
+        return result
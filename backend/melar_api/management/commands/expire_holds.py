@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from melar_api.holds import expire_holds
+
+
+class Command(BaseCommand):
+    help = "Deletes expired checkout reservation holds. Run it every minute or so (cron, systemd timer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Holds deleted per statement.")
+
+    def handle(self, *args, **options):
+        removed = expire_holds(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Released {removed} expired holds."))
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from melar_api.models import ProductImage, Shop
+from melar_api.thumbnails import (
+    needs_variants, process_product_image, process_shop_image, thumbnail_settings
+)
+
+
+class Command(BaseCommand):
+    help = "Generates missing WebP/JPEG thumbnails for existing product and shop images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate thumbnails that already exist.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Number of worker threads (default: MELAR_THUMBNAILS['WORKERS']).")
+        parser.add_argument('--sync', action='store_true', help="Process images one by one in this thread.")
+
+    def handle(self, *args, **options):
+        jobs = []
+        for image in ProductImage.objects.only('pk', 'image', 'variants').iterator():
+            if options['force'] or needs_variants(image.image, image.variants):
+                jobs.append((process_product_image, image.pk))
+        for shop in Shop.objects.exclude(image='').exclude(image=None).only('pk', 'image', 'image_variants').iterator():
+            if options['force'] or needs_variants(shop.image, shop.image_variants):
+                jobs.append((process_shop_image, shop.pk))
+
+        if options['sync']:
+            errors = [self.run_job(task, pk, close_connection=False) for task, pk in jobs]
+        else:
+            workers = options['workers'] or thumbnail_settings()['WORKERS']
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.run_job, task, pk) for task, pk in jobs]
+                errors = [future.result() for future in futures]
+        failed = 0
+        for error in errors:
+            if error:
+                failed += 1
+                self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(f"Generated thumbnails for {len(jobs) - failed} images ({failed} failed)."))
+
+    def run_job(self, task, pk, close_connection=True):
+        try:
+            task(pk)
+        except Exception as exc:
+            return f"{task.__name__}({pk}): {exc}"
+        finally:
+            if close_connection:
+                close_old_connections() # Koneksi milik thread worker
+        return None
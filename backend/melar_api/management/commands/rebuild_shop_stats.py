@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from melar_api.aggregates import rebuild_daily_stats, rebuild_rental_day_stats
+from melar_api.models import OrderItem, ShopDailyStat, ShopRentalDayStat
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily shop statistics rollups from rental orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shops',
+                            help="Only rebuild this shop (can be repeated).")
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_stats(OrderItem, ShopDailyStat, shop_ids=options['shops'])
+        rental_day_rows = rebuild_rental_day_stats(OrderItem, ShopRentalDayStat, shop_ids=options['shops'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} daily statistic rows and {rental_day_rows} rental day rows."
+        ))
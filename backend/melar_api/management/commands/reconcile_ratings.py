@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from melar_api.aggregates import recompute_ratings
+from melar_api.models import AppProduct, ProductReview, Shop
+
+
+class Command(BaseCommand):
+    help = "Recomputes the rating aggregates of every product and shop from their reviews."
+
+    def handle(self, *args, **options):
+        products, shops = recompute_ratings(AppProduct, Shop, ProductReview)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {products} products and {shops} shops."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from melar_api.aggregates import recompute_rental_counters
+from melar_api.cache import invalidate
+from melar_api.counters import buffer
+from melar_api.models import AppProduct, OrderItem, Shop
+
+
+class Command(BaseCommand):
+    help = "Recomputes the rental counters of every product and shop from their order items."
+
+    def handle(self, *args, **options):
+        buffer.flush(force=True)
+        products, shops = recompute_rental_counters(AppProduct, Shop, OrderItem)
+        # .update() tidak memicu signal invalidasi cache katalog
+        invalidate(AppProduct)
+        invalidate(Shop)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed rental counters for {products} products and {shops} shops."))
@@ -0,0 +1,219 @@
+import datetime
+import random
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from melar_api.aggregates import (
+    rebuild_daily_stats, rebuild_rental_day_stats, recompute_ratings, recompute_rental_counters,
+)
+from melar_api.cache import VERSIONED_MODELS, invalidate
+from melar_api.models import (
+    AppProduct, Category, OrderItem, ProductImage, ProductReview, RentalOrder, Shop, ShopDailyStat,
+    ShopRentalDayStat, UserProfile,
+)
+
+CATEGORIES = {
+    'Kamera': ['Kamera Mirrorless', 'Lensa Tele', 'Action Cam', 'Drone', 'Tripod', 'Gimbal'],
+    'Camping': ['Tenda Dome', 'Sleeping Bag', 'Carrier 60L', 'Kompor Portable', 'Matras', 'Hammock'],
+    'Elektronik': ['Proyektor', 'Speaker Bluetooth', 'Laptop', 'Konsol Game', 'Monitor', 'Power Bank'],
+    'Kendaraan': ['Sepeda Lipat', 'Skuter Listrik', 'Motor Matic', 'Helm', 'Rak Sepeda', 'Jas Hujan'],
+    'Pesta': ['Sound System', 'Lampu Panggung', 'Kursi Lipat', 'Meja Prasmanan', 'Tenda Pesta', 'Dekorasi'],
+    'Olahraga': ['Papan Selancar', 'Raket Tenis', 'Alat Selam', 'Sepatu Hiking', 'Kayak', 'Stick Golf'],
+}
+CITIES = ['Jakarta Selatan', 'Bandung', 'Yogyakarta', 'Surabaya', 'Denpasar', 'Medan', 'Makassar', 'Malang']
+ADJECTIVES = ['Pro', 'Lite', 'Max', 'Mini', 'Plus', 'Ultra', 'Classic', 'X']
+COMMENTS = ['Barang bagus dan bersih.', 'Sesuai deskripsi.', 'Pengiriman cepat.', 'Agak lecet, tapi berfungsi.',
+            'Pemilik ramah, recommended!', 'Akan sewa lagi.']
+# Bobot status order: sebagian besar order sudah berjalan/selesai
+STATUS_WEIGHTS = {'pending': 10, 'confirmed': 15, 'active': 10, 'completed': 55, 'cancelled': 10}
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Lets bulk_create keep the generated created_at/updated_at values instead of "now".
+    """
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Generates a reproducible load-test dataset (shops, products, customers, orders, reviews) with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=20)
+        parser.add_argument('--products', type=int, default=200, help="Total number of products.")
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--customers', type=int, default=None, help="Default: one per five orders.")
+        parser.add_argument('--reviews', type=int, default=None, help="Default: one per two orders.")
+        parser.add_argument('--images', type=int, default=3, help="Images per product (paths only, no files).")
+        parser.add_argument('--days', type=int, default=365, help="Spread creation dates over this many days.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='seed', help="Prefix for generated usernames.")
+        parser.add_argument('--password', default='melar-seed', help="Password of every generated user.")
+        parser.add_argument('--anchor-date', type=datetime.date.fromisoformat, default=None,
+                            help="Last day of generated data (YYYY-MM-DD, default today). Fix it for identical datasets.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f"Users with prefix '{prefix}-' already exist; pick another --prefix.")
+        if options['shops'] < 1 or options['products'] < 1:
+            raise CommandError("--shops and --products must be at least 1.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        anchor = options['anchor_date'] or timezone.localdate()
+        self.end = timezone.make_aware(datetime.datetime.combine(anchor, datetime.time(18)))
+        self.days = options['days']
+        customers = options['customers'] or max(1, options['orders'] // 5)
+        reviews = options['reviews'] if options['reviews'] is not None else options['orders'] // 2
+
+        with transaction.atomic():
+            password = make_password(options['password']) # Hash sekali, dipakai semua user
+            admin = self.create_users([f'{prefix}-admin'], password, is_staff=True)[0]
+            owners = self.create_users([f'{prefix}-owner-{i:05d}' for i in range(options['shops'])], password)
+            buyers = self.create_users([f'{prefix}-customer-{i:05d}' for i in range(customers)], password)
+            categories = self.create_categories()
+            shops = self.create_shops(owners, categories)
+            products = self.create_products(shops, categories, options['products'], options['images'])
+            orders = self.create_orders(buyers, products, options['orders'])
+            self.create_reviews(buyers, products, reviews)
+
+            recompute_ratings(AppProduct, Shop, ProductReview)
+            recompute_rental_counters(AppProduct, Shop, OrderItem)
+            rebuild_daily_stats(OrderItem, ShopDailyStat, shop_ids=[shop.pk for shop in shops])
+            rebuild_rental_day_stats(OrderItem, ShopRentalDayStat, shop_ids=[shop.pk for shop in shops])
+            # bulk_create tidak mengirim signal: naikkan versi cache katalog secara manual
+            for model in VERSIONED_MODELS:
+                invalidate(model)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(shops)} shops, {len(products)} products, {len(buyers)} customers, "
+            f"{orders} orders and {reviews} reviews. Admin login: {admin.username} / {options['password']}"
+        ))
+
+    def random_moment(self):
+        return self.end - datetime.timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def create_users(self, usernames, password, is_staff=False):
+        users = []
+        for username in usernames:
+            joined = self.random_moment()
+            users.append(User(
+                username=username, email=f'{username}@example.com', password=password, is_staff=is_staff,
+                first_name=username.split('-')[1].title(), last_name=username.rsplit('-', 1)[-1], date_joined=joined,
+            ))
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+        # Signal post_save tidak jalan pada bulk_create, jadi profil dibuat di sini
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users], batch_size=self.batch_size)
+        return users
+
+    def create_categories(self):
+        categories = []
+        for name in CATEGORIES:
+            category, _ = Category.objects.get_or_create(name=name, defaults={'description': f'Sewa {name.lower()}'})
+            categories.append(category)
+        return categories
+
+    def create_shops(self, owners, categories):
+        shops = []
+        for owner in owners:
+            created = self.random_moment()
+            city = self.rng.choice(CITIES)
+            shops.append(Shop(
+                owner=owner, name=f'Rental {owner.last_name} {city.split()[0]}', location=f'{city}, ID',
+                description=f'Toko sewa terpercaya di {city}.', created_at=created, updated_at=created,
+                phone_number=f'08{self.rng.randrange(10**9, 10**10)}', business_type='individual',
+            ))
+        with explicit_timestamps(Shop):
+            shops = Shop.objects.bulk_create(shops, batch_size=self.batch_size)
+        Through = Shop.categories.through
+        Through.objects.bulk_create([
+            Through(shop_id=shop.pk, category_id=category.pk)
+            for shop in shops for category in self.rng.sample(categories, self.rng.randint(1, 3))
+        ], batch_size=self.batch_size)
+        return shops
+
+    def create_products(self, shops, categories, count, images_per_product):
+        products = []
+        for index in range(count):
+            shop = shops[index % len(shops)]
+            category = self.rng.choice(categories)
+            created = max(shop.created_at, self.random_moment())
+            base = self.rng.choice(CATEGORIES[category.name])
+            products.append(AppProduct(
+                shop=shop, category=category, name=f'{base} {self.rng.choice(ADJECTIVES)} {index}',
+                description=f'{base} siap pakai, kondisi terawat. Cocok untuk kebutuhan harian maupun acara.',
+                price=Decimal(self.rng.randrange(20, 800) * 1000), available=self.rng.random() > 0.1,
+                created_at=created, updated_at=created,
+            ))
+        with explicit_timestamps(AppProduct):
+            products = AppProduct.objects.bulk_create(products, batch_size=self.batch_size)
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'product_images/seed/{product.pk}_{order}.jpg', order=order,
+                         alt_text=product.name)
+            for product in products for order in range(images_per_product)
+        ], batch_size=self.batch_size)
+        return products
+
+    def create_orders(self, buyers, products, count):
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        # Per produk, tanggal sewa berikutnya yang masih kosong: order yang tidak dibatalkan tidak pernah bentrok
+        next_free = {product.pk: (product.created_at + datetime.timedelta(days=1)).date() for product in products}
+        orders, order_items = [], []
+        for _ in range(count):
+            created = self.random_moment()
+            status = self.rng.choices(statuses, weights)[0]
+            items = []
+            for product in self.rng.sample(products, min(len(products), self.rng.randint(1, 3))):
+                start = max(next_free[product.pk], created.date()) + datetime.timedelta(days=self.rng.randint(0, 14))
+                end = start + datetime.timedelta(days=self.rng.randint(0, 6))
+                if status != 'cancelled':
+                    next_free[product.pk] = end + datetime.timedelta(days=1)
+                items.append(OrderItem(
+                    product=product, shop_id=product.shop_id, quantity=1, price_per_day_at_rental=product.price,
+                    start_date=start, end_date=end,
+                ))
+            buyer = self.rng.choice(buyers)
+            orders.append(RentalOrder(
+                user=buyer, status=status, created_at=created, updated_at=created,
+                total_price=sum(item.item_total for item in items),
+                first_name=buyer.first_name, last_name=buyer.last_name, email_at_checkout=buyer.email,
+                billing_city=self.rng.choice(CITIES),
+            ))
+            order_items.append(items)
+        with explicit_timestamps(RentalOrder):
+            orders = RentalOrder.objects.bulk_create(orders, batch_size=self.batch_size)
+        for order, items in zip(orders, order_items):
+            for item in items:
+                item.order = order
+        OrderItem.objects.bulk_create([item for items in order_items for item in items], batch_size=self.batch_size)
+        return len(orders)
+
+    def create_reviews(self, buyers, products, count):
+        reviews = []
+        for _ in range(count):
+            product = self.rng.choice(products)
+            reviews.append(ProductReview(
+                product=product, user=self.rng.choice(buyers), rating=self.rng.choices([1, 2, 3, 4, 5], [1, 2, 5, 12, 20])[0],
+                comment=self.rng.choice(COMMENTS), created_at=max(product.created_at, self.random_moment()),
+            ))
+        with explicit_timestamps(ProductReview):
+            ProductReview.objects.bulk_create(reviews, batch_size=self.batch_size)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory
+
+from melar_api.models import AppProduct, Shop
+
+
+class Command(BaseCommand):
+    help = "Fills the anonymous catalog response cache (categories, shops, products) after a deploy."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='localhost',
+                            help="Host the public API is served under; cached product URLs are built with it.")
+        parser.add_argument('--scheme', default='https', choices=['http', 'https'])
+        parser.add_argument('--details', type=int, default=50,
+                            help="Number of newest products and shops whose detail pages are also warmed.")
+
+    def handle(self, *args, **options):
+        paths = [reverse('category-list'), reverse('shop-list'), reverse('appproduct-list')]
+        newest_shops = Shop.objects.order_by('-created_at').values_list('pk', flat=True)[:options['details']]
+        newest_products = AppProduct.objects.order_by('-created_at').values_list('pk', flat=True)[:options['details']]
+        paths += [reverse('shop-detail', kwargs={'pk': pk}) for pk in newest_shops]
+        paths += [reverse('appproduct-detail', kwargs={'pk': pk}) for pk in newest_products]
+
+        factory = APIRequestFactory()
+        warmed = failed = 0
+        # Request dibuat langsung ke view (tanpa server), jadi host harus diizinkan secara eksplisit
+        with override_settings(ALLOWED_HOSTS=[options['host']]):
+            for path in paths:
+                request = factory.get(path, HTTP_HOST=options['host'], secure=options['scheme'] == 'https')
+                match = resolve(path)
+                response = match.func(request, *match.args, **match.kwargs)
+                if response.status_code == 200:
+                    warmed += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"{path}: HTTP {response.status_code}")
+        self.stdout.write(self.style.SUCCESS(f"Warmed {warmed} catalog responses ({failed} failed)."))
@@ -0,0 +1,333 @@
+"""
+Metrik Prometheus (format teks) di /metrics tanpa dependensi tambahan.
+
+Setiap proses worker mengumpulkan counter dan histogram di memori (satu lock per proses,
+hanya untuk penambahan angka). Bila MELAR_METRICS['DIR'] diisi, setiap proses menulis snapshot
+miliknya ke `<DIR>/metrics-<pid>.json` paling sering tiap FLUSH_INTERVAL detik (tulis ke file
+sementara lalu os.replace, jadi tanpa lock antarproses). /metrics menjumlahkan semua snapshot
+di direktori itu, sehingga hasilnya sama dari worker mana pun yang melayani scrape.
+/metrics hanya bisa dibaca dengan MELAR_METRICS['TOKEN'] (header Bearer) atau sesi login staf.
+Kosongkan direktori itu setiap kali server di-start ulang, seperti multiprocess mode
+prometheus_client.
+
+Metrik:
+- melar_http_requests_total{route,method,status} dan melar_http_request_duration_seconds{route}:
+  route = `<basename>-<action>` untuk viewset (mis. appproduct-list, rentalorder-create).
+- melar_db_queries_per_request{route}, melar_db_time_per_request_seconds{route}.
+- melar_response_cache_requests_total{result}, melar_auth_cache_requests_total{result} + *_hit_ratio.
+- melar_orders_created_total{status} (signal order_status_changed) dan melar_orders{status} (dari DB).
+"""
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .authentication import auth_cache_stats
+from .cache import response_cache_stats
+from .models import RentalOrder
+from .signals import order_status_changed
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIR': None, # Direktori multiprocess; None = hanya proses ini
+    'FLUSH_INTERVAL': 5.0, # detik
+    'TOKEN': None, # Scraper mengirim "Authorization: Bearer <TOKEN>"; tanpa token hanya sesi staf yang boleh
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+HELP = {
+    'melar_http_requests_total': ('counter', "HTTP requests by route, method and status."),
+    'melar_http_request_duration_seconds': ('histogram', "Request latency by route."),
+    'melar_db_queries_per_request': ('histogram', "SQL queries issued per request by route."),
+    'melar_db_time_per_request_seconds': ('histogram', "Time spent in SQL per request by route."),
+    'melar_orders_created_total': ('counter', "Rental orders created, by initial status."),
+    'melar_response_cache_requests_total': ('counter', "Catalog response cache lookups."),
+    'melar_auth_cache_requests_total': ('counter', "Token authentication cache lookups."),
+}
+BUCKETS = {
+    'melar_http_request_duration_seconds': LATENCY_BUCKETS,
+    'melar_db_queries_per_request': QUERY_COUNT_BUCKETS,
+    'melar_db_time_per_request_seconds': LATENCY_BUCKETS,
+}
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'MELAR_METRICS', {})}
+
+
+class Registry:
+    """
+    Counters and histograms of this process. Labels are stored as sorted (name, value) tuples.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.last_flush = 0.0
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += amount
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = BUCKETS[name]
+        with self.lock:
+            # [jumlah per bucket (tidak kumulatif)..., +Inf, sum]
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()]
+        # Statistik cache disimpan per proses oleh modulnya masing-masing; salin nilainya apa adanya
+        for name, stats in (('melar_response_cache_requests_total', response_cache_stats()),
+                            ('melar_auth_cache_requests_total', auth_cache_stats())):
+            for result in ('hits', 'misses'):
+                counters.append([name, [['result', result]], stats[result]])
+        return {'counters': counters, 'histograms': histograms}
+
+    def flush(self, force=False):
+        directory = metrics_settings()['DIR']
+        now = time.monotonic()
+        if not directory or (not force and now - self.last_flush < metrics_settings()['FLUSH_INTERVAL']):
+            return
+        self.last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temporary, path)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.last_flush = 0.0
+
+
+registry = Registry()
+
+
+def collect_snapshots():
+    """
+    This process's live snapshot plus the files written by the other worker processes.
+    """
+    snapshots = [registry.snapshot()]
+    directory = metrics_settings()['DIR']
+    if directory:
+        own = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            if path == own:
+                continue
+            try:
+                with open(path) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                continue # Proses lain sedang menulis ulang filenya; lewati scrape ini
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = list(values)
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in items) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    counters, histograms = merge_snapshots(collect_snapshots())
+    lines = []
+
+    def header(name, kind=None, text=None):
+        kind, text = HELP.get(name, (kind, text))
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for name in sorted({name for name, _ in counters}):
+        header(name)
+        for (key_name, labels), value in sorted(counters.items()):
+            if key_name == name:
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+
+    for name in sorted({name for name, _ in histograms}):
+        header(name)
+        buckets = BUCKETS[name]
+        for (key_name, labels), values in sorted(histograms.items()):
+            if key_name != name:
+                continue
+            cumulative = 0
+            bounds = [_number(float(bound)) for bound in buckets] + ['+Inf']
+            for bound, count in zip(bounds, values[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(values[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+
+    for prefix in ('melar_response_cache', 'melar_auth_cache'):
+        hits = counters.get((f'{prefix}_requests_total', (('result', 'hits'),)), 0)
+        misses = counters.get((f'{prefix}_requests_total', (('result', 'misses'),)), 0)
+        header(f'{prefix}_hit_ratio', 'gauge', "Share of lookups served from the cache (all processes).")
+        lines.append(f'{prefix}_hit_ratio {_number(hits / (hits + misses) if hits + misses else 0.0)}')
+
+    header('melar_orders', 'gauge', "Rental orders currently in each status.")
+    for row in RentalOrder.objects.order_by().values('status').annotate(total=Count('id')).order_by('status'):
+        lines.append(f'melar_orders{_labels([("status", row["status"])])} {row["total"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def route_name(request, view_func):
+    initkwargs = getattr(view_func, 'initkwargs', {}) or {}
+    actions = getattr(view_func, 'actions', None)
+    if actions and initkwargs.get('basename'):
+        action = actions.get(request.method.lower())
+        if action:
+            return f"{initkwargs['basename']}-{action}"
+    match = getattr(request, 'resolver_match', None)
+    return (match and match.url_name) or 'other'
+
+
+_sql_usage = ContextVar('melar_metrics_sql_usage', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    usage = _sql_usage.get()
+    if usage is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        usage['queries'] += 1
+        usage['time'] += time.perf_counter() - started
+
+
+def install_query_counter(connection):
+    # Indeks 0: execute_wrapper() sementara melepas wrapper-nya dengan pop() dari ujung list
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+@receiver(connection_created)
+def install_query_counter_on_connect(sender, connection, **kwargs):
+    install_query_counter(connection)
+
+
+class MetricsMiddleware:
+    """
+    Records request count, latency and SQL usage per route.
+    Works as sync and async middleware, so ASGI requests to async views stay on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_settings()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Koneksi yang sudah terbuka sebelum modul ini dimuat tidak memicu connection_created
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        usage = {'queries': 0, 'time': 0.0}
+        token = _sql_usage.set(usage)
+        try:
+            response = self.get_response(request)
+        finally:
+            _sql_usage.reset(token)
+        self.record(request, response, started, usage)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        usage = {'queries': 0, 'time': 0.0}
+        # Koneksi database berbeda per thread; ContextVar ikut ke thread sync_to_async tempat ORM async berjalan
+        token = _sql_usage.set(usage)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _sql_usage.reset(token)
+        self.record(request, response, started, usage)
+        return response
+
+    def record(self, request, response, started, usage):
+        route = getattr(request, '_melar_metrics_route', None) or 'unmatched'
+        registry.inc('melar_http_requests_total', {'route': route, 'method': request.method, 'status': str(response.status_code)})
+        registry.observe('melar_http_request_duration_seconds', {'route': route}, time.perf_counter() - started)
+        registry.observe('melar_db_queries_per_request', {'route': route}, usage['queries'])
+        registry.observe('melar_db_time_per_request_seconds', {'route': route}, usage['time'])
+        registry.flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._melar_metrics_route = route_name(request, view_func)
+        return None
+
+
+@receiver(order_status_changed)
+def count_created_order(sender, order_id, previous_status, status, **kwargs):
+    if previous_status is None:
+        transaction.on_commit(lambda: registry.inc('melar_orders_created_total', {'status': status}))
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, for the configured bearer token or logged-in staff.
+    """
+    token = metrics_settings()['TOKEN']
+    has_token = bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+    if not has_token and not request.user.is_staff:
+        return HttpResponseForbidden()
+    registry.flush(force=True)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# SQL FTS5 disalin dari melar_api.search saat migrasi ini dibuat; migrasi tidak boleh
+# bergantung pada kode aplikasi yang bisa berubah. Trigger yang hilang setelah tabel produk
+# dibangun ulang diperbaiki oleh ensure_product_fts() setiap kali `migrate` selesai.
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS melar_api_appproduct_fts USING fts5("
+    "name, description, content='melar_api_appproduct', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+
+    "CREATE TRIGGER IF NOT EXISTS melar_api_appproduct_fts_ai AFTER INSERT ON melar_api_appproduct BEGIN "
+    "INSERT INTO melar_api_appproduct_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS melar_api_appproduct_fts_ad AFTER DELETE ON melar_api_appproduct BEGIN "
+    "INSERT INTO melar_api_appproduct_fts(melar_api_appproduct_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS melar_api_appproduct_fts_au AFTER UPDATE OF name, description ON melar_api_appproduct BEGIN "
+    "INSERT INTO melar_api_appproduct_fts(melar_api_appproduct_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO melar_api_appproduct_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+
+    "INSERT INTO melar_api_appproduct_fts(melar_api_appproduct_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS melar_api_appproduct_fts_ai",
+    "DROP TRIGGER IF EXISTS melar_api_appproduct_fts_ad",
+    "DROP TRIGGER IF EXISTS melar_api_appproduct_fts_au",
+    "DROP TABLE IF EXISTS melar_api_appproduct_fts",
+]
+
+
+def create_product_fts(apps, schema_editor):
+    # Backend selain SQLite memakai fallback icontains (lihat melar_api/search.py)
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def remove_product_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_product_fts, remove_product_fts),
+    ]
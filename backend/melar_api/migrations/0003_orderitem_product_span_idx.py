@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0002_product_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['product', 'start_date', 'end_date'], name='orderitem_product_span_idx'),
+        ),
+    ]
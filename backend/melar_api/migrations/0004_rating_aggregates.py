@@ -0,0 +1,68 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:59
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+
+# Salinan melar_api.aggregates.recompute_ratings saat migrasi ini dibuat;
+# migrasi tidak boleh bergantung pada kode aplikasi yang bisa berubah
+def _aggregate_subquery(queryset, group_field, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_field).annotate(value=aggregate).values('value')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def _rating_fields(reviews, group_field):
+    rating_sum = _aggregate_subquery(reviews, group_field, Sum('rating'))
+    rating_count = _aggregate_subquery(reviews, group_field, Count('id'))
+    return {
+        'rating_sum': rating_sum,
+        'rating_count': rating_count,
+        'rating': Cast(rating_sum, FloatField()) / Greatest(rating_count, 1),
+    }
+
+
+def backfill_ratings(apps, schema_editor):
+    ProductReview = apps.get_model('melar_api', 'ProductReview')
+    apps.get_model('melar_api', 'AppProduct').objects.update(
+        **_rating_fields(ProductReview.objects.filter(product=OuterRef('pk')), 'product')
+    )
+    apps.get_model('melar_api', 'Shop').objects.update(
+        **_rating_fields(ProductReview.objects.filter(product__shop=OuterRef('pk')), 'product__shop')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0003_orderitem_product_span_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appproduct',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='appproduct',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
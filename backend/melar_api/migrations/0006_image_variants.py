@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0005_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:19
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# Salinan melar_api.aggregates.COUNTED_STATUSES saat migrasi ini dibuat;
+# migrasi tidak boleh bergantung pada kode aplikasi yang bisa berubah
+COUNTED_STATUSES = ('confirmed', 'active', 'completed')
+BATCH_SIZE = 1000
+
+
+def backfill_daily_stats(apps, schema_editor):
+    OrderItem = apps.get_model('melar_api', 'OrderItem')
+    ShopDailyStat = apps.get_model('melar_api', 'ShopDailyStat')
+    totals = defaultdict(lambda: {'revenue': Decimal('0'), 'rentals': 0, 'units': 0, 'rental_days': 0})
+    rows = OrderItem.objects.filter(order__status__in=COUNTED_STATUSES).order_by().values_list(
+        'product__shop_id', 'product_id', 'order__created_at', 'quantity',
+        'price_per_day_at_rental', 'start_date', 'end_date',
+    )
+    for shop_id, product_id, created_at, quantity, price_per_day, start_date, end_date in rows.iterator(chunk_size=BATCH_SIZE):
+        days = (end_date - start_date).days + 1
+        row = totals[(shop_id, product_id, timezone.localdate(created_at))]
+        row['revenue'] += price_per_day * days * quantity
+        row['rentals'] += 1
+        row['units'] += quantity
+        row['rental_days'] += days * quantity
+    ShopDailyStat.objects.bulk_create([
+        ShopDailyStat(shop_id=shop_id, product_id=product_id, day=day, **values)
+        for (shop_id, product_id, day), values in totals.items()
+    ], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rentals', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('rental_days', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='melar_api.appproduct')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='melar_api.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', 'day'], name='shopdailystat_shop_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('shop', 'product', 'day'), name='shopdailystat_shop_product_day_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
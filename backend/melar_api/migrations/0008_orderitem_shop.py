@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_order_item_shop(apps, schema_editor):
+    AppProduct = apps.get_model('melar_api', 'AppProduct')
+    OrderItem = apps.get_model('melar_api', 'OrderItem')
+    OrderItem.objects.update(shop_id=models.Subquery(
+        AppProduct.objects.filter(pk=models.OuterRef('product_id')).values('shop_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0007_shop_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='shop',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='melar_api.shop'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['shop', 'order'], name='orderitem_shop_order_idx'),
+        ),
+        migrations.RunPython(backfill_order_item_shop, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0008_orderitem_shop'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appproduct',
+            index=models.Index(fields=['created_at'], name='appproduct_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appproduct',
+            index=models.Index(fields=['updated_at'], name='appproduct_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appproduct',
+            index=models.Index(fields=['shop', 'created_at'], name='appproduct_shop_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appproduct',
+            index=models.Index(fields=['category', 'available', 'price'], name='appproduct_cat_avail_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productimage',
+            index=models.Index(fields=['product', 'order'], name='productimage_product_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['created_at'], name='productreview_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['product', 'created_at'], name='productreview_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalorder',
+            index=models.Index(fields=['created_at'], name='rentalorder_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalorder',
+            index=models.Index(fields=['user', 'created_at'], name='rentalorder_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalorder',
+            index=models.Index(fields=['status'], name='rentalorder_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['created_at'], name='shop_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['updated_at'], name='shop_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:52
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Salinan melar_api.aggregates.RENTAL_COUNTED_STATUSES saat migrasi ini dibuat;
+# migrasi tidak boleh bergantung pada kode aplikasi yang bisa berubah
+RENTAL_COUNTED_STATUSES = ('active', 'completed')
+
+
+def _count_subquery(queryset, group_field):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_field).annotate(value=Count('id')).values('value')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def backfill_rental_counters(apps, schema_editor):
+    AppProduct = apps.get_model('melar_api', 'AppProduct')
+    Shop = apps.get_model('melar_api', 'Shop')
+    counted = apps.get_model('melar_api', 'OrderItem').objects.filter(order__status__in=RENTAL_COUNTED_STATUSES)
+    AppProduct.objects.update(total_individual_rentals=_count_subquery(counted.filter(product=OuterRef('pk')), 'product'))
+    Shop.objects.update(total_rentals=_count_subquery(counted.filter(product__shop=OuterRef('pk')), 'product__shop'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0010_reservation_holds'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appproduct',
+            index=models.Index(fields=['total_individual_rentals'], name='appproduct_rentals_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['total_rentals'], name='shop_rentals_idx'),
+        ),
+        migrations.RunPython(backfill_rental_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:45
+
+import datetime
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Salinan melar_api.aggregates.COUNTED_STATUSES saat migrasi ini dibuat;
+# migrasi tidak boleh bergantung pada kode aplikasi yang bisa berubah
+COUNTED_STATUSES = ('confirmed', 'active', 'completed')
+BATCH_SIZE = 1000
+
+
+def backfill_rental_day_stats(apps, schema_editor):
+    OrderItem = apps.get_model('melar_api', 'OrderItem')
+    ShopRentalDayStat = apps.get_model('melar_api', 'ShopRentalDayStat')
+    totals = defaultdict(int)
+    rows = OrderItem.objects.filter(order__status__in=COUNTED_STATUSES).order_by().values_list(
+        'product__shop_id', 'product_id', 'quantity', 'start_date', 'end_date',
+    )
+    for shop_id, product_id, quantity, start_date, end_date in rows.iterator(chunk_size=BATCH_SIZE):
+        day = start_date
+        while day <= end_date:
+            totals[(shop_id, product_id, day)] += quantity
+            day += datetime.timedelta(days=1)
+    ShopRentalDayStat.objects.bulk_create([
+        ShopRentalDayStat(shop_id=shop_id, product_id=product_id, day=day, units=units)
+        for (shop_id, product_id, day), units in totals.items()
+    ], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('melar_api', '0011_rental_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopRentalDayStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rental_day_stats', to='melar_api.appproduct')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rental_day_stats', to='melar_api.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', 'day'], name='shoprentalday_shop_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('shop', 'product', 'day'), name='shoprentalday_shop_product_day_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rental_day_stats, migrations.RunPython.noop),
+    ]
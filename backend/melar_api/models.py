@@ -1,7 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+
+from .signals import order_status_changed
 # import uuid # Aktifkan jika Anda memutuskan untuk menggunakan UUID untuk ID kustom
 
 # Model untuk Profil Pengguna Tambahan
@@ -44,6 +49,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     # image = models.ImageField(upload_to='category_images/', null=True, blank=True) # Opsional
+    updated_at = models.DateTimeField(auto_now=True) # Untuk header Last-Modified/ETag
 
     class Meta:
         verbose_name_plural = "Categories" # Perbaikan untuk penamaan jamak di admin
@@ -51,6 +57,20 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class ShopQuerySet(models.QuerySet):
+    def with_product_count(self):
+        """
+        Annotates `product_count` with a correlated COUNT subquery over the AppProduct shop index,
+        so listing shops never has to load their product rows.
+        """
+        product_counts = (
+            AppProduct.objects.filter(shop=models.OuterRef('pk'))
+            .order_by().values('shop').annotate(count=models.Count('id')).values('count')
+        )
+        return self.annotate(product_count=Coalesce(
+            models.Subquery(product_counts, output_field=models.IntegerField()), 0
+        ))
+
 # Model untuk Toko (Shop)
 class Shop(models.Model):
     # Menggunakan OneToOneField jika satu user hanya boleh punya satu toko
@@ -59,8 +79,12 @@ class Shop(models.Model):
     description = models.TextField()
     location = models.CharField(max_length=255) # Misal: "Jakarta Selatan, ID"
     rating = models.FloatField(default=0.0)
-    total_rentals = models.IntegerField(default=0)
+    # Agregat ulasan semua produk toko, dijaga oleh signal ProductReview (rating = rating_sum / rating_count)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    total_rentals = models.IntegerField(default=0) # Dijaga oleh melar_api/counters.py
     image = models.ImageField(upload_to='shop_images/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True) # Diisi oleh melar_api/thumbnails.py
     categories = models.ManyToManyField(Category, related_name='shops_in_category', blank=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     address = models.CharField(max_length=255, blank=True, null=True)
@@ -69,6 +93,15 @@ class Shop(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShopQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='shop_created_idx'), # Urutan default daftar toko
+            models.Index(fields=['updated_at'], name='shop_updated_idx'), # Validator ETag/Last-Modified
+            models.Index(fields=['total_rentals'], name='shop_rentals_idx'), # ?ordering=-total_rentals
+        ]
+
     def __str__(self):
         return self.name
 
@@ -80,12 +113,32 @@ class AppProduct(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2) # Harga per hari
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='products_in_category')
     rating = models.FloatField(default=0.0)
+    # Agregat ulasan produk, dijaga oleh signal ProductReview (rating = rating_sum / rating_count)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
     available = models.BooleanField(default=True) # Status utama ketersediaan
+    # Jumlah unit yang bisa disewa bersamaan pada hari yang sama (dicek oleh melar_api/availability.py).
+    # Kosong = stok tidak dilacak: setiap rentang tanggal hanya bisa dipesan satu order, berapa pun quantity-nya
+    stock_quantity = models.PositiveIntegerField(null=True, blank=True)
     # 'status' dan 'rentals' per produk bisa dihitung atau ditambahkan jika sangat sering diakses
-    total_individual_rentals = models.PositiveIntegerField(default=0) # Jumlah berapa kali produk ini dirental
+    total_individual_rentals = models.PositiveIntegerField(default=0) # Jumlah berapa kali produk ini dirental (melar_api/counters.py)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Urutan default daftar produk (-created_at, -id)
+            models.Index(fields=['created_at'], name='appproduct_created_idx'),
+            # MAX(updated_at) + COUNT untuk validator ETag/Last-Modified cukup membaca index ini
+            models.Index(fields=['updated_at'], name='appproduct_updated_idx'),
+            # Daftar produk per toko (/shops/{id}/products/ dan ?shop=)
+            models.Index(fields=['shop', 'created_at'], name='appproduct_shop_created_idx'),
+            # Filter katalog ?category=&available= dengan urutan/rentang harga
+            models.Index(fields=['category', 'available', 'price'], name='appproduct_cat_avail_price_idx'),
+            # ?ordering=-total_individual_rentals (paling sering disewa)
+            models.Index(fields=['total_individual_rentals'], name='appproduct_rentals_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -95,9 +148,14 @@ class ProductImage(models.Model):
     image = models.ImageField(upload_to='product_images/')
     alt_text = models.CharField(max_length=255, blank=True, null=True)
     order = models.PositiveIntegerField(default=0, help_text="Urutan gambar, gambar utama biasanya 0")
+    variants = models.JSONField(default=dict, blank=True) # Thumbnail WebP/JPEG, diisi oleh melar_api/thumbnails.py
 
     class Meta:
         ordering = ['order'] # Urutkan gambar berdasarkan field order
+        indexes = [
+            # Prefetch gambar per produk sudah terurut tanpa sort tambahan
+            models.Index(fields=['product', 'order'], name='productimage_product_order_idx'),
+        ]
 
     def __str__(self):
         return f"Image for {self.product.name} (Order: {self.order})"
@@ -110,10 +168,101 @@ class ProductReview(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='productreview_created_idx'), # Urutan default daftar ulasan
+            models.Index(fields=['product', 'created_at'], name='productreview_product_idx'), # ?product_id=
+        ]
+
     def __str__(self):
         return f"Review for {self.product.name} by {self.user.username}"
 
+
+def rating_update_kwargs(sum_delta, count_delta):
+    """
+    Keyword arguments for a single UPDATE that shifts rating_sum/rating_count by the given
+    deltas and recomputes `rating` from the new values in the same statement.
+    """
+    # Tidak pernah di bawah nol, seperti counter rental (melar_api/counters.py)
+    new_sum = Greatest(F('rating_sum') + sum_delta, 0)
+    new_count = Greatest(F('rating_count') + count_delta, 0)
+    return {
+        'rating_sum': new_sum,
+        'rating_count': new_count,
+        'rating': Cast(new_sum, FloatField()) / Greatest(new_count, 1),
+    }
+
+
+def apply_review_rating(product_id, sum_delta, count_delta):
+    kwargs = rating_update_kwargs(sum_delta, count_delta)
+    with transaction.atomic():
+        AppProduct.objects.filter(pk=product_id).update(**kwargs)
+        Shop.objects.filter(products=product_id).update(**kwargs)
+
+
+# Signal untuk menjaga agregat rating AppProduct dan Shop saat ulasan dibuat, diubah, atau dihapus
+@receiver(pre_save, sender=ProductReview)
+def remember_previous_review_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = ProductReview.objects.filter(pk=instance.pk).values_list(
+            'product_id', 'rating'
+        ).first()
+
+
+@receiver(post_save, sender=ProductReview)
+def update_rating_on_review_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        apply_review_rating(instance.product_id, instance.rating, 1)
+    elif previous != (instance.product_id, instance.rating):
+        previous_product_id, previous_rating = previous
+        if previous_product_id == instance.product_id:
+            apply_review_rating(instance.product_id, instance.rating - previous_rating, 0)
+        else:
+            apply_review_rating(previous_product_id, -previous_rating, -1)
+            apply_review_rating(instance.product_id, instance.rating, 1)
+
+
+@receiver(post_delete, sender=ProductReview)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    apply_review_rating(instance.product_id, -instance.rating, -1)
+
 # Model untuk Pesanan Rental (RentalOrder)
+class RentalOrderQuerySet(models.QuerySet):
+    def transition(self, status):
+        """
+        Moves the orders of this queryset that may go to `status` (RentalOrder.STATUS_TRANSITIONS)
+        there with conditional UPDATEs, one per previous status; other orders are left untouched.
+        Only `status` and `updated_at` are written. Returns {order_id: previous_status} of the moved orders.
+        """
+        if status not in dict(RentalOrder.STATUS_CHOICES):
+            raise ValueError(f"Unknown order status: {status}")
+        sources = [source for source, targets in RentalOrder.STATUS_TRANSITIONS.items() if status in targets]
+        changed = {}
+        with transaction.atomic(using=self.db):
+            # Baris yang dipilih dikunci (Postgres) / transaksi tulis sudah memegang lock (SQLite),
+            # jadi UPDATE bersyarat di bawah mengenai baris yang sama persis
+            rows = self.select_for_update().filter(status__in=sources).order_by().values_list('pk', 'status')
+            by_status = {}
+            for pk, previous in rows:
+                by_status.setdefault(previous, []).append(pk)
+            now = timezone.now()
+            for previous, pks in by_status.items():
+                moved = RentalOrder.objects.filter(pk__in=pks, status=previous).update(status=status, updated_at=now)
+                if moved != len(pks):
+                    # Sebagian baris sudah diubah penulis lain sejak SELECT (SQLite tidak mengunci baris);
+                    # hanya baris dengan updated_at milik UPDATE ini yang benar-benar dipindahkan
+                    pks = RentalOrder.objects.filter(pk__in=pks, status=status, updated_at=now).values_list('pk', flat=True)
+                changed.update(dict.fromkeys(pks, previous))
+            # .update() tidak memicu post_save; kabari listener (rollup statistik, metrik) secara manual
+            for pk, previous in changed.items():
+                order_status_changed.send(sender=RentalOrder, order_id=pk, previous_status=previous, status=status)
+        return changed
+
+
 class RentalOrder(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rental_orders')
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -124,6 +273,14 @@ class RentalOrder(models.Model):
         ('completed', 'Completed'), # Barang sudah dikembalikan
         ('cancelled', 'Cancelled'),
     ]
+    # Perpindahan status yang diizinkan; ubah status lewat RentalOrder.objects.filter(...).transition()
+    STATUS_TRANSITIONS = {
+        'pending': {'confirmed', 'cancelled'},
+        'confirmed': {'active', 'cancelled'},
+        'active': {'completed'},
+        'completed': set(),
+        'cancelled': set(),
+    }
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     # Informasi tambahan yang mungkin Anda perlukan dari formData di CheckoutPage
     first_name = models.CharField(max_length=100, blank=True)
@@ -139,13 +296,44 @@ class RentalOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RentalOrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='rentalorder_created_idx'), # Daftar semua order (admin)
+            models.Index(fields=['user', 'created_at'], name='rentalorder_user_created_idx'), # Order milik user
+            models.Index(fields=['status'], name='rentalorder_status_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.user.username} - {self.status}"
 
+
+# Signal untuk memberi tahu perubahan status order (rollup analitik toko, dll.)
+@receiver(pre_save, sender=RentalOrder)
+def remember_previous_order_status(sender, instance, raw=False, **kwargs):
+    instance._previous_status = None
+    if instance.pk and not raw:
+        instance._previous_status = RentalOrder.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=RentalOrder)
+def announce_order_status_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_status = None if created else getattr(instance, '_previous_status', None)
+    if created or previous_status != instance.status:
+        order_status_changed.send(
+            sender=RentalOrder, order_id=instance.pk, previous_status=previous_status, status=instance.status
+        )
+
 # Model untuk Item dalam Pesanan Rental (OrderItem)
 class OrderItem(models.Model):
     order = models.ForeignKey(RentalOrder, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(AppProduct, on_delete=models.PROTECT) # PROTECT agar produk tidak bisa dihapus jika masih ada di order
+    # Salinan product.shop (denormalisasi) untuk inbox order penjual tanpa join lewat produk.
+    # SET_NULL: menghapus toko tidak boleh ikut menghapus item dari order pembeli
+    shop = models.ForeignKey(Shop, on_delete=models.SET_NULL, related_name='order_items', null=True, editable=False)
     quantity = models.PositiveIntegerField(default=1)
     price_per_day_at_rental = models.DecimalField(max_digits=10, decimal_places=2)
     start_date = models.DateField()
@@ -153,6 +341,14 @@ class OrderItem(models.Model):
     # item_total_price bisa dihitung, atau disimpan jika ada diskon khusus per item
     # item_total_price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Dipakai oleh kalender ketersediaan dan cek bentrok tanggal (melar_api/availability.py)
+            models.Index(fields=['product', 'start_date', 'end_date'], name='orderitem_product_span_idx'),
+            # Dipakai oleh inbox order toko (/shops/{id}/orders/)
+            models.Index(fields=['shop', 'order'], name='orderitem_shop_order_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in Order {self.order.id}"
 
@@ -165,4 +361,84 @@ class OrderItem(models.Model):
 
     @property
     def item_total(self):
-        return self.price_per_day_at_rental * self.rental_duration_days * self.quantity
\ No newline at end of file
+        return self.price_per_day_at_rental * self.rental_duration_days * self.quantity
+
+
+@receiver(pre_save, sender=OrderItem)
+def fill_order_item_shop(sender, instance, raw=False, **kwargs):
+    # bulk_create tidak memicu signal ini; pemanggilnya harus mengisi shop_id sendiri
+    if instance.shop_id is None and instance.product_id and not raw:
+        instance.shop_id = AppProduct.objects.filter(pk=instance.product_id).values_list('shop_id', flat=True).first()
+
+class ReservationHoldQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(expires_at__gt=timezone.now())
+
+
+# Stok yang ditahan sementara selama checkout (melar_api/holds.py). Hold yang kedaluwarsa
+# diabaikan oleh cek kapasitas dan dihapus oleh command expire_holds.
+class ReservationHold(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservation_holds')
+    product = models.ForeignKey(AppProduct, on_delete=models.CASCADE, related_name='reservation_holds')
+    quantity = models.PositiveIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ReservationHoldQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Cek kapasitas per produk dan rentang tanggal, seperti orderitem_product_span_idx
+            models.Index(fields=['product', 'start_date', 'end_date'], name='hold_product_span_idx'),
+            models.Index(fields=['user', 'product'], name='hold_user_product_idx'),
+            # Sweeper expire_holds
+            models.Index(fields=['expires_at'], name='hold_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} held by {self.user_id} until {self.expires_at}"
+
+
+# Rollup harian per toko/produk untuk dashboard toko (diisi oleh melar_api/analytics.py)
+class ShopDailyStat(models.Model):
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='daily_stats')
+    product = models.ForeignKey(AppProduct, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField() # Tanggal order dibuat (zona waktu lokal)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    rentals = models.PositiveIntegerField(default=0) # Jumlah OrderItem
+    units = models.PositiveIntegerField(default=0) # Jumlah unit (quantity)
+    rental_days = models.PositiveIntegerField(default=0) # Hari sewa x quantity
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'product', 'day'], name='shopdailystat_shop_product_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['shop', 'day'], name='shopdailystat_shop_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.shop_id}/{self.product_id} on {self.day}"
+
+
+class ShopRentalDayStat(models.Model):
+    """
+    Units of a product booked on one rental day (orders in aggregates.COUNTED_STATUSES).
+    """
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='rental_day_stats')
+    product = models.ForeignKey(AppProduct, on_delete=models.CASCADE, related_name='rental_day_stats')
+    day = models.DateField() # Hari barang disewa (bukan hari order dibuat)
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'product', 'day'], name='shoprentalday_shop_product_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['shop', 'day'], name='shoprentalday_shop_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.shop_id}/{self.product_id} rented on {self.day}"
@@ -0,0 +1,29 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination on `created_at`, with `id` as a tie-breaker.
+    Each page is fetched with `WHERE created_at < <cursor> LIMIT n+1`, so the cost
+    stays flat no matter how deep the client pages or how large the table grows.
+    Clients can pick a page size with `?page_size=`, capped by MAX_PAGE_SIZE.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        # Dibaca saat request (bukan saat import) agar bisa diubah lewat settings/override_settings
+        config = getattr(settings, 'MELAR_PAGINATION', {})
+        self.page_size = config.get('PAGE_SIZE', 20)
+        self.max_page_size = config.get('MAX_PAGE_SIZE', 100)
+        return super().get_page_size(request)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async variant of DRF's paginate_queryset for the async catalog views.
+        """
+        # Seluruh logika cursor tetap milik DRF; ORM async Django 5.x pun menjalankan query
+        # lewat sync_to_async, jadi hanya pemanggilannya yang dipindah ke thread ORM
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view=view)
@@ -82,7 +82,7 @@ class IsOrderOwner(permissions.BasePermission):
 
         # The owner of the order can access their own order.
         # obj here is a RentalOrder instance, which has a 'user' field.
-        return obj.user == request.user
+        return obj.user_id == request.user.id # Tanpa memuat objek user (tidak ada query tambahan)
 
 # Anda bisa menambahkan kelas permission lain jika dibutuhkan, misalnya:
 # class CanCreateShopPermission(permissions.BasePermission):
@@ -0,0 +1,208 @@
+"""
+Profiling per request (opt-in): jumlah & waktu query SQL, waktu serializer dan waktu render.
+
+Aktif bila MELAR_PROFILING['ENABLED'] (env MELAR_PROFILING=1); hanya sebagian request yang
+diukur sesuai SAMPLE_RATE. Request yang tersampel mendapat header `Server-Timing`
+(terlihat di tab Network browser) dan satu baris log JSON di logger `melar_api.profiling`,
+ditandai dengan nama viewset dan action. Request lain hanya membayar satu `random()`.
+Bila dinonaktifkan, middleware tidak dipasang sama sekali (MiddlewareNotUsed).
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 1.0, # 0..1, bagian request yang diukur
+}
+
+_current = ContextVar('melar_request_profile', default=None)
+
+
+def profiling_settings():
+    return {**DEFAULTS, **getattr(settings, 'MELAR_PROFILING', {})}
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.view = None
+        self.action = None
+
+    def record_sql(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - started
+
+    def server_timing(self):
+        return ', '.join([
+            f'sql;dur={self.sql_time * 1000:.2f};desc="{self.sql_count} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'total;dur={self.total * 1000:.2f}',
+        ])
+
+    def as_dict(self, request, response):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': self.view,
+            'action': self.action,
+            'total_ms': round(self.total * 1000, 3),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'serializer_ms': round(self.serializer_time * 1000, 3),
+            'render_ms': round(self.render_time * 1000, 3),
+        }
+
+
+@contextmanager
+def serializer_timer():
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serializer_time += time.perf_counter() - started
+
+
+class ProfiledListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+
+class ProfiledSerializerMixin:
+    """
+    Adds the time spent building `serializer.data` (including `many=True` lists) to the
+    request profile. Nested serializers are covered by their parent's timing.
+    """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = ProfiledListSerializer
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+
+def record_sql(execute, sql, params, many, context):
+    # Dipasang permanen di setiap koneksi; hanya mencatat selama ada request yang diprofil
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.record_sql(execute, sql, params, many, context)
+
+
+def install_sql_recorder(connection):
+    # Indeks 0: execute_wrapper() sementara melepas wrapper-nya dengan pop() dari ujung list
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_sql)
+
+
+@receiver(connection_created)
+def install_sql_recorder_on_connect(sender, connection, **kwargs):
+    if profiling_settings()['ENABLED']:
+        install_sql_recorder(connection)
+
+
+class ProfilingMiddleware:
+    """
+    Measures sampled requests; put it first in MIDDLEWARE so `total` covers the whole stack.
+    Works as sync and async middleware, so ASGI requests to async views stay on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiling_settings()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Koneksi yang sudah terbuka sebelum modul ini dimuat tidak memicu connection_created
+        for connection in connections.all(initialized_only=True):
+            install_sql_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= profiling_settings()['SAMPLE_RATE']:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(profile, request, response)
+
+    async def __acall__(self, request):
+        if random.random() >= profiling_settings()['SAMPLE_RATE']:
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        # Koneksi database berbeda per thread; ContextVar ikut ke thread sync_to_async tempat ORM async berjalan
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(profile, request, response)
+
+    def finish(self, profile, request, response):
+        profile.total = time.perf_counter() - profile.started
+        response['Server-Timing'] = profile.server_timing()
+        logger.info(json.dumps(profile.as_dict(request, response)))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+            profile.view = view_class.__name__ if view_class else view_func.__name__
+            # ViewSet: `actions` memetakan method HTTP ke nama action (list, retrieve, ...)
+            profile.action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower()) \
+                or getattr(view_class, 'action', None)
+        return None
+
+    def process_template_response(self, request, response):
+        profile = _current.get()
+        if profile is not None:
+            # Response DRF dirender setelah hook ini; callback dipanggil tepat setelah render selesai
+            started = time.perf_counter()
+
+            def rendered(response):
+                profile.render_time += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,111 @@
+"""
+Full-text search untuk AppProduct.
+
+Di SQLite, pencarian memakai tabel virtual FTS5 (`melar_api_appproduct_fts`) yang
+merupakan "external content" dari tabel produk dan dijaga tetap sinkron oleh trigger.
+Backend database lain jatuh kembali ke pencarian `icontains` per kata.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+PRODUCT_TABLE = 'melar_api_appproduct'
+PRODUCT_FTS_TABLE = 'melar_api_appproduct_fts'
+
+_FTS_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {PRODUCT_FTS_TABLE} USING fts5("
+    f"name, description, content='{PRODUCT_TABLE}', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')"
+)
+
+# Trigger dibuat dengan IF NOT EXISTS karena SQLite ikut menghapus trigger ketika
+# Django membangun ulang tabel produk (mis. saat migrasi menambah kolom NOT NULL).
+_FTS_TRIGGERS = {
+    f'{PRODUCT_FTS_TABLE}_ai': (
+        f"CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_ai AFTER INSERT ON {PRODUCT_TABLE} BEGIN "
+        f"INSERT INTO {PRODUCT_FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description); "
+        f"END"
+    ),
+    f'{PRODUCT_FTS_TABLE}_ad': (
+        f"CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_ad AFTER DELETE ON {PRODUCT_TABLE} BEGIN "
+        f"INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}, rowid, name, description) "
+        f"VALUES ('delete', old.id, old.name, old.description); "
+        f"END"
+    ),
+    f'{PRODUCT_FTS_TABLE}_au': (
+        f"CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_au AFTER UPDATE OF name, description ON {PRODUCT_TABLE} BEGIN "
+        f"INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}, rowid, name, description) "
+        f"VALUES ('delete', old.id, old.name, old.description); "
+        f"INSERT INTO {PRODUCT_FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description); "
+        f"END"
+    ),
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def uses_fts(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def ensure_product_fts(using='default'):
+    """
+    Creates the FTS5 table and its sync triggers if they are missing.
+    If any trigger had to be (re)created the index is rebuilt from the product table,
+    because rows written while the trigger was missing are not in the index.
+    Safe to call repeatedly; it runs after every `migrate` (migration 0002 creates the index).
+    """
+    if not uses_fts(using):
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", [PRODUCT_TABLE])
+        if cursor.fetchone() is None:
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [PRODUCT_TABLE]
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        cursor.execute(_FTS_TABLE_SQL)
+        missing = [name for name in _FTS_TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(_FTS_TRIGGERS[name])
+        if missing:
+            cursor.execute(f"INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_product_fts(using='default'):
+    if not uses_fts(using):
+        return
+    with connections[using].cursor() as cursor:
+        for name in _FTS_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {PRODUCT_FTS_TABLE}")
+
+
+def search_terms(text):
+    return _TOKEN_RE.findall(text or '')
+
+
+def build_match_expression(terms):
+    # Setiap kata dikutip (agar operator FTS dari user tidak ikut dieksekusi) dan dijadikan prefix match
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_products(queryset, text):
+    """
+    Restricts an AppProduct queryset to products whose name or description match every word in `text`.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+    if uses_fts(queryset.db):
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {PRODUCT_FTS_TABLE} WHERE {PRODUCT_FTS_TABLE} MATCH %s",
+            (build_match_expression(terms),)
+        ))
+    for term in terms:
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return queryset
@@ -1,7 +1,13 @@
 from rest_framework import serializers
-from django.db import models # <--- TAMBAHKAN BARIS INI
-from .models import UserProfile, Category, Shop, AppProduct, ProductImage, ProductReview, RentalOrder, OrderItem
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from .models import UserProfile, Category, Shop, AppProduct, ProductImage, ProductReview, RentalOrder, OrderItem, ReservationHold
 from django.contrib.auth.models import User
+from .holds import claim_order_stock, place_holds
+from .thumbnails import variant_urls
+from .uploads import add_product_images, upload_settings
+from .fieldsets import SparseFieldsetMixin
+from .profiling import ProfiledSerializerMixin
 
 from dj_rest_auth.registration.serializers import RegisterSerializer as DefaultRegisterSerializer
 
@@ -16,14 +22,26 @@ class CustomRegisterSerializer(DefaultRegisterSerializer):
         # Di sini Anda juga bisa menambahkan logika untuk UserProfile jika perlu
         # UserProfile.objects.filter(user=user).update(...)
 
+def absolute_media_url(request, file):
+    """
+    Absolute URL of a stored file. `build_absolute_uri` reuses the request's cached
+    scheme/host for root-relative paths, so this stays cheap when called per image.
+    """
+    if request is None:
+        return file.url
+    return request.build_absolute_uri(file.url)
+
 # Serializer untuk User (untuk menampilkan info owner/user)
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
+# Kolom yang dibutuhkan UserSerializer saat user di-select_related (dipakai di fieldset_plan)
+USER_COLUMNS = tuple(f'user__{name}' for name in UserSerializer.Meta.fields)
+
 # Serializer untuk UserProfile (jika Anda ingin mengeksposnya secara terpisah)
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True) # Tampilkan detail user, bukan hanya ID
     has_shop = serializers.BooleanField(read_only=True) # Ambil dari property model
     shop_id = serializers.IntegerField(read_only=True) # Ambil dari property model
@@ -34,7 +52,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 
 # Serializer untuk Category
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description'] # Tambahkan field lain jika ada
@@ -45,8 +63,30 @@ class ProductImageSerializer(serializers.ModelSerializer):
         model = ProductImage
         fields = ['id', 'image', 'alt_text', 'order']
 
+def validate_image_uploads(files):
+    # Batas jumlah dan ukuran dibaca saat validasi agar bisa diubah lewat settings MELAR_UPLOADS
+    config = upload_settings()
+    if len(files) > config['MAX_FILES']:
+        raise serializers.ValidationError(f"At most {config['MAX_FILES']} images can be uploaded per request.")
+    too_large = [file.name for file in files if file.size > config['MAX_FILE_SIZE']]
+    if too_large:
+        raise serializers.ValidationError(
+            f"Images may not exceed {config['MAX_FILE_SIZE']} bytes: {', '.join(too_large)}."
+        )
+    return files
+
+# Serializer input untuk upload banyak gambar sekaligus ke produk yang sudah ada
+class ProductImageUploadSerializer(serializers.Serializer):
+    images = serializers.ListField(child=serializers.ImageField(allow_empty_file=False), allow_empty=False)
+    alt_texts = serializers.ListField(
+        child=serializers.CharField(max_length=255, allow_blank=True), required=False, default=list
+    )
+
+    def validate_images(self, value):
+        return validate_image_uploads(value)
+
 # Serializer untuk Shop
-class ShopSerializer(serializers.ModelSerializer):
+class ShopSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     # owner = UserSerializer(read_only=True) # Menampilkan detail owner, bukan hanya ID
     # Jika Anda ingin bisa set owner saat membuat/update Shop via API (misal oleh admin):
     owner_id = serializers.IntegerField(write_only=True, source='owner.id', required=False)
@@ -56,27 +96,51 @@ class ShopSerializer(serializers.ModelSerializer):
     category_ids = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Category.objects.all(), source='categories', write_only=True, required=False
     )
-    product_count = serializers.IntegerField(source='products.count', read_only=True) # Jumlah produk di toko
+    product_count = serializers.SerializerMethodField() # Jumlah produk di toko
 
     class Meta:
         model = Shop
         fields = [
-            'id', 'owner_id', 'owner_username', 'name', 'description', 'location', 'rating',
+            'id', 'owner_id', 'owner_username', 'name', 'description', 'location', 'rating', 'rating_count',
             'total_rentals', 'image', 'categories', 'category_ids', 'phone_number',
             'address', 'zip_code', 'business_type', 'product_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ('rating', 'total_rentals', 'created_at', 'updated_at')
+        read_only_fields = ('rating', 'rating_count', 'total_rentals', 'created_at', 'updated_at')
+
+    # ?fields= / ?expand= (lihat melar_api/fieldsets.py)
+    expandable_fields = {'categories': lambda: serializers.PrimaryKeyRelatedField(many=True, read_only=True)}
+    computed_fields = ('image_variants',)
+    fieldset_plan = {
+        'owner_username': {'only': ('owner__username',), 'select_related': ('owner',)},
+        'categories': {'prefetch_related': ('categories',)},
+        'product_count': {}, # Anotasi, dipasang oleh ShopViewSet.get_queryset
+        'image_variants': {'only': ('image', 'image_variants')},
+    }
+    collapsed_fieldset_plan = {
+        'categories': {'prefetch_related': (Prefetch('categories', queryset=Category.objects.only('id')),)},
+    }
+
+    def get_product_count(self, obj):
+        # Biasanya diisi anotasi Shop.objects.with_product_count(); hitung langsung hanya untuk instance lain (mis. setelah create)
+        count = getattr(obj, 'product_count', None)
+        return count if count is not None else obj.products.count()
 
     # Anda bisa menambahkan validasi atau representasi kustom di sini jika perlu
     # Contoh: Menampilkan URL lengkap untuk gambar
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        if instance.image:
+        if 'image' in representation and instance.image:
             representation['image'] = instance.image.url
+        # URL thumbnail per ukuran + srcset (None selama thumbnail belum selesai dibuat)
+        if self.fieldset.includes('image_variants'):
+            request = self.context.get('request')
+            representation['image_variants'] = variant_urls(
+                instance.image_variants, instance.image, request.build_absolute_uri if request else str
+            )
         return representation
 
 # Serializer untuk AppProduct
-class AppProductSerializer(serializers.ModelSerializer):
+class AppProductSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     shop_id = serializers.IntegerField(write_only=True, source='shop.id') # Untuk set shop saat create/update
     shop_name = serializers.CharField(source='shop.name', read_only=True) # Untuk tampilan
     category_name = serializers.CharField(source='category.name', read_only=True, allow_null=True)
@@ -84,70 +148,94 @@ class AppProductSerializer(serializers.ModelSerializer):
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category', write_only=True, required=False, allow_null=True
     )
-    # Untuk menampilkan ProductImage
-    product_images = ProductImageSerializer(many=True, read_only=True)
-    # Untuk upload ProductImage (jika tidak dihandle terpisah)
-    # uploaded_images = serializers.ListField(
-    #     child=serializers.ImageField(max_length=1000000, allow_empty_file=False, use_url=False),
-    #     write_only=True, required=False
-    # )
+    # Untuk upload ProductImage sekaligus saat membuat produk (request multipart)
+    uploaded_images = serializers.ListField(
+        child=serializers.ImageField(allow_empty_file=False, use_url=False),
+        write_only=True, required=False
+    )
     owner_info = serializers.SerializerMethodField(read_only=True) # Sesuai frontend types.ts
 
     class Meta:
         model = AppProduct
         fields = [
             'id', 'shop_id', 'shop_name', 'name', 'description', 'price', 'category_id', 'category_name',
-            'rating', 'available', 'total_individual_rentals', 'product_images', # 'uploaded_images',
+            'rating', 'rating_count', 'available', 'stock_quantity', 'total_individual_rentals', 'uploaded_images',
             'owner_info', 'created_at', 'updated_at'
         ]
-        read_only_fields = ('rating', 'total_individual_rentals', 'created_at', 'updated_at')
+        read_only_fields = ('rating', 'rating_count', 'total_individual_rentals', 'created_at', 'updated_at')
+
+    # ?fields= / ?expand= (lihat melar_api/fieldsets.py). Jika diciutkan: owner_info -> id toko,
+    # category -> id kategori, images -> daftar id ProductImage
+    expandable_fields = {
+        'owner_info': lambda: serializers.IntegerField(source='shop_id', read_only=True),
+        'category': None,
+        'images': None,
+    }
+    computed_fields = ('images', 'image_variants', 'category')
+    fieldset_plan = {
+        'shop_name': {'only': ('shop__name',), 'select_related': ('shop',)},
+        'owner_info': {'only': ('shop__name',), 'select_related': ('shop',)},
+        'category_name': {'only': ('category__name',), 'select_related': ('category',)},
+        'category': {'only': ('category__name',), 'select_related': ('category',)},
+        'images': {'prefetch_related': ('product_images',)},
+        'image_variants': {'prefetch_related': ('product_images',)},
+    }
+    collapsed_fieldset_plan = {
+        'owner_info': {'only': ('shop',)},
+        'category': {'only': ('category',)},
+        'images': {'prefetch_related': (Prefetch('product_images', queryset=ProductImage.objects.only('id', 'product')),)},
+    }
 
     def get_owner_info(self, obj):
         return {
-            'id': obj.shop.id, # ID Toko
-            'name': obj.shop.name # Nama Toko
+            'id': obj.shop_id, # ID Toko
+            'name': obj.shop.name # Nama Toko (shop di-select_related oleh viewset)
         }
 
-    # Contoh jika Anda ingin menghandle upload gambar saat membuat produk
-    # def create(self, validated_data):
-    #     uploaded_images_data = validated_data.pop('uploaded_images', None)
-    #     product = AppProduct.objects.create(**validated_data)
-    #     if uploaded_images_data:
-    #         for image_data in uploaded_images_data:
-    #             ProductImage.objects.create(product=product, image=image_data)
-    #     return product
+    def validate_uploaded_images(self, value):
+        return validate_image_uploads(value)
+
+    def create(self, validated_data):
+        uploaded_images_data = validated_data.pop('uploaded_images', None)
+        with transaction.atomic():
+            product = super().create(validated_data)
+            add_product_images(product, uploaded_images_data)
+        return product
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        # Mengubah format product_images agar sesuai dengan frontend yang mengharapkan array string URL
-        if instance.product_images.exists():
-            request = self.context.get('request')
-            representation['images'] = [request.build_absolute_uri(img.image.url) for img in instance.product_images.all()]
-        else:
-            representation['images'] = [] # Frontend mengharapkan array string untuk images
-        # Hapus field product_images jika frontend tidak membutuhkannya dan hanya butuh 'images'
-        if 'product_images' in representation:
-            del representation['product_images']
+        fieldset = self.fieldset
+        # Frontend mengharapkan 'images' berupa array string URL (bukan objek ProductImage).
+        # Selalu lewat .all() agar memakai hasil prefetch_related('product_images') (tanpa query tambahan per produk)
+        request = self.context.get('request')
+        if fieldset.includes('images'):
+            if fieldset.expands('images'):
+                representation['images'] = [absolute_media_url(request, img.image) for img in instance.product_images.all()]
+            else:
+                representation['images'] = [img.pk for img in instance.product_images.all()]
+        # Sejajar dengan 'images': URL thumbnail per ukuran + srcset, atau None jika belum dibuat
+        if fieldset.includes('image_variants'):
+            url_builder = request.build_absolute_uri if request else str
+            representation['image_variants'] = [
+                variant_urls(img.variants, img.image, url_builder) for img in instance.product_images.all()
+            ]
 
         # Frontend type untuk category adalah string, bukan objek
-        if instance.category:
-            representation['category'] = instance.category.name
-        else:
-            representation['category'] = None # atau string kosong jika lebih sesuai
+        if fieldset.includes('category'):
+            if not fieldset.expands('category'):
+                representation['category'] = instance.category_id
+            elif instance.category:
+                representation['category'] = instance.category.name
+            else:
+                representation['category'] = None # atau string kosong jika lebih sesuai
 
         # Frontend type untuk owner adalah object {id, name}
         # sudah dihandle oleh get_owner_info dan owner_info field
 
-        # Tambahkan representasi owner dari types.ts
-        # representation['owner'] = {
-        #     'id': instance.shop.id,
-        #     'name': instance.shop.name
-        # }
-
         return representation
 
 # Serializer untuk ProductReview
-class ProductReviewSerializer(serializers.ModelSerializer):
+class ProductReviewSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True) # Menampilkan detail user
     # Jika Anda ingin user bisa membuat review dengan mengirim user_id:
     # user_id = serializers.IntegerField(write_only=True, source='user.id')
@@ -157,6 +245,13 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'user', 'rating', 'comment', 'created_at']
         read_only_fields = ('created_at',)
 
+    # ?fields= / ?expand= (lihat melar_api/fieldsets.py)
+    expandable_fields = {'user': lambda: serializers.PrimaryKeyRelatedField(read_only=True)}
+    fieldset_plan = {
+        'user': {'only': USER_COLUMNS, 'select_related': ('user',)},
+    }
+    collapsed_fieldset_plan = {'user': {'only': ('user',)}}
+
     # Validasi untuk rating (misalnya 1-5)
     def validate_rating(self, value):
         if not 1 <= value <= 5:
@@ -175,13 +270,49 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
     def get_product_image(self, obj):
         request = self.context.get('request')
-        first_image = obj.product.product_images.first()
+        # Ambil dari hasil prefetch (items__product__product_images), bukan .first() yang bisa memicu query baru
+        images = obj.product.product_images.all()
+        first_image = images[0] if images else None
         if request and first_image and first_image.image:
-            return request.build_absolute_uri(first_image.image.url)
+            return absolute_media_url(request, first_image.image)
         return None # atau URL placeholder
 
+# Serializer untuk validasi satu item di order_items_data (input checkout)
+class OrderItemInputSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({"end_date": "End date must be on or after start date."})
+        return attrs
+
+def validate_line_items(value):
+    """
+    Validates every line item and loads all referenced products with a single query.
+    Each returned item carries its `product` instance.
+    """
+    item_serializer = OrderItemInputSerializer(data=value, many=True)
+    item_serializer.is_valid(raise_exception=True)
+    items = item_serializer.validated_data
+
+    products = AppProduct.objects.in_bulk({item['product_id'] for item in items})
+    errors = []
+    for item in items:
+        product = products.get(item['product_id'])
+        if product is None:
+            errors.append({"product_id": [f"Product {item['product_id']} does not exist."]})
+        else:
+            item['product'] = product
+            errors.append({})
+    if any(errors):
+        raise serializers.ValidationError(errors)
+    return items
+
 # Serializer untuk RentalOrder
-class RentalOrderSerializer(serializers.ModelSerializer):
+class RentalOrderSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     items = OrderItemSerializer(many=True, read_only=True) # Nested serializer untuk OrderItem
     # Untuk membuat order, kita akan mengharapkan daftar item ID, quantity, start_date, end_date
@@ -197,7 +328,26 @@ class RentalOrderSerializer(serializers.ModelSerializer):
             'billing_address', 'billing_city', 'billing_state', 'billing_zip',
             'payment_reference', 'order_items_data'
         ]
-        read_only_fields = ('total_price', 'created_at', 'updated_at') # Total price akan dihitung di backend
+        # Total price dihitung di backend; status hanya berubah lewat RentalOrderQuerySet.transition()
+        # (cancel-order, transition, bulk-transition, action admin) agar mengikuti STATUS_TRANSITIONS
+        read_only_fields = ('total_price', 'status', 'created_at', 'updated_at')
+
+    # ?fields= / ?expand= (lihat melar_api/fieldsets.py). Jika diciutkan: user -> id, items -> daftar id OrderItem
+    expandable_fields = {
+        'user': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'items': lambda: serializers.PrimaryKeyRelatedField(many=True, read_only=True),
+    }
+    fieldset_plan = {
+        'user': {'only': USER_COLUMNS, 'select_related': ('user',)},
+        'items': {'prefetch_related': ('items__product__product_images',)},
+    }
+    collapsed_fieldset_plan = {
+        'user': {'only': ('user',)},
+        'items': {'prefetch_related': (Prefetch('items', queryset=OrderItem.objects.only('id', 'order')),)},
+    }
+
+    def validate_order_items_data(self, value):
+        return validate_line_items(value)
 
     def create(self, validated_data):
         order_items_data = validated_data.pop('order_items_data', [])
@@ -208,42 +358,55 @@ class RentalOrderSerializer(serializers.ModelSerializer):
         # Hitung total_price berdasarkan order_items_data di backend untuk keamanan
         calculated_total_price = 0
         items_to_create = []
-
         for item_data in order_items_data:
-            product = AppProduct.objects.get(id=item_data['product_id'])
-            quantity = item_data['quantity']
-            start_date = item_data['start_date']
-            end_date = item_data['end_date']
-            
-            # Hitung durasi rental
-            s_date = models.DateField().to_python(start_date) # Konversi string ke objek date
-            e_date = models.DateField().to_python(end_date)
-            duration_days = (e_date - s_date).days + 1
-            
-            price_per_day = product.price
-            item_total = price_per_day * duration_days * quantity
-            calculated_total_price += item_total
-            
+            product = item_data['product']
+            duration_days = (item_data['end_date'] - item_data['start_date']).days + 1
+            calculated_total_price += product.price * duration_days * item_data['quantity']
             items_to_create.append(
                 OrderItem(
                     product=product,
-                    quantity=quantity,
-                    price_per_day_at_rental=price_per_day,
-                    start_date=start_date,
-                    end_date=end_date
+                    shop_id=product.shop_id, # bulk_create melewati signal pre_save yang biasanya mengisinya
+                    quantity=item_data['quantity'],
+                    price_per_day_at_rental=product.price,
+                    start_date=item_data['start_date'],
+                    end_date=item_data['end_date']
                     # order akan di-set setelah RentalOrder dibuat
                 )
             )
 
-        validated_data['total_price'] = calculated_total_price
-        order = RentalOrder.objects.create(**validated_data)
+        # Semua langkah di bawah dijalankan dalam satu transaksi agar tidak ada order yang setengah jadi
+        with transaction.atomic():
+            # Tolak rental yang melebihi stok produk pada tanggalnya (kecuali sudah ditahan lewat hold)
+            claim_order_stock(user, order_items_data)
+
+            validated_data['total_price'] = calculated_total_price
+            order = RentalOrder.objects.create(**validated_data)
+            for item_instance in items_to_create:
+                item_instance.order = order
+            OrderItem.objects.bulk_create(items_to_create)
+
+        # Siapkan relasi untuk response dengan jumlah query yang tetap, berapa pun jumlah itemnya
+        prefetch_related_objects([order], 'items__product__product_images')
+        return order
 
-        for item_instance in items_to_create:
-            item_instance.order = order
-            item_instance.save()
-            # Kurangi stok produk atau tandai sebagai tidak tersedia jika perlu
-            # product = item_instance.product
-            # product.available = False # Atau kurangi stok
-            # product.save()
 
-        return order
\ No newline at end of file
+class ReservationHoldSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ReservationHold
+        fields = ['id', 'product_id', 'quantity', 'start_date', 'end_date', 'expires_at', 'created_at']
+        read_only_fields = fields
+
+
+class CheckoutHoldSerializer(serializers.Serializer):
+    """
+    Starts a checkout: holds every cart item for MELAR_HOLDS['TTL'] seconds (see melar_api/holds.py).
+    """
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_items(self, value):
+        return validate_line_items(value)
+
+    def create(self, validated_data):
+        return place_holds(self.context['request'].user, validated_data['items'])
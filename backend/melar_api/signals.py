@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Dikirim setiap kali status sebuah RentalOrder berubah (termasuk saat order dibuat).
+# Argumen: order_id, previous_status (None untuk order baru), status.
+order_status_changed = Signal()
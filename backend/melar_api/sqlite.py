@@ -0,0 +1,63 @@
+"""
+Profil SQLite untuk produksi (opt-in lewat MELAR_SQLITE_PROFILE=production, lihat settings.py).
+
+Setiap koneksi baru diberi PRAGMA lewat signal connection_created:
+- journal_mode=WAL: pembaca tidak lagi diblokir oleh penulis (dan sebaliknya).
+- busy_timeout: penulis menunggu giliran alih-alih langsung gagal "database is locked".
+- synchronous=NORMAL: aman dengan WAL, fsync hanya saat checkpoint.
+- mmap_size / cache_size / temp_store: pembacaan dari memori.
+
+Penulisan diserialkan di jalur tersendiri: transaksi dibuka dengan BEGIN IMMEDIATE
+(OPTIONS['transaction_mode']), sehingga lock tulis diambil di awal transaksi dan antrean
+penulis dilayani busy_timeout. Dengan BEGIN biasa, transaksi yang membaca lalu menulis bisa
+gagal saat upgrade lock tanpa menunggu sama sekali.
+"""
+import logging
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'PRAGMAS': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 20000, # milidetik
+        'mmap_size': 256 * 1024 * 1024, # byte
+        'cache_size': -64 * 1024, # negatif = KiB, jadi 64 MiB per koneksi
+        'temp_store': 'MEMORY',
+        'journal_size_limit': 64 * 1024 * 1024, # batasi ukuran file -wal setelah checkpoint
+    },
+}
+
+
+def sqlite_settings():
+    config = {**DEFAULTS, **getattr(settings, 'MELAR_SQLITE', {})}
+    config['PRAGMAS'] = {**DEFAULTS['PRAGMAS'], **config['PRAGMAS']}
+    return config
+
+
+def pragma_statements(pragmas):
+    # journal_mode lebih dulu: PRAGMA lain (mis. synchronous) bergantung pada mode journal
+    ordered = sorted(pragmas.items(), key=lambda item: item[0] != 'journal_mode')
+    return [f'PRAGMA {name} = {value}' for name, value in ordered if value is not None]
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    config = sqlite_settings()
+    if not config['ENABLED']:
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(config['PRAGMAS']):
+            cursor.execute(statement)
+        if str(config['PRAGMAS'].get('journal_mode')).upper() == 'WAL':
+            cursor.execute('PRAGMA journal_mode')
+            mode = cursor.fetchone()[0]
+            if mode.lower() != 'wal' and not connection.is_in_memory_db():
+                logger.warning("SQLite database %s stays in %s journal mode instead of WAL", connection.settings_dict['NAME'], mode)
@@ -2,11 +2,45 @@
 
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
 from django.contrib.auth.models import User
-from .models import Category, Shop, AppProduct, ProductImage, UserProfile, ProductReview, RentalOrder, OrderItem
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .models import Category, Shop, AppProduct, ProductImage, UserProfile, ProductReview, RentalOrder, OrderItem, ShopDailyStat, ShopRentalDayStat, ReservationHold
+from .authentication import CachedTokenAuthentication, auth_cache_stats, token_cache_key
+from .cache import get_cache as get_response_cache
+from .db_routers import ReplicaRouter, replica_reads
+from .metrics import registry
+from .holds import release_holds
+from .signals import order_status_changed
+from .counters import buffer as rental_counter_buffer
+from collections import Counter
 from decimal import Decimal # Untuk perbandingan harga yang presisi
 import datetime # Untuk tanggal
+import json
+import logging
+from io import BytesIO, StringIO
+import os
+import re
+import shutil
+import unittest
+import tempfile
+import threading
+import time
+from unittest import mock
+from asgiref.sync import async_to_sync
+from PIL import Image
 
 # Helper function untuk membuat shop
 def create_shop_for_user(client, user, shop_data):
@@ -127,8 +161,8 @@ class ShopAPITests(APITestCase):
         url = reverse('shop-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], self.shop1.name)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['name'], self.shop1.name)
 
     def test_retrieve_shop_unauthenticated(self):
         url = reverse('shop-detail', kwargs={'pk': self.shop1.pk})
@@ -235,10 +269,10 @@ class AppProductAPITests(APITestCase):
         url = reverse('appproduct-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], self.product1.name)
-        self.assertIn('images', response.data[0]) # Serializer harusnya mengembalikan 'images'
-        self.assertIsInstance(response.data[0]['images'], list)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['name'], self.product1.name)
+        self.assertIn('images', response.data['results'][0]) # Serializer harusnya mengembalikan 'images'
+        self.assertIsInstance(response.data['results'][0]['images'], list)
 
 
     def test_retrieve_product_unauthenticated(self):
@@ -355,8 +389,8 @@ class ProductReviewAPITests(APITestCase):
         # List semua review (bisa difilter by product_id di query params)
         response = self.client.get(f"{self.list_create_url}?product_id={self.product.id}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['comment'], "Sangat bagus!")
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['comment'], "Sangat bagus!")
 
     def test_create_review_authenticated(self):
         self.client.force_authenticate(user=self.user2)
@@ -533,4 +567,1864 @@ class RentalOrderAPITests(APITestCase):
 
         # Pastikan order tidak benar-benar tercancel
         order_asli = RentalOrder.objects.get(id=order_id)
-        self.assertEqual(order_asli.status, "pending") # atau status awal saat dibuat
\ No newline at end of file
+        self.assertEqual(order_asli.status, "pending") # atau status awal saat dibuat
+
+class CursorPaginationAPITests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='pagination_owner')
+        self.shop = Shop.objects.create(owner=self.owner, name="Paging Shop", location="Jakarta")
+        self.products = [
+            AppProduct.objects.create(shop=self.shop, name=f"Paged Product {i}", price=Decimal("10.00"))
+            for i in range(5)
+        ]
+
+    def collect_pages(self, url):
+        names = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(item['name'] for item in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return names, pages
+
+    def test_product_list_walks_all_pages_newest_first(self):
+        names, pages = self.collect_pages(f"{reverse('appproduct-list')}?page_size=2")
+        self.assertEqual(pages, 3)
+        self.assertEqual(names, [p.name for p in reversed(self.products)])
+
+    def test_page_size_is_capped(self):
+        with self.settings(MELAR_PAGINATION={'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 3}):
+            response = self.client.get(reverse('appproduct-list'))
+            self.assertEqual(len(response.data['results']), 2)
+            response = self.client.get(f"{reverse('appproduct-list')}?page_size=50")
+            self.assertEqual(len(response.data['results']), 3)
+
+    def test_shop_products_action_is_paginated(self):
+        url = reverse('shop-products', kwargs={'pk': self.shop.pk})
+        names, pages = self.collect_pages(f"{url}?page_size=4")
+        self.assertEqual(pages, 2)
+        self.assertEqual(len(names), 5)
+
+
+class ProductSearchFilterAPITests(APITestCase):
+    def setUp(self):
+        owner_jkt = User.objects.create_user(username='search_owner_jkt')
+        owner_bdg = User.objects.create_user(username='search_owner_bdg')
+        self.category_camera = Category.objects.create(name='Kamera')
+        self.category_tent = Category.objects.create(name='Tenda')
+        self.shop_jkt = Shop.objects.create(owner=owner_jkt, name="Toko Jakarta", location="Jakarta Selatan, ID")
+        self.shop_bdg = Shop.objects.create(owner=owner_bdg, name="Toko Bandung", location="Bandung, ID")
+        self.camera = AppProduct.objects.create(
+            shop=self.shop_jkt, name="Kamera Mirrorless", description="Lensa kit 18-55mm",
+            price=Decimal("75.00"), category=self.category_camera
+        )
+        self.tent = AppProduct.objects.create(
+            shop=self.shop_bdg, name="Tenda Dome 4 Orang", description="Tahan air, cocok untuk camping",
+            price=Decimal("30.00"), category=self.category_tent, available=False
+        )
+        self.url = reverse('appproduct-list')
+
+    def names(self, query):
+        response = self.client.get(f"{self.url}?{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [item['name'] for item in response.data['results']]
+
+    def test_search_matches_name_and_description_prefix(self):
+        self.assertEqual(self.names("search=mirror"), [self.camera.name])
+        self.assertEqual(self.names("search=camping"), [self.tent.name])
+        self.assertEqual(self.names("search=tenda air"), [self.tent.name])
+        self.assertEqual(self.names("search=drone"), [])
+
+    def test_search_index_follows_updates_and_deletes(self):
+        self.camera.name = "Drone Kamera"
+        self.camera.save()
+        self.assertEqual(self.names("search=drone"), [self.camera.name])
+        self.camera.delete()
+        self.assertEqual(self.names("search=drone"), [])
+
+    def test_search_ignores_fts_syntax(self):
+        self.assertEqual(self.names('search="kamera" OR NEAR('), [])
+
+    def test_filters(self):
+        self.assertEqual(self.names(f"category={self.category_tent.id}"), [self.tent.name])
+        self.assertEqual(self.names("category=kamera"), [self.camera.name])
+        self.assertEqual(self.names("min_price=50"), [self.camera.name])
+        self.assertEqual(self.names("max_price=50"), [self.tent.name])
+        self.assertEqual(self.names("available=false"), [self.tent.name])
+        self.assertEqual(self.names(f"shop={self.shop_jkt.id}"), [self.camera.name])
+        self.assertEqual(self.names("location=bandung"), [self.tent.name])
+
+    def test_invalid_filter_value(self):
+        response = self.client.get(f"{self.url}?min_price=murah")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_price', response.data)
+
+    def test_non_finite_and_oversized_values_are_rejected(self):
+        for query, param in [('min_price=NaN', 'min_price'), ('max_price=Infinity', 'max_price'),
+                             ('min_rating=-inf', 'min_rating'), (f'shop={2 ** 63}', 'shop'),
+                             ('category=99999999999999999999', 'category')]:
+            response = self.client.get(f"{self.url}?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+            self.assertIn(param, response.data)
+
+    def test_unicode_digit_category_is_a_name(self):
+        self.assertEqual(self.names("category=²"), [])
+
+    def test_ordering_by_price(self):
+        self.assertEqual(self.names("ordering=price"), [self.tent.name, self.camera.name])
+        self.assertEqual(self.names("ordering=-price"), [self.camera.name, self.tent.name])
+
+
+class ProductAvailabilityAPITests(APITestCase):
+    def setUp(self):
+        self.renter = User.objects.create_user(username='calendar_renter')
+        owner = User.objects.create_user(username='calendar_owner')
+        self.shop = Shop.objects.create(owner=owner, name="Calendar Shop", location="Jakarta")
+        self.product = AppProduct.objects.create(shop=self.shop, name="Proyektor", price=Decimal("40.00"))
+        self.other_product = AppProduct.objects.create(shop=self.shop, name="Layar", price=Decimal("15.00"))
+        self.order = RentalOrder.objects.create(user=self.renter, total_price=Decimal("0"))
+        self.cancelled = RentalOrder.objects.create(user=self.renter, total_price=Decimal("0"), status='cancelled')
+        self.book(self.order, self.product, datetime.date(2025, 6, 3), datetime.date(2025, 6, 5))
+        self.book(self.order, self.product, datetime.date(2025, 6, 6), datetime.date(2025, 6, 7))
+        self.book(self.order, self.product, datetime.date(2025, 6, 20), datetime.date(2025, 7, 2))
+        self.book(self.cancelled, self.product, datetime.date(2025, 6, 10), datetime.date(2025, 6, 12))
+        self.book(self.order, self.other_product, datetime.date(2025, 6, 10), datetime.date(2025, 6, 12))
+        self.url = reverse('appproduct-availability', kwargs={'pk': self.product.pk})
+
+    def book(self, order, product, start, end):
+        return OrderItem.objects.create(
+            order=order, product=product, price_per_day_at_rental=product.price, start_date=start, end_date=end
+        )
+
+    def test_booked_and_free_ranges(self):
+        response = self.client.get(f"{self.url}?from=2025-06-01&to=2025-06-30")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        booked = [(r['start_date'], r['end_date']) for r in response.data['booked']]
+        free = [(r['start_date'], r['end_date']) for r in response.data['free']]
+        self.assertEqual(booked, [
+            (datetime.date(2025, 6, 3), datetime.date(2025, 6, 7)),
+            (datetime.date(2025, 6, 20), datetime.date(2025, 6, 30)),
+        ])
+        self.assertEqual(free, [
+            (datetime.date(2025, 6, 1), datetime.date(2025, 6, 2)),
+            (datetime.date(2025, 6, 8), datetime.date(2025, 6, 19)),
+        ])
+
+    def test_invalid_product_id_is_404(self):
+        response = self.client.get(reverse('appproduct-availability', kwargs={'pk': 'abc'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_range(self):
+        response = self.client.get(f"{self.url}?from=2025-06-10&to=2025-06-01")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f"{self.url}?from=besok")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_overlapping_order_is_rejected(self):
+        self.client.force_authenticate(user=self.renter)
+        order_data = {"order_items_data": [
+            {"product_id": self.product.id, "quantity": 1, "start_date": "2025-06-07", "end_date": "2025-06-09"}
+        ]}
+        response = self.client.post(reverse('rentalorder-list'), order_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('order_items_data', response.data)
+
+    def test_order_in_free_or_cancelled_slot_is_accepted(self):
+        self.client.force_authenticate(user=self.renter)
+        order_data = {"order_items_data": [
+            {"product_id": self.product.id, "quantity": 1, "start_date": "2025-06-10", "end_date": "2025-06-12"}
+        ]}
+        response = self.client.post(reverse('rentalorder-list'), order_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+
+class BatchedOrderCreationAPITests(APITestCase):
+    def setUp(self):
+        self.renter = User.objects.create_user(username='batch_renter')
+        owner = User.objects.create_user(username='batch_owner')
+        shop = Shop.objects.create(owner=owner, name="Batch Shop", location="Jakarta")
+        self.products = [
+            AppProduct.objects.create(shop=shop, name=f"Batch Product {i}", price=Decimal("10.00"))
+            for i in range(6)
+        ]
+        self.url = reverse('rentalorder-list')
+        self.client.force_authenticate(user=self.renter)
+
+    def order_payload(self, products, start=datetime.date(2025, 8, 1)):
+        return {"order_items_data": [
+            {"product_id": p.id, "quantity": 1, "start_date": start.isoformat(),
+             "end_date": (start + datetime.timedelta(days=1)).isoformat()}
+            for p in products
+        ]}
+
+    def test_query_count_does_not_grow_with_items(self):
+        with CaptureQueriesContext(connection) as one_item:
+            response = self.client.post(self.url, self.order_payload(self.products[:1]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        with CaptureQueriesContext(connection) as many_items:
+            response = self.client.post(
+                self.url, self.order_payload(self.products[1:], start=datetime.date(2025, 9, 1)), format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(len(response.data['items']), 5)
+        self.assertEqual(response.data['total_price'], '100.00')
+        self.assertEqual(len(one_item.captured_queries), len(many_items.captured_queries))
+
+    def test_unknown_product_is_a_validation_error(self):
+        payload = self.order_payload(self.products[:1])
+        payload['order_items_data'].append(
+            {"product_id": 999999, "quantity": 1, "start_date": "2025-08-01", "end_date": "2025-08-02"}
+        )
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('product_id', response.data['order_items_data'][1])
+        self.assertEqual(RentalOrder.objects.count(), 0)
+
+    def test_end_date_before_start_date_is_rejected(self):
+        payload = {"order_items_data": [
+            {"product_id": self.products[0].id, "quantity": 1, "start_date": "2025-08-05", "end_date": "2025-08-01"}
+        ]}
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(RentalOrder.objects.count(), 0)
+
+    def test_conflict_leaves_no_partial_order(self):
+        self.client.post(self.url, self.order_payload(self.products[:1]), format='json')
+        response = self.client.post(self.url, self.order_payload(self.products[:3]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(RentalOrder.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 1)
+
+
+class RatingAggregateTests(APITestCase):
+    def setUp(self):
+        self.reviewer1 = User.objects.create_user(username='rating_reviewer1')
+        self.reviewer2 = User.objects.create_user(username='rating_reviewer2')
+        owner = User.objects.create_user(username='rating_owner')
+        self.shop = Shop.objects.create(owner=owner, name="Rating Shop", location="Jakarta")
+        self.product_a = AppProduct.objects.create(shop=self.shop, name="Rated A", price=Decimal("10.00"))
+        self.product_b = AppProduct.objects.create(shop=self.shop, name="Rated B", price=Decimal("10.00"))
+
+    def assertRating(self, obj, rating_sum, rating_count, rating):
+        obj.refresh_from_db()
+        self.assertEqual((obj.rating_sum, obj.rating_count), (rating_sum, rating_count))
+        self.assertAlmostEqual(obj.rating, rating)
+
+    def test_create_edit_delete_keep_aggregates_in_sync(self):
+        review1 = ProductReview.objects.create(product=self.product_a, user=self.reviewer1, rating=5, comment="Mantap")
+        ProductReview.objects.create(product=self.product_a, user=self.reviewer2, rating=2, comment="Kurang")
+        ProductReview.objects.create(product=self.product_b, user=self.reviewer1, rating=4, comment="Oke")
+        self.assertRating(self.product_a, 7, 2, 3.5)
+        self.assertRating(self.shop, 11, 3, 11 / 3)
+
+        review1.rating = 3
+        review1.save()
+        self.assertRating(self.product_a, 5, 2, 2.5)
+        self.assertRating(self.shop, 9, 3, 3.0)
+
+        review1.delete()
+        self.assertRating(self.product_a, 2, 1, 2.0)
+        self.assertRating(self.shop, 6, 2, 3.0)
+
+    def test_review_via_api_updates_product_rating(self):
+        self.client.force_authenticate(user=self.reviewer1)
+        response = self.client.post(reverse('productreview-list'), {'product': self.product_b.id, 'rating': 4, 'comment': "Bagus"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        response = self.client.get(reverse('appproduct-detail', kwargs={'pk': self.product_b.pk}))
+        self.assertEqual(response.data['rating'], 4.0)
+        self.assertEqual(response.data['rating_count'], 1)
+        response = self.client.get(f"{reverse('appproduct-list')}?min_rating=3")
+        self.assertEqual([item['name'] for item in response.data['results']], [self.product_b.name])
+
+    def test_aggregates_never_go_below_zero(self):
+        review = ProductReview.objects.create(product=self.product_a, user=self.reviewer1, rating=5, comment="Mantap")
+        # Agregat yang sudah meleset (mis. di-reset manual) tidak boleh menjadi negatif saat ulasan dihapus
+        AppProduct.objects.update(rating_sum=0, rating_count=0, rating=0)
+        Shop.objects.update(rating_sum=2, rating_count=0, rating=0)
+        review.delete()
+        self.assertRating(self.product_a, 0, 0, 0.0)
+        self.assertRating(self.shop, 0, 0, 0.0)
+
+    def test_reconcile_ratings_command(self):
+        ProductReview.objects.create(product=self.product_a, user=self.reviewer1, rating=5, comment="Mantap")
+        ProductReview.objects.create(product=self.product_b, user=self.reviewer2, rating=3, comment="Biasa")
+        AppProduct.objects.update(rating_sum=0, rating_count=0, rating=0)
+        Shop.objects.update(rating_sum=0, rating_count=0, rating=0)
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.assertRating(self.product_a, 5, 1, 5.0)
+        self.assertRating(self.product_b, 3, 1, 3.0)
+        self.assertRating(self.shop, 8, 2, 4.0)
+
+
+class ProductSerializationQueryBudgetTests(APITestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='budget_owner')
+        self.category = Category.objects.create(name='Budget Category')
+        self.shop = Shop.objects.create(owner=owner, name="Budget Shop", location="Jakarta")
+
+    def create_products(self, count):
+        for i in range(count):
+            product = AppProduct.objects.create(
+                shop=self.shop, name=f"Budget Product {i}", price=Decimal("10.00"), category=self.category
+            )
+            for order in range(2):
+                ProductImage.objects.create(product=product, image=f'product_images/budget_{i}_{order}.jpg', order=order)
+
+    def test_product_list_query_budget(self):
+        self.create_products(3)
+        with self.assertNumQueries(3): # validator ETag, produk (+shop, +category) dan gambar
+            response = self.client.get(reverse('appproduct-list'))
+        self.assertEqual(len(response.data['results']), 3)
+        self.create_products(12)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('appproduct-list'))
+        self.assertEqual(len(response.data['results']), 15)
+        self.assertEqual(len(response.data['results'][0]['images']), 2)
+        self.assertTrue(response.data['results'][0]['images'][0].startswith('http://testserver/'))
+
+    def test_product_detail_query_budget(self):
+        self.create_products(1)
+        product = AppProduct.objects.get()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('appproduct-detail', kwargs={'pk': product.pk}))
+        self.assertEqual(response.data['category'], self.category.name)
+        self.assertEqual(response.data['owner_info'], {'id': self.shop.id, 'name': self.shop.name})
+
+    def test_shop_products_query_budget(self):
+        self.create_products(10)
+        with self.assertNumQueries(3): # toko, produk, gambar
+            response = self.client.get(reverse('shop-products', kwargs={'pk': self.shop.pk}))
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['shop_name'], self.shop.name)
+
+
+class ShopProductCountTests(APITestCase):
+    def setUp(self):
+        self.shops = []
+        for i in range(3):
+            owner = User.objects.create_user(username=f'count_owner_{i}')
+            shop = Shop.objects.create(owner=owner, name=f"Count Shop {i}", location="Jakarta")
+            for j in range(i * 4):
+                AppProduct.objects.create(shop=shop, name=f"Count Product {i}-{j}", price=Decimal("5.00"))
+            self.shops.append(shop)
+
+    def test_shop_list_uses_annotated_count(self):
+        with self.assertNumQueries(3): # validator ETag, toko (+owner, +subquery jumlah produk) dan kategori
+            response = self.client.get(reverse('shop-list'))
+        counts = {item['id']: item['product_count'] for item in response.data['results']}
+        self.assertEqual(counts, {shop.id: i * 4 for i, shop in enumerate(self.shops)})
+
+    def test_shop_detail_product_count(self):
+        response = self.client.get(reverse('shop-detail', kwargs={'pk': self.shops[2].pk}))
+        self.assertEqual(response.data['product_count'], 8)
+
+    def test_product_count_after_create(self):
+        user = User.objects.create_user(username='count_new_owner')
+        self.client.force_authenticate(user=user)
+        response = self.client.post(reverse('shop-list'), {'name': 'Baru', 'description': 'Toko baru', 'location': 'Depok'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['product_count'], 0)
+
+
+class CatalogResponseCacheTests(APITransactionTestCase):
+    # TransactionTestCase: cache hanya dipakai di luar blok atomic (seperti request sungguhan)
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(username='cache_owner')
+        self.category = Category.objects.create(name='Cache Category')
+        self.shop = Shop.objects.create(owner=owner, name="Cache Shop", location="Jakarta")
+        self.product = AppProduct.objects.create(shop=self.shop, name="Cached Product", price=Decimal("10.00"), category=self.category)
+
+    def test_second_anonymous_read_is_served_from_cache(self):
+        url = reverse('appproduct-list')
+        first = self.client.get(url)
+        self.assertNotIn('X-Cache', first)
+        with self.assertNumQueries(1): # hanya query validator ETag/Last-Modified
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+
+    def test_query_string_is_part_of_the_key(self):
+        url = reverse('appproduct-list')
+        self.client.get(url)
+        response = self.client.get(f"{url}?search=tidakada")
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_saving_a_dependency_invalidates(self):
+        url = reverse('appproduct-detail', kwargs={'pk': self.product.pk})
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        ProductImage.objects.create(product=self.product, image='product_images/cache.jpg')
+        response = self.client.get(url)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(len(response.json()['images']), 1)
+        self.category.name = 'Kategori Baru'
+        self.category.save()
+        self.assertEqual(self.client.get(url).json()['category'], 'Kategori Baru')
+
+    def test_authenticated_reads_bypass_cache(self):
+        url = reverse('shop-list')
+        self.client.get(url)
+        self.client.force_authenticate(user=self.shop.owner)
+        self.assertNotIn('X-Cache', self.client.get(url))
+
+    def test_waits_then_computes_when_lock_is_held(self):
+        url = reverse('category-list')
+        with self.settings(MELAR_RESPONSE_CACHE={'WAIT': 0.1, 'POLL_INTERVAL': 0.02}):
+            with mock.patch.object(cache, 'add', return_value=False): # request lain sedang memegang lock
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['name'], self.category.name)
+
+    def test_process_local_cache_is_refused_unless_single_process(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'melar-test'}}
+        with override_settings(CACHES=local, MELAR_SINGLE_PROCESS=False):
+            with self.assertRaises(ImproperlyConfigured):
+                get_response_cache()
+        with override_settings(CACHES=local, MELAR_SINGLE_PROCESS=True):
+            self.assertEqual(self.client.get(reverse('category-list')).status_code, status.HTTP_200_OK)
+
+    def test_tests_use_a_private_cache(self):
+        # Runner test mengganti cache file bersama di tmp, sehingga cache.clear() di sini aman
+        self.assertIsInstance(get_response_cache(), LocMemCache)
+        self.assertTrue(settings.MELAR_SINGLE_PROCESS)
+
+    def test_shop_products_action_is_cached(self):
+        url = reverse('shop-products', kwargs={'pk': self.shop.pk})
+        self.assertNotIn('X-Cache', self.client.get(url))
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['results'][0]['name'], self.product.name)
+
+    def test_async_list_is_served_from_cache(self):
+        url = '/api/v1/async/products/'
+        first = async_to_sync(self.async_client.get)(url)
+        self.assertNotIn('X-Cache', first)
+        second = async_to_sync(self.async_client.get)(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+
+    def test_write_in_a_transaction_invalidates_on_commit(self):
+        url = reverse('appproduct-detail', kwargs={'pk': self.product.pk})
+        self.client.get(url)
+        with transaction.atomic():
+            self.product.name = 'Sudah Commit'
+            self.product.save()
+            # Di dalam transaksi respons tidak disimpan ke cache
+            self.assertEqual(self.client.get(url).json()['name'], 'Sudah Commit')
+        response = self.client.get(url)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response.json()['name'], 'Sudah Commit')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_warm_catalog_cache_command(self):
+        call_command('warm_catalog_cache', '--host=testserver', '--scheme=http', stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('shop-list'))['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(reverse('appproduct-detail', kwargs={'pk': self.product.pk}))['X-Cache'], 'HIT')
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(username='etag_owner')
+        self.category = Category.objects.create(name='ETag Category')
+        self.shop = Shop.objects.create(owner=owner, name="ETag Shop", location="Jakarta")
+        self.product = AppProduct.objects.create(shop=self.shop, name="ETag Product", price=Decimal("10.00"), category=self.category)
+
+    def test_validators_are_sent(self):
+        for url in [reverse('appproduct-list'), reverse('appproduct-detail', kwargs={'pk': self.product.pk}),
+                    reverse('shop-list'), reverse('shop-detail', kwargs={'pk': self.shop.pk}),
+                    reverse('category-list'), reverse('category-detail', kwargs={'pk': self.category.pk})]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            self.assertTrue(response['ETag'].startswith('W/"'), url)
+            self.assertIn('Last-Modified', response)
+
+    def test_if_none_match_returns_304_without_serializing(self):
+        url = reverse('appproduct-detail', kwargs={'pk': self.product.pk})
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_data(self):
+        url = reverse('appproduct-list')
+        etag = self.client.get(url)['ETag']
+        ProductImage.objects.create(product=self.product, image='product_images/etag.jpg')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotEqual(self.client.get(f"{url}?search=etag")['ETag'], response['ETag'])
+
+    def test_retrieve_etag_only_follows_the_object_and_related_rows(self):
+        other_owner = User.objects.create_user(username='etag_other_owner')
+        other_shop = Shop.objects.create(owner=other_owner, name="Toko Lain", location="Bogor")
+        other = AppProduct.objects.create(shop=other_shop, name="Produk Lain", price=Decimal("5.00"))
+        url = reverse('appproduct-detail', kwargs={'pk': self.product.pk})
+        etag = self.client.get(url)['ETag']
+
+        # Tulisan ke produk/toko lain tidak membatalkan ETag produk ini
+        ProductImage.objects.create(product=other, image='product_images/lain.jpg')
+        ProductReview.objects.create(product=other, user=other_owner, rating=5)
+        other_shop.name = 'Toko Lain Baru'
+        other_shop.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Nama toko dan kategori tampil di produk
+        self.shop.name = 'Toko Baru'
+        self.shop.save()
+        etag = self.assertEtagChanged(url, etag)
+        self.category.name = 'Kategori Baru'
+        self.category.save()
+        etag = self.assertEtagChanged(url, etag)
+        ProductImage.objects.create(product=self.product, image='product_images/etag.jpg')
+        self.assertEtagChanged(url, etag)
+
+    def assertEtagChanged(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_list_etag_only_follows_the_requested_page(self):
+        older = AppProduct.objects.create(shop=self.shop, name="Produk Lama", price=Decimal("5.00"))
+        AppProduct.objects.filter(pk=older.pk).update(created_at=timezone.now() - datetime.timedelta(days=1))
+        url = f"{reverse('appproduct-list')}?page_size=1"
+        etag = self.client.get(url)['ETag']
+
+        ProductImage.objects.create(product=older, image='product_images/lama.jpg') # halaman 2
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT', queries[0]['sql'])
+
+        newer = AppProduct.objects.create(shop=self.shop, name="Produk Baru", price=Decimal("7.00"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['id'], newer.pk)
+
+    def test_if_modified_since(self):
+        url = reverse('shop-detail', kwargs={'pk': self.shop.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_missing_object_still_404(self):
+        response = self.client.get(reverse('appproduct-detail', kwargs={'pk': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_lookup_is_404(self):
+        for name in ['appproduct-detail', 'shop-detail', 'category-detail', 'shop-products']:
+            response = self.client.get(reverse(name, kwargs={'pk': 'abc'}))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, name)
+
+    def test_last_modified_follows_change_stamps(self):
+        url = reverse('shop-detail', kwargs={'pk': self.shop.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+        # Ulasan mengubah rating toko lewat .update() tanpa menyentuh updated_at
+        with mock.patch('melar_api.cache.time.time', return_value=time.time() + 5):
+            ProductReview.objects.create(product=self.product, user=self.shop.owner, rating=4)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='token_user')
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('userprofile-detail', kwargs={'pk': self.user.profile.pk})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_query(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertEqual(len(second.captured_queries), len(first.captured_queries) - 1)
+        self.assertFalse(any('authtoken_token' in q['sql'] for q in second.captured_queries))
+        # Cache hit: autentikasi sama sekali tanpa query
+        with self.assertNumQueries(0):
+            user, token = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_invalidates_token(self):
+        self.client.get(self.url)
+        response = self.client.post(reverse('rest_logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_hit_rate_is_reported(self):
+        before = auth_cache_stats()
+        self.client.get(self.url)
+        self.client.get(self.url)
+        after = auth_cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertGreater(after['hit_rate'], 0)
+
+    def test_cached_user_has_no_password_hash(self):
+        self.user.set_password('rahasia-sekali')
+        self.user.save()
+        self.client.get(self.url)
+        cached = cache.get(token_cache_key(self.token.key))
+        self.assertEqual(cached.pk, self.user.pk)
+        self.assertNotIn('password', cached.__dict__)
+
+    def test_process_local_alias_is_not_used(self):
+        caches_setting = {**settings.CACHES, 'auth-local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=caches_setting, MELAR_AUTH_CACHE={'ALIAS': 'auth-local'}, MELAR_SINGLE_PROCESS=False):
+            for _ in range(2):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+                self.assertTrue(any('authtoken_token' in q['sql'] for q in queries.captured_queries))
+
+
+def make_png(name='foto.png', size=(1600, 900)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 80, 40)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ThumbnailPipelineTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, MELAR_THUMBNAILS={'ASYNC': False})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.owner = User.objects.create_user(username='thumb_owner')
+        self.shop = Shop.objects.create(owner=self.owner, name='Toko Thumbnail', location='Bandung')
+        self.category = Category.objects.create(name='Thumbnail')
+        self.product = AppProduct.objects.create(
+            shop=self.shop, category=self.category, name='Kamera', description='-', price=Decimal('10000.00')
+        )
+
+    def test_variants_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=self.product, image=make_png())
+        image.refresh_from_db()
+        self.assertEqual(image.variants['source'], image.image.name)
+        self.assertEqual(set(image.variants['sizes']), {'small', 'medium', 'large'})
+        large = image.variants['sizes']['large']
+        self.assertEqual((large['width'], large['height']), (1280, 720))
+        for entry in image.variants['sizes'].values():
+            for name in (entry['webp'], entry['jpeg']):
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+
+        response = self.client.get(reverse('appproduct-detail', kwargs={'pk': self.product.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        variants = response.data['image_variants'][0]
+        self.assertIn('320w', variants['srcset']['webp'])
+        self.assertTrue(variants['small']['jpeg'].startswith('http://testserver/'))
+
+    def test_small_image_is_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=self.product, image=make_png(size=(200, 100)))
+        image.refresh_from_db()
+        self.assertEqual(image.variants['sizes'], {'small': mock.ANY})
+        self.assertEqual(image.variants['sizes']['small']['width'], 200)
+
+    def test_pending_variants_are_null(self):
+        ProductImage.objects.create(product=self.product, image=make_png()) # on_commit tidak dijalankan
+        response = self.client.get(reverse('appproduct-detail', kwargs={'pk': self.product.pk}))
+        self.assertEqual(response.data['image_variants'], [None])
+
+    def test_backfill_command(self):
+        ProductImage.objects.create(product=self.product, image=make_png())
+        self.shop.image = make_png('toko.png')
+        self.shop.save()
+        out = StringIO()
+        call_command('generate_thumbnails', '--sync', stdout=out)
+        self.assertIn('Generated thumbnails for 2 images', out.getvalue())
+        self.assertTrue(ProductImage.objects.get(product=self.product).variants)
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.image_variants['source'], self.shop.image.name)
+
+
+class ProductImageUploadTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, MELAR_THUMBNAILS={'ASYNC': False})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.owner = User.objects.create_user(username='upload_owner')
+        self.other = User.objects.create_user(username='upload_other')
+        self.shop = Shop.objects.create(owner=self.owner, name='Toko Upload', location='Jakarta')
+        self.product = AppProduct.objects.create(
+            shop=self.shop, name='Tenda', description='-', price=Decimal('50000.00')
+        )
+        ProductImage.objects.create(product=self.product, image=make_png('lama.png', (40, 40)), order=4)
+        self.url = reverse('appproduct-upload-images', kwargs={'pk': self.product.pk})
+
+    def test_upload_many_images_in_one_insert(self):
+        self.client.force_authenticate(user=self.owner)
+        files = [make_png(f'foto{i}.png', (40, 40)) for i in range(3)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                self.url, {'images': files, 'alt_texts': ['depan', 'samping', 'belakang']}, format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([img['order'] for img in response.data], [5, 6, 7])
+        self.assertEqual([img['alt_text'] for img in response.data], ['depan', 'samping', 'belakang'])
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "melar_api_productimage"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.product.product_images.count(), 4)
+        for image in self.product.product_images.filter(order__gte=5):
+            self.assertTrue(os.path.exists(image.image.path))
+
+    def test_files_are_streamed_to_temporary_files(self):
+        self.client.force_authenticate(user=self.owner)
+        from .serializers import validate_image_uploads
+        with mock.patch('melar_api.serializers.validate_image_uploads', wraps=validate_image_uploads) as validate:
+            response = self.client.post(self.url, {'images': [make_png()]}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        uploaded = validate.call_args.args[0]
+        self.assertEqual([type(file).__name__ for file in uploaded], ['TemporaryUploadedFile'])
+
+    def test_only_shop_owner_can_upload(self):
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post(self.url, {'images': [make_png()]}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(MELAR_UPLOADS={'MAX_FILES': 2})
+    def test_too_many_files_rejected(self):
+        self.client.force_authenticate(user=self.owner)
+        files = [make_png(f'foto{i}.png', (40, 40)) for i in range(3)]
+        response = self.client.post(self.url, {'images': files}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('images', response.data)
+        self.assertEqual(self.product.product_images.count(), 1)
+
+    def test_create_product_with_uploaded_images(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(reverse('appproduct-list'), {
+            'shop_id': self.shop.pk, 'name': 'Kompor', 'description': 'Kompor portabel', 'price': '15000.00',
+            'uploaded_images': [make_png('a.png', (40, 40)), make_png('b.png', (40, 40))],
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['images']), 2)
+        product = AppProduct.objects.get(pk=response.data['id'])
+        self.assertEqual(list(product.product_images.values_list('order', flat=True)), [0, 1])
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='fieldset_owner')
+        self.customer = User.objects.create_user(username='fieldset_customer')
+        self.category = Category.objects.create(name='Fieldset')
+        self.shop = Shop.objects.create(owner=self.owner, name='Toko Fieldset', location='Bogor')
+        self.shop.categories.add(self.category)
+        self.products = []
+        for i in range(3):
+            product = AppProduct.objects.create(
+                shop=self.shop, category=self.category, name=f'Produk {i}', description='Panjang sekali', price=Decimal('10.00')
+            )
+            ProductImage.objects.create(product=product, image=f'product_images/fieldset_{i}.jpg')
+            self.products.append(product)
+        self.order = RentalOrder.objects.create(user=self.customer, total_price=Decimal('20.00'))
+        OrderItem.objects.create(
+            order=self.order, product=self.products[0], quantity=1, price_per_day_at_rental=Decimal('10.00'),
+            start_date=datetime.date(2026, 1, 1), end_date=datetime.date(2026, 1, 2)
+        )
+        ProductReview.objects.create(product=self.products[0], user=self.customer, rating=4, comment='Oke')
+
+    def product_select(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "melar_api_appproduct"."id"') and 'LIMIT' in q['sql']]
+
+    def test_product_fields_limit_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('appproduct-list'), {'fields': 'id,name,price'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'price'})
+        self.assertEqual(len(ctx.captured_queries), 2) # validator ETag + produk, tanpa prefetch gambar
+        sql = self.product_select(ctx)[0]
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('melar_api_shop', sql)
+
+    def test_product_ordering_field_stays_loaded(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('appproduct-list'), {'fields': 'id', 'ordering': 'price', 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_product_expand_collapses_relations(self):
+        product = self.products[0]
+        response = self.client.get(reverse('appproduct-detail', kwargs={'pk': product.pk}), {'expand': 'owner_info'})
+        self.assertEqual(response.data['owner_info'], {'id': self.shop.id, 'name': self.shop.name})
+        self.assertEqual(response.data['category'], self.category.id)
+        self.assertEqual(response.data['images'], [product.product_images.get().pk])
+
+        response = self.client.get(reverse('appproduct-detail', kwargs={'pk': product.pk}), {'expand': ''})
+        self.assertEqual(response.data['owner_info'], self.shop.id)
+
+    def test_unknown_field_rejected(self):
+        response = self.client.get(reverse('appproduct-list'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+        response = self.client.get(reverse('appproduct-list'), {'expand': 'price'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', response.data)
+
+    def test_shop_fields_skip_product_count_and_categories(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('shop-list'), {'fields': 'id,name'})
+        self.assertEqual(response.data['results'], [{'id': self.shop.id, 'name': self.shop.name}])
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertFalse(any('COUNT' in q['sql'] and 'melar_api_appproduct' in q['sql'] for q in ctx.captured_queries))
+
+        response = self.client.get(reverse('shop-detail', kwargs={'pk': self.shop.pk}), {'expand': ''})
+        self.assertEqual(response.data['categories'], [self.category.id])
+
+    def test_order_collapsed_items(self):
+        self.client.force_authenticate(user=self.customer)
+        url = reverse('rentalorder-detail', kwargs={'pk': self.order.pk})
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get(url, {'fields': 'id,status,items', 'expand': ''})
+        self.assertEqual(response.data, {'id': self.order.id, 'status': 'pending', 'items': [self.order.items.get().pk]})
+        self.assertLess(len(sparse.captured_queries), len(full.captured_queries))
+
+    def test_review_user_collapsed(self):
+        response = self.client.get(reverse('productreview-list'), {'fields': 'id,user,rating', 'expand': ''})
+        self.assertEqual(response.data['results'][0], {
+            'id': ProductReview.objects.get().id, 'user': self.customer.id, 'rating': 4,
+        })
+
+    def test_fields_ignored_on_writes(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.patch(
+            reverse('appproduct-detail', kwargs={'pk': self.products[0].pk}) + '?fields=id', {'name': 'Baru'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Baru')
+        self.assertIn('images', response.data)
+
+
+class ShopStatsTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='stats_owner')
+        self.customer = User.objects.create_user(username='stats_customer')
+        self.shop = Shop.objects.create(owner=self.owner, name='Toko Statistik', location='Solo')
+        self.camera = AppProduct.objects.create(shop=self.shop, name='Kamera', description='-', price=Decimal('100.00'))
+        self.tent = AppProduct.objects.create(shop=self.shop, name='Tenda', description='-', price=Decimal('50.00'))
+        self.today = timezone.localdate()
+        self.url = reverse('shop-stats', kwargs={'pk': self.shop.pk})
+
+    def create_order(self, items, status='pending'):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = RentalOrder.objects.create(user=self.customer, total_price=Decimal('0'), status=status)
+            for product, quantity, days in items:
+                OrderItem.objects.create(
+                    order=order, product=product, quantity=quantity, price_per_day_at_rental=product.price,
+                    start_date=self.today, end_date=self.today + datetime.timedelta(days=days - 1)
+                )
+        return order
+
+    def set_status(self, order, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = status
+            order.save()
+
+    def test_rollup_follows_status_changes(self):
+        order = self.create_order([(self.camera, 1, 3), (self.tent, 2, 2)])
+        self.assertFalse(ShopDailyStat.objects.exists()) # pending belum dihitung
+        self.assertFalse(ShopRentalDayStat.objects.exists())
+
+        self.set_status(order, 'confirmed')
+        camera = ShopDailyStat.objects.get(product=self.camera)
+        self.assertEqual((camera.revenue, camera.rentals, camera.units, camera.rental_days), (Decimal('300.00'), 1, 1, 3))
+        self.set_status(order, 'active') # Tetap dihitung, tidak dobel
+        self.assertEqual(ShopDailyStat.objects.get(product=self.tent).revenue, Decimal('200.00'))
+
+        self.assertEqual(ShopRentalDayStat.objects.filter(product=self.camera).count(), 3)
+        self.assertEqual(set(ShopRentalDayStat.objects.filter(product=self.tent).values_list('units', flat=True)), {2})
+
+        self.set_status(order, 'cancelled')
+        self.assertEqual(ShopDailyStat.objects.get(product=self.camera).rentals, 0)
+        self.assertEqual(set(ShopRentalDayStat.objects.values_list('units', flat=True)), {0})
+
+    def test_stats_endpoint(self):
+        self.set_status(self.create_order([(self.camera, 1, 3), (self.tent, 2, 2)]), 'confirmed')
+        self.create_order([(self.camera, 1, 5)], status='completed')
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url, {'from': self.today - datetime.timedelta(days=9), 'to': self.today})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        totals = response.data['totals']
+        self.assertEqual(totals['revenue'], Decimal('1000.00'))
+        self.assertEqual(totals['rentals'], 3)
+        self.assertEqual(totals['average_rental_days'], round(12 / 4, 2))
+        # Hanya hari ini yang masuk rentang; tanpa stok yang dilacak tiap produk punya satu unit per hari
+        self.assertEqual((totals['rented_unit_days'], totals['utilisation']), (2, round(2 / 20, 4)))
+        self.assertEqual(len(response.data['revenue_per_day']), 10)
+        self.assertEqual(response.data['revenue_per_day'][-1]['revenue'], Decimal('1000.00'))
+        camera = next(item for item in response.data['products'] if item['product_id'] == self.camera.pk)
+        self.assertEqual((camera['rentals'], camera['rental_days']), (2, 8))
+
+    def test_utilisation_counts_rented_days_within_range(self):
+        self.camera.stock_quantity = 3
+        self.camera.save()
+        self.set_status(self.create_order([(self.camera, 1, 3), (self.tent, 2, 2)]), 'confirmed')
+        self.create_order([(self.camera, 1, 5)], status='completed')
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url, {'from': self.today, 'to': self.today + datetime.timedelta(days=9)})
+        products = {item['product_id']: item for item in response.data['products']}
+        # Kamera: 2+2+2+1+1 unit dari 3 unit x 10 hari; tenda (1 unit, tidak dilacak): 2 dari 10
+        self.assertEqual(products[self.camera.pk]['utilisation'], round(8 / 30, 4))
+        self.assertEqual(products[self.tent.pk]['utilisation'], round(2 / 10, 4))
+        self.assertEqual(response.data['totals']['utilisation'], round(10 / 40, 4))
+        for item in products.values():
+            self.assertLessEqual(item['utilisation'], 1)
+
+    def test_query_count_independent_of_order_history(self):
+        self.client.force_authenticate(user=self.owner)
+        self.create_order([(self.camera, 1, 1)], status='confirmed')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        for _ in range(5):
+            self.create_order([(self.camera, 1, 1), (self.tent, 1, 1)], status='confirmed')
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.url)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertFalse(any('melar_api_orderitem' in q['sql'] for q in many.captured_queries))
+
+    def test_only_owner_can_view(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_shop_id_is_404(self):
+        self.client.force_authenticate(user=self.owner)
+        for name in ['shop-stats', 'shop-orders']:
+            self.assertEqual(self.client.get(reverse(name, kwargs={'pk': 'abc'})).status_code, status.HTTP_404_NOT_FOUND, name)
+
+    def test_rebuild_command(self):
+        self.create_order([(self.camera, 2, 2)], status='confirmed')
+        self.create_order([(self.tent, 1, 1)], status='cancelled')
+        ShopDailyStat.objects.update(revenue=0, rentals=0)
+        ShopRentalDayStat.objects.all().delete()
+        call_command('rebuild_shop_stats', stdout=StringIO())
+        stat = ShopDailyStat.objects.get()
+        self.assertEqual((stat.product_id, stat.revenue, stat.rentals, stat.units), (self.camera.pk, Decimal('400.00'), 1, 2))
+        self.assertEqual(
+            list(ShopRentalDayStat.objects.order_by('day').values_list('product_id', 'day', 'units')),
+            [(self.camera.pk, self.today, 2), (self.camera.pk, self.today + datetime.timedelta(days=1), 2)],
+        )
+
+
+class ShopOrderInboxTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='inbox_owner')
+        self.other_owner = User.objects.create_user(username='inbox_other_owner')
+        self.customer = User.objects.create_user(username='inbox_customer')
+        self.shop = Shop.objects.create(owner=self.owner, name='Toko Inbox', location='Malang')
+        self.other_shop = Shop.objects.create(owner=self.other_owner, name='Toko Lain', location='Malang')
+        self.product = AppProduct.objects.create(shop=self.shop, name='Sepeda', description='-', price=Decimal('30.00'))
+        self.other_product = AppProduct.objects.create(shop=self.other_shop, name='Helm', description='-', price=Decimal('5.00'))
+        self.url = reverse('shop-orders', kwargs={'pk': self.shop.pk})
+        self.day = datetime.date(2026, 3, 1)
+
+    def create_order(self, products, status='pending', offset=0):
+        order = RentalOrder.objects.create(user=self.customer, total_price=Decimal('0'), status=status)
+        start = self.day + datetime.timedelta(days=offset * 10)
+        for product in products:
+            OrderItem.objects.create(
+                order=order, product=product, price_per_day_at_rental=product.price, start_date=start, end_date=start
+            )
+        return order
+
+    def test_inbox_lists_only_own_orders_and_items(self):
+        mixed = self.create_order([self.product, self.other_product])
+        self.create_order([self.other_product], offset=1)
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order['id'] for order in response.data['results']], [mixed.id])
+        self.assertEqual([item['product'] for item in response.data['results'][0]['items']], [self.product.id])
+
+    def test_order_item_shop_is_filled(self):
+        order = self.create_order([self.product])
+        self.assertEqual(order.items.get().shop_id, self.shop.id)
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(reverse('rentalorder-list'), {'order_items_data': [{
+            'product_id': self.other_product.id, 'quantity': 1, 'start_date': '2026-05-01', 'end_date': '2026-05-02',
+        }]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(OrderItem.objects.get(order_id=response.data['id']).shop_id, self.other_shop.id)
+
+    def test_deleting_a_shop_keeps_order_items(self):
+        order = self.create_order([self.product])
+        # Produk sudah pindah toko; item order masih menyimpan toko lama
+        AppProduct.objects.filter(pk=self.product.pk).update(shop=self.other_shop)
+        self.shop.delete()
+        item = order.items.get()
+        self.assertIsNone(item.shop_id)
+        self.assertEqual(item.product_id, self.product.id)
+
+    def test_status_and_date_filters(self):
+        confirmed = self.create_order([self.product], status='confirmed')
+        self.create_order([self.product], status='cancelled')
+        old = self.create_order([self.product], status='confirmed')
+        RentalOrder.objects.filter(pk=old.pk).update(created_at=timezone.now() - datetime.timedelta(days=40))
+        self.client.force_authenticate(user=self.owner)
+
+        response = self.client.get(self.url, {'status': 'confirmed,active'})
+        self.assertEqual({order['id'] for order in response.data['results']}, {confirmed.id, old.id})
+        since = timezone.localdate() - datetime.timedelta(days=7)
+        response = self.client.get(self.url, {'status': 'confirmed', 'from': since})
+        self.assertEqual([order['id'] for order in response.data['results']], [confirmed.id])
+        self.assertEqual(self.client.get(self.url, {'status': 'lost'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pagination_and_query_budget(self):
+        for i in range(5):
+            self.create_order([self.product], offset=i)
+        self.client.force_authenticate(user=self.owner)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        # toko, order (+user), item (+produk), gambar produk
+        self.assertEqual(len(ctx.captured_queries), 4)
+        order_sql = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "melar_api_rentalorder"'))
+        self.assertIn('U0."shop_id" = ', order_sql)
+        self.assertNotIn('melar_api_appproduct', order_sql)
+
+    def test_only_owner_can_view(self):
+        self.client.force_authenticate(user=self.other_owner)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SeedAndBenchmarkCommandTests(APITestCase):
+    seed_args = ['--shops=3', '--products=9', '--orders=30', '--reviews=10', '--images=1', '--anchor-date=2026-01-31']
+
+    def seed(self, *extra):
+        call_command('seed_melar', *self.seed_args, *extra, stdout=StringIO())
+
+    def test_seed_is_consistent_and_reproducible(self):
+        self.seed()
+        self.assertEqual(Shop.objects.count(), 3)
+        self.assertEqual(AppProduct.objects.count(), 9)
+        self.assertEqual(RentalOrder.objects.count(), 30)
+        self.assertEqual(UserProfile.objects.count(), User.objects.count())
+        self.assertFalse(OrderItem.objects.filter(shop__isnull=True).exists())
+        self.assertTrue(User.objects.get(username='seed-admin').check_password('melar-seed'))
+        for order in RentalOrder.objects.prefetch_related('items'):
+            self.assertEqual(order.total_price, sum(item.item_total for item in order.items.all()))
+        # Rating agregat dan rollup ikut diisi
+        self.assertEqual(sum(Shop.objects.values_list('rating_count', flat=True)), 10)
+        self.assertTrue(ShopDailyStat.objects.exists())
+
+        first = list(RentalOrder.objects.order_by('id').values_list('status', 'created_at', 'total_price'))
+        self.assertRaises(CommandError, self.seed) # prefix sudah dipakai
+        self.seed('--prefix=again')
+        second = list(RentalOrder.objects.filter(user__username__startswith='again-').order_by('id')
+                      .values_list('status', 'created_at', 'total_price'))
+        self.assertEqual(first, second)
+
+    def test_benchmark_reports_every_router_route(self):
+        self.seed()
+        out = StringIO()
+        call_command('bench_melar', '--iterations=2', '--warmup=0', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['dataset']['orders'], 30)
+        routes = {route['name']: route for route in report['routes']}
+        self.assertEqual(routes['auth-login']['status'], 200)
+        self.assertNotIn('key', routes['auth-login'])
+        for name in ['appproduct-list', 'appproduct-detail', 'appproduct-availability', 'shop-stats',
+                     'shop-orders', 'rentalorder-list', 'productreview-detail', 'category-list']:
+            self.assertEqual(routes[name]['status'], 200, name)
+            self.assertGreater(routes[name]['bytes'], 0)
+            self.assertLessEqual(routes[name]['p50_ms'], routes[name]['p95_ms'])
+        self.assertEqual(routes['appproduct-list']['auth'], 'anonymous')
+        self.assertEqual(routes['user-list']['auth'], 'token')
+        self.assertGreater(routes['rentalorder-list']['queries']['p50'], 0)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is SQLite specific")
+class QueryPlanRegressionTests(APITestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on every SELECT issued by the hot endpoints and fails when
+    a query falls back to a full table scan (`SCAN <table>` without an index).
+    Ordered index walks (`SCAN ... USING INDEX`) are fine: they stop at the page LIMIT.
+    """
+    # Daftar kategori selalu dikembalikan utuh dan tabelnya kecil
+    FULL_SCAN_ALLOWED = {'melar_api_category'}
+    FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='plan_admin', is_staff=True)
+        self.owner = User.objects.create_user(username='plan_owner')
+        self.customer = User.objects.create_user(username='plan_customer')
+        self.category = Category.objects.create(name='Plan')
+        self.shop = Shop.objects.create(owner=self.owner, name='Toko Plan', location='Medan')
+        self.shop.categories.add(self.category)
+        self.product = AppProduct.objects.create(
+            shop=self.shop, category=self.category, name='Proyektor', description='Proyektor mini', price=Decimal('75.00')
+        )
+        ProductImage.objects.create(product=self.product, image='product_images/plan.jpg')
+        ProductReview.objects.create(product=self.product, user=self.customer, rating=5, comment='Mantap')
+        self.order = RentalOrder.objects.create(user=self.customer, total_price=Decimal('150.00'), status='confirmed')
+        OrderItem.objects.create(
+            order=self.order, product=self.product, price_per_day_at_rental=Decimal('75.00'),
+            start_date=datetime.date(2026, 2, 1), end_date=datetime.date(2026, 2, 2)
+        )
+
+    def query_plans(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append((query['sql'], [row[3] for row in cursor.fetchall()]))
+        return plans
+
+    def assertNoFullScans(self, url, params=None):
+        for sql, plan in self.query_plans(url, params):
+            for line in plan:
+                match = self.FULL_SCAN.match(line)
+                if match and match.group(1) not in self.FULL_SCAN_ALLOWED:
+                    self.fail(f"Full table scan on {match.group(1)} for {url} {params or ''}:\n{sql}\n{plan}")
+
+    def test_product_queries(self):
+        url = reverse('appproduct-list')
+        self.assertNoFullScans(url)
+        self.assertNoFullScans(url, {'category': self.category.id, 'available': 'true', 'ordering': 'price'})
+        self.assertNoFullScans(url, {'category': self.category.id, 'min_price': '10', 'max_price': '100'})
+        self.assertNoFullScans(url, {'shop': self.shop.id})
+        self.assertNoFullScans(url, {'search': 'proyektor'})
+        self.assertNoFullScans(reverse('appproduct-detail', kwargs={'pk': self.product.pk}))
+        self.assertNoFullScans(reverse('appproduct-availability', kwargs={'pk': self.product.pk}))
+
+    def test_category_filter_uses_composite_index(self):
+        plans = self.query_plans(reverse('appproduct-list'), {'category': self.category.id, 'available': 'true'})
+        self.assertTrue(any('appproduct_cat_avail_price_idx' in line for _, plan in plans for line in plan))
+
+    def test_shop_queries(self):
+        self.assertNoFullScans(reverse('shop-list'))
+        self.assertNoFullScans(reverse('shop-detail', kwargs={'pk': self.shop.pk}))
+        self.assertNoFullScans(reverse('shop-products', kwargs={'pk': self.shop.pk}))
+        self.client.force_authenticate(user=self.owner)
+        self.assertNoFullScans(reverse('shop-orders', kwargs={'pk': self.shop.pk}), {'status': 'confirmed'})
+        self.assertNoFullScans(reverse('shop-stats', kwargs={'pk': self.shop.pk}))
+
+    def test_review_queries(self):
+        self.assertNoFullScans(reverse('productreview-list'))
+        self.assertNoFullScans(reverse('productreview-list'), {'product_id': self.product.id})
+
+    def test_order_queries(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertNoFullScans(reverse('rentalorder-detail', kwargs={'pk': self.order.pk}))
+        self.client.force_authenticate(user=self.admin)
+        self.assertNoFullScans(reverse('rentalorder-list'))
+
+    def test_category_queries(self):
+        self.assertNoFullScans(reverse('category-list'))
+
+
+class SQLiteProductionProfileTests(unittest.TestCase):
+    """
+    Opens real file databases (the test database is in-memory, where WAL does not apply).
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def open_connection(self):
+        handler = ConnectionHandler({'default': {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(self.directory, 'melar.sqlite3'),
+        }})
+        self.addCleanup(handler.close_all)
+        return handler['default']
+
+    def pragma(self, db, name):
+        with db.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_disabled_profile_keeps_sqlite_defaults(self):
+        with override_settings(MELAR_SQLITE={'ENABLED': False}):
+            db = self.open_connection()
+            self.assertEqual(self.pragma(db, 'journal_mode'), 'delete')
+
+    @override_settings(MELAR_SQLITE={'ENABLED': True, 'PRAGMAS': {'busy_timeout': 5000}})
+    def test_enabled_profile_applies_pragmas_on_connect(self):
+        db = self.open_connection()
+        self.assertEqual(self.pragma(db, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(db, 'synchronous'), 1) # NORMAL
+        self.assertEqual(self.pragma(db, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(db, 'temp_store'), 2) # MEMORY
+        self.assertEqual(self.pragma(db, 'cache_size'), -64 * 1024)
+
+    @override_settings(MELAR_SQLITE={'ENABLED': True})
+    def test_concurrent_reads_and_writes_do_not_raise_locked(self):
+        with self.open_connection().cursor() as cursor:
+            cursor.execute('CREATE TABLE hits (id INTEGER PRIMARY KEY, value INTEGER)')
+        errors = []
+
+        def work(write):
+            db = self.open_connection() # Satu koneksi per thread, seperti satu worker
+            try:
+                for value in range(50):
+                    with db.cursor() as cursor:
+                        if write:
+                            cursor.execute('INSERT INTO hits (value) VALUES (%s)', [value])
+                        else:
+                            cursor.execute('SELECT COUNT(*) FROM hits')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=work, args=(index % 2 == 0,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with self.open_connection().cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM hits')
+            self.assertEqual(cursor.fetchone()[0], 4 * 50)
+
+
+@override_settings(MELAR_READ_REPLICAS=['replica'])
+class ReadReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # Replika tiruan: alias kedua yang memakai koneksi default (seperti TEST['MIRROR'])
+        connections.settings['replica'] = connections.settings['default']
+        connections['replica'] = connections['default']
+        self.addCleanup(connections.settings.pop, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+
+        self.owner = User.objects.create_user(username='replica_owner')
+        self.customer = User.objects.create_user(username='replica_customer')
+        self.shop = Shop.objects.create(owner=self.owner, name='Toko Replika', location='Bogor')
+        self.product = AppProduct.objects.create(shop=self.shop, name='Drone', description='-', price=Decimal('90.00'))
+
+    def capture_routing(self):
+        routed = []
+        original = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = original(router, model, **hints)
+            routed.append((model._meta.app_label, alias))
+            return alias
+        return mock.patch.object(ReplicaRouter, 'db_for_read', spy), routed
+
+    def test_catalog_reads_use_replica(self):
+        ProductReview.objects.create(product=self.product, user=self.customer, rating=4, comment='Oke')
+        patcher, routed = self.capture_routing()
+        with patcher:
+            response = self.client.get(reverse('productreview-list'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['results'][0]['comment'], 'Oke')
+            response = self.client.get(reverse('appproduct-availability', kwargs={'pk': self.product.pk}))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(('melar_api', 'replica'), routed)
+        self.assertNotIn(('melar_api', None), routed)
+
+    def test_cached_and_conditional_responses_read_from_primary(self):
+        patcher, routed = self.capture_routing()
+        with patcher:
+            # Anonim: isi cache respons; login: ETag/Last-Modified tanpa cache
+            response = self.client.get(reverse('appproduct-list'))
+            self.assertEqual(response.data['results'][0]['name'], 'Drone')
+            self.client.force_authenticate(user=self.customer)
+            response = self.client.get(reverse('shop-detail', kwargs={'pk': self.shop.pk}))
+            self.assertIn('ETag', response)
+        self.assertTrue(routed)
+        self.assertNotIn(('melar_api', 'replica'), routed)
+
+    def test_async_cache_fill_reads_from_primary(self):
+        patcher, routed = self.capture_routing()
+        with patcher:
+            response = async_to_sync(self.async_client.get)('/api/v1/async/products/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(routed)
+        self.assertNotIn(('melar_api', 'replica'), routed)
+
+    def test_token_lookup_stays_on_primary(self):
+        token = Token.objects.create(user=self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        patcher, routed = self.capture_routing()
+        with patcher:
+            self.assertEqual(self.client.get(reverse('productreview-list')).status_code, 200)
+        self.assertIn(('authtoken', None), routed)
+        self.assertIn(('melar_api', 'replica'), routed)
+
+    def test_writes_and_other_viewsets_use_primary(self):
+        self.client.force_authenticate(user=self.customer)
+        patcher, routed = self.capture_routing()
+        with patcher:
+            response = self.client.post(reverse('productreview-list'), {
+                'product': self.product.pk, 'rating': 5, 'comment': 'Mantap',
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.client.get(reverse('rentalorder-list'))
+        self.assertTrue(routed)
+        self.assertFalse([alias for _, alias in routed if alias is not None])
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        router = ReplicaRouter()
+        with replica_reads() as replica:
+            self.assertEqual(replica, 'replica')
+            self.assertEqual(router.db_for_read(AppProduct), 'replica')
+            self.assertEqual(router.db_for_write(AppProduct), 'default')
+            self.assertIsNone(router.db_for_read(AppProduct))
+        with replica_reads():
+            self.assertEqual(router.db_for_read(AppProduct), 'replica') # request baru mulai bersih
+        self.assertIsNone(router.db_for_read(AppProduct))
+        self.assertFalse(router.allow_migrate('replica', 'melar_api'))
+
+    @override_settings(MELAR_READ_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        with replica_reads() as replica:
+            self.assertIsNone(replica)
+            self.assertIsNone(ReplicaRouter().db_for_read(AppProduct))
+
+
+class AsyncCatalogEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='async_owner')
+        self.customer = User.objects.create_user(username='async_customer')
+        self.category = Category.objects.create(name='Audio')
+        self.shop = Shop.objects.create(owner=self.owner, name='Toko Async', location='Depok')
+        self.shop.categories.add(self.category)
+        self.products = [
+            AppProduct.objects.create(shop=self.shop, category=self.category, name=f'Speaker {index}',
+                                      description='Bass mantap', price=Decimal('25.00') + index)
+            for index in range(5)
+        ]
+        ProductImage.objects.create(product=self.products[0], image='product_images/speaker.jpg', order=0)
+        ProductReview.objects.create(product=self.products[0], user=self.customer, rating=4, comment='Oke')
+
+    def assertSameJson(self, sync_path, async_path):
+        expected = self.client.get(sync_path)
+        actual = async_to_sync(self.async_client.get)(async_path)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual['Content-Type'], 'application/json')
+        data = actual.json()
+        expected_data = expected.json()
+        if isinstance(data, dict) and 'next' in data:
+            # Link cursor menunjuk ke path masing-masing; yang harus sama adalah cursornya
+            for link in ('next', 'previous'):
+                data[link] = data[link] and data[link].replace('/async/', '/')
+        self.assertEqual(data, expected_data)
+        return data
+
+    def test_product_list_and_pages_match_sync_endpoint(self):
+        data = self.assertSameJson('/api/v1/products/?page_size=2', '/api/v1/async/products/?page_size=2')
+        self.assertEqual(len(data['results']), 2)
+        cursor = data['next'].split('?', 1)[1]
+        self.assertSameJson(f'/api/v1/products/?{cursor}', f'/api/v1/async/products/?{cursor}')
+        self.assertSameJson('/api/v1/products/?search=speaker&ordering=price&fields=id,name,images',
+                            '/api/v1/async/products/?search=speaker&ordering=price&fields=id,name,images')
+
+    def test_details_match_sync_endpoint(self):
+        pk = self.products[0].pk
+        data = self.assertSameJson(f'/api/v1/products/{pk}/', f'/api/v1/async/products/{pk}/')
+        self.assertEqual(data['name'], 'Speaker 0')
+        self.assertSameJson(f'/api/v1/shops/{self.shop.pk}/', f'/api/v1/async/shops/{self.shop.pk}/')
+        self.assertSameJson('/api/v1/products/999999/', '/api/v1/async/products/999999/') # 404
+
+    def test_shop_category_and_review_lists_match_sync_endpoint(self):
+        self.assertSameJson('/api/v1/shops/', '/api/v1/async/shops/')
+        self.assertSameJson('/api/v1/categories/', '/api/v1/async/categories/')
+        pk = self.products[0].pk
+        data = self.assertSameJson(f'/api/v1/reviews/?product_id={pk}', f'/api/v1/async/reviews/?product_id={pk}')
+        self.assertEqual(len(data['results']), 1)
+
+    def test_invalid_parameters_return_same_error(self):
+        data = self.assertSameJson('/api/v1/products/?fields=bogus', '/api/v1/async/products/?fields=bogus')
+        self.assertIn('fields', data)
+        data = self.assertSameJson('/api/v1/products/?category=99999999999999999999',
+                                   '/api/v1/async/products/?category=99999999999999999999')
+        self.assertIn('category', data)
+        data = self.assertSameJson('/api/v1/products/?category=²', '/api/v1/async/products/?category=²')
+        self.assertEqual(data['results'], [])
+
+
+@override_settings(MELAR_PROFILING={'ENABLED': True, 'SAMPLE_RATE': 1.0})
+class ProfilingMiddlewareTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(username='profile_owner')
+        shop = Shop.objects.create(owner=owner, name='Toko Profil', location='Cirebon')
+        for index in range(3):
+            AppProduct.objects.create(shop=shop, name=f'Tenda {index}', description='-', price=Decimal('10.00'))
+
+    def test_sampled_request_gets_server_timing_and_log_line(self):
+        with self.assertLogs('melar_api.profiling', level='INFO') as logs:
+            response = self.client.get(reverse('appproduct-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        for metric in ('sql;dur=', 'serializer;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'AppProductViewSet')
+        self.assertEqual(record['action'], 'list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertIn(f'desc="{record["sql_count"]} queries"', timing)
+        self.assertGreater(record['serializer_ms'], 0)
+        self.assertGreater(record['render_ms'], 0)
+        self.assertLessEqual(record['serializer_ms'], record['total_ms'])
+
+    def test_extra_action_is_tagged(self):
+        product = AppProduct.objects.first()
+        with self.assertLogs('melar_api.profiling', level='INFO') as logs:
+            self.client.get(reverse('appproduct-availability', kwargs={'pk': product.pk}))
+        self.assertEqual(json.loads(logs.records[0].getMessage())['action'], 'availability')
+
+    def test_async_view_is_profiled_without_adaptation(self):
+        with override_settings(DEBUG=True), self.assertLogs('django.request', level='DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('ASGI handler siap')
+        self.assertEqual([line for line in logs.output if 'adapted' in line], [])
+
+        with self.assertLogs('melar_api.profiling', level='INFO') as logs:
+            response = async_to_sync(self.async_client.get)('/api/v1/async/products/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertGreater(json.loads(logs.records[0].getMessage())['sql_count'], 0)
+
+    @override_settings(MELAR_PROFILING={'ENABLED': True, 'SAMPLE_RATE': 0})
+    def test_unsampled_request_is_untouched(self):
+        response = self.client.get(reverse('appproduct-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(MELAR_PROFILING={'ENABLED': False})
+    def test_disabled_middleware_is_not_installed(self):
+        response = self.client.get(reverse('appproduct-list'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class MetricsEndpointTests(APITestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.customer = User.objects.create_user(username='metrics_customer')
+        self.staff = User.objects.create_user(username='metrics_staff', is_staff=True)
+        owner = User.objects.create_user(username='metrics_owner')
+        shop = Shop.objects.create(owner=owner, name='Toko Metrik', location='Garut')
+        self.product = AppProduct.objects.create(shop=shop, name='Kayak', description='-', price=Decimal('75.00'))
+
+    def scrape(self, **headers):
+        if not headers:
+            self.client.force_login(self.staff)
+        response = self.client.get('/metrics', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_requests_are_counted_per_viewset_action(self):
+        self.client.get(reverse('appproduct-list'))
+        self.client.get(reverse('appproduct-list'))
+        self.client.get(reverse('appproduct-detail', kwargs={'pk': self.product.pk}))
+        body = self.scrape()
+        self.assertIn('melar_http_requests_total{method="GET",route="appproduct-list",status="200"} 2', body)
+        self.assertIn('melar_http_requests_total{method="GET",route="appproduct-retrieve",status="200"} 1', body)
+        self.assertIn('# TYPE melar_http_request_duration_seconds histogram', body)
+        self.assertIn('melar_http_request_duration_seconds_bucket{route="appproduct-list",le="+Inf"} 2', body)
+        self.assertIn('melar_http_request_duration_seconds_count{route="appproduct-list"} 2', body)
+        self.assertIn('melar_db_queries_per_request_count{route="appproduct-list"} 2', body)
+        self.assertRegex(body, r'melar_response_cache_hit_ratio [0-9.]+\n')
+
+    def test_created_orders_are_counted_by_status(self):
+        self.client.force_authenticate(user=self.customer)
+        start = datetime.date.today() + datetime.timedelta(days=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('rentalorder-list'), {'order_items_data': [
+                {'product_id': self.product.pk, 'quantity': 1, 'start_date': start.isoformat(), 'end_date': start.isoformat()},
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        body = self.scrape()
+        self.assertIn('melar_http_requests_total{method="POST",route="rentalorder-create",status="201"} 1', body)
+        self.assertIn('melar_orders_created_total{status="pending"} 1', body)
+        self.assertIn('melar_orders{status="pending"} 1', body)
+
+    def test_snapshots_of_other_processes_are_summed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        other = {'counters': [['melar_orders_created_total', [['status', 'pending']], 4]],
+                 'histograms': [['melar_db_queries_per_request', [['route', 'appproduct-list']], [0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 2.0]]]}
+        with open(os.path.join(directory, 'metrics-999999.json'), 'w') as handle:
+            json.dump(other, handle)
+        with override_settings(MELAR_METRICS={'DIR': directory}):
+            self.client.get(reverse('appproduct-list'))
+            body = self.scrape()
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics-{os.getpid()}.json')))
+        self.assertIn('melar_orders_created_total{status="pending"} 4', body)
+        self.assertIn('melar_db_queries_per_request_count{route="appproduct-list"} 2', body)
+
+    def test_endpoint_is_closed_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_async_views_are_not_adapted_to_sync(self):
+        # Dengan DEBUG, Django mencatat "Asynchronous handler adapted" untuk middleware yang hanya sync
+        with override_settings(DEBUG=True), self.assertLogs('django.request', level='DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('ASGI handler siap')
+        self.assertEqual([line for line in logs.output if 'adapted' in line and 'MetricsMiddleware' in line], [])
+        response = async_to_sync(self.async_client.get)('/api/v1/async/products/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = self.scrape()
+        self.assertIn('melar_http_requests_total{method="GET",route="async-appproduct-list",status="200"} 1', body)
+        self.assertIn('melar_db_queries_per_request_count{route="async-appproduct-list"} 1', body)
+        # Query ORM async (di thread sync_to_async) tetap terhitung
+        self.assertRegex(body, r'melar_db_queries_per_request_sum\{route="async-appproduct-list"\} [1-9]')
+
+    @override_settings(MELAR_METRICS={'TOKEN': 'rahasia'})
+    def test_token_protects_endpoint(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer salah').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn('melar_orders', self.scrape(HTTP_AUTHORIZATION='Bearer rahasia'))
+
+
+class OrderStatusTransitionTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='transition_admin', password='password123')
+        self.customer = User.objects.create_user(username='transition_customer')
+        owner = User.objects.create_user(username='transition_owner')
+        self.shop = Shop.objects.create(owner=owner, name='Toko Transisi', location='Bogor')
+        self.product = AppProduct.objects.create(shop=self.shop, name='Sepeda', description='-', price=Decimal('40.00'))
+        self.today = timezone.localdate()
+
+    def create_order(self, status='pending'):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = RentalOrder.objects.create(user=self.customer, total_price=Decimal('0'), status=status)
+            OrderItem.objects.create(
+                order=order, product=self.product, quantity=1, price_per_day_at_rental=self.product.price,
+                start_date=self.today, end_date=self.today + datetime.timedelta(days=1)
+            )
+        return order
+
+    def test_transition_is_a_conditional_update(self):
+        order = self.create_order()
+        stale = RentalOrder.objects.get(pk=order.pk)
+        self.assertEqual(RentalOrder.objects.filter(pk=order.pk).transition('cancelled'), {order.pk: 'pending'})
+        # Salinan lama masih 'pending', tetapi UPDATE bersyarat tidak menimpa status 'cancelled'
+        self.assertEqual(RentalOrder.objects.filter(pk=stale.pk).transition('confirmed'), {})
+        self.assertEqual(RentalOrder.objects.get(pk=order.pk).status, 'cancelled')
+        with self.assertRaises(ValueError):
+            RentalOrder.objects.all().transition('lost')
+
+    def test_rows_changed_after_select_are_not_reported(self):
+        order, raced = self.create_order(), self.create_order()
+        real_now = timezone.now
+
+        def cancel_concurrently():
+            # Penulis lain membatalkan satu order di antara SELECT dan UPDATE milik transition()
+            RentalOrder.objects.filter(pk=raced.pk).update(status='cancelled')
+            return real_now()
+
+        signalled = []
+        receiver = lambda sender, order_id, **kwargs: signalled.append(order_id)
+        order_status_changed.connect(receiver)
+        self.addCleanup(order_status_changed.disconnect, receiver)
+        with mock.patch('melar_api.models.timezone.now', side_effect=cancel_concurrently):
+            changed = RentalOrder.objects.filter(pk__in=[order.pk, raced.pk]).transition('confirmed')
+        self.assertEqual(changed, {order.pk: 'pending'})
+        self.assertEqual(signalled, [order.pk])
+        self.assertEqual(RentalOrder.objects.get(pk=raced.pk).status, 'cancelled')
+
+    def test_transition_updates_rollup_once(self):
+        order = self.create_order()
+        with self.captureOnCommitCallbacks(execute=True):
+            RentalOrder.objects.filter(pk=order.pk).transition('confirmed')
+        with self.captureOnCommitCallbacks(execute=True):
+            RentalOrder.objects.filter(pk=order.pk).transition('confirmed') # Tidak berpindah lagi
+        stat = ShopDailyStat.objects.get(product=self.product)
+        self.assertEqual((stat.rentals, stat.revenue), (1, Decimal('80.00')))
+
+    def test_cancel_of_non_cancellable_order(self):
+        order = self.create_order(status='active')
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(reverse('rentalorder-cancel-order', kwargs={'pk': order.pk}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'Order with status "active" cannot be cancelled.')
+
+    def test_bulk_transition_endpoint(self):
+        pending, confirmed, completed = self.create_order(), self.create_order('confirmed'), self.create_order('completed')
+        url = reverse('rentalorder-bulk-transition')
+        payload = {'ids': [pending.pk, confirmed.pk, completed.pk], 'status': 'cancelled'}
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data, {'status': 'cancelled', 'updated': sorted([pending.pk, confirmed.pk]), 'skipped': [completed.pk]})
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "melar_api_rentalorder"')]
+        self.assertEqual(len(updates), 2) # Satu UPDATE per status asal, bukan per order
+        self.assertEqual(self.client.post(url, {'ids': [], 'status': 'cancelled'}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {'ids': [True], 'status': 'cancelled'}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {'ids': [pending.pk], 'status': 'lost'}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_transition_endpoint(self):
+        order = self.create_order('confirmed')
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('rentalorder-transition', kwargs={'pk': order.pk})
+        response = self.client.post(url, {'status': 'active'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['status'], 'active')
+        self.assertEqual(self.client.post(url, {'status': 'pending'}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_status_is_read_only_in_order_api(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(reverse('rentalorder-list'), {'status': 'active', 'order_items_data': [
+            {'product_id': self.product.pk, 'quantity': 1, 'start_date': '2026-05-01', 'end_date': '2026-05-02'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['status'], 'pending')
+
+        order = self.create_order('active')
+        response = self.client.patch(reverse('rentalorder-detail', kwargs={'pk': order.pk}), {'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(RentalOrder.objects.get(pk=order.pk).status, 'active')
+        self.assertEqual(AppProduct.objects.get(pk=self.product.pk).total_individual_rentals, 1)
+
+    def test_admin_action(self):
+        pending, active = self.create_order(), self.create_order('active')
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:melar_api_rentalorder_changelist'), {
+            'action': 'mark_confirmed', '_selected_action': [pending.pk, active.pk],
+        }, follow=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(RentalOrder.objects.get(pk=pending.pk).status, 'confirmed')
+        self.assertEqual(RentalOrder.objects.get(pk=active.pk).status, 'active')
+        messages = [str(message) for message in response.context['messages']]
+        self.assertIn('1 order(s) marked as confirmed.', messages)
+
+
+class ReservationHoldTests(APITestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='hold_buyer')
+        self.other_buyer = User.objects.create_user(username='hold_other_buyer')
+        owner = User.objects.create_user(username='hold_owner')
+        shop = Shop.objects.create(owner=owner, name='Toko Stok', location='Malang')
+        self.product = AppProduct.objects.create(shop=shop, name='Kursi Lipat', description='-', price=Decimal('5.00'), stock_quantity=3)
+        self.holds_url = reverse('reservationhold-list')
+        self.orders_url = reverse('rentalorder-list')
+
+    def items(self, quantity, start='2026-03-01', end='2026-03-03'):
+        return [{'product_id': self.product.pk, 'quantity': quantity, 'start_date': start, 'end_date': end}]
+
+    def order(self, user, quantity, **dates):
+        self.client.force_authenticate(user=user)
+        return self.client.post(self.orders_url, {'order_items_data': self.items(quantity, **dates)}, format='json')
+
+    def test_orders_share_stock_quantity(self):
+        self.assertEqual(self.order(self.buyer, 2).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.order(self.other_buyer, 1, start='2026-03-03', end='2026-03-05').status_code, status.HTTP_201_CREATED)
+        # 3 Maret sudah memakai 3 unit
+        self.assertEqual(self.order(self.other_buyer, 1, start='2026-03-03', end='2026-03-03').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.order(self.other_buyer, 1, start='2026-03-04', end='2026-03-04').status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(reverse('appproduct-availability', kwargs={'pk': self.product.pk}), {'from': '2026-03-01', 'to': '2026-03-06'})
+        self.assertEqual(response.data['stock_quantity'], 3)
+        self.assertEqual([(r['start_date'], r['end_date']) for r in response.data['booked']], [(datetime.date(2026, 3, 3), datetime.date(2026, 3, 3))])
+
+    def test_hold_reserves_stock_until_order(self):
+        self.client.force_authenticate(user=self.buyer)
+        response = self.client.post(self.holds_url, {'items': self.items(3)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data[0]['quantity'], 3)
+        self.assertEqual(self.client.get(self.holds_url).data[0]['id'], response.data[0]['id'])
+
+        self.assertEqual(self.order(self.other_buyer, 1).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.other_buyer)
+        self.assertEqual(self.client.post(self.holds_url, {'items': self.items(1)}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Order yang tertutup hold tidak menjalankan cek bentrok lagi, dan hold-nya terpakai
+        with mock.patch('melar_api.holds.find_booking_conflicts') as check:
+            response = self.order(self.buyer, 3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        check.assert_not_called()
+        self.assertFalse(ReservationHold.objects.exists())
+
+    def test_order_consumes_only_matching_holds(self):
+        self.client.force_authenticate(user=self.buyer)
+        items = self.items(2) + self.items(1, start='2026-03-10', end='2026-03-12')
+        self.assertEqual(self.client.post(self.holds_url, {'items': items}, format='json').status_code, status.HTTP_201_CREATED)
+
+        # Hanya 1 dari 2 unit yang ditahan untuk 1-3 Maret dipakai; hold 10-12 Maret tetap ada
+        self.assertEqual(self.order(self.buyer, 1).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(ReservationHold.objects.values_list('start_date', 'quantity')),
+            [(datetime.date(2026, 3, 1), 1), (datetime.date(2026, 3, 10), 1)],
+        )
+        # Order tanpa hold yang cocok tetap memperhitungkan hold lain milik user: 1 order + 1 hold + 2 > 3 unit
+        self.assertEqual(self.order(self.buyer, 2, start='2026-03-02', end='2026-03-02').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ReservationHold.objects.count(), 2)
+
+    def test_release_holds_subtracts_in_the_database(self):
+        hold = ReservationHold.objects.create(
+            user=self.buyer, product=self.product, quantity=3, start_date=datetime.date(2026, 3, 1),
+            end_date=datetime.date(2026, 3, 3), expires_at=timezone.now() + datetime.timedelta(minutes=5)
+        )
+        # Request lain sudah mengambil 1 unit setelah hold dibaca (snapshot masih 3)
+        ReservationHold.objects.filter(pk=hold.pk).update(quantity=2)
+        self.assertTrue(release_holds(Counter({hold: 1})))
+        self.assertEqual(ReservationHold.objects.get(pk=hold.pk).quantity, 1)
+        # Unit yang sudah tidak ada tidak bisa dilepas; baris tidak berubah
+        self.assertFalse(release_holds(Counter({hold: 2})))
+        self.assertEqual(ReservationHold.objects.get(pk=hold.pk).quantity, 1)
+        self.assertTrue(release_holds(Counter({hold: 1})))
+        self.assertFalse(ReservationHold.objects.exists())
+
+    def test_new_checkout_replaces_holds(self):
+        self.client.force_authenticate(user=self.buyer)
+        self.client.post(self.holds_url, {'items': self.items(3)}, format='json')
+        response = self.client.post(self.holds_url, {'items': self.items(1)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(list(ReservationHold.objects.values_list('quantity', flat=True)), [1])
+        self.assertEqual(self.client.delete(reverse('reservationhold-detail', kwargs={'pk': response.data[0]['id']})).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(ReservationHold.objects.exists())
+
+    def test_expired_holds_are_ignored_and_swept(self):
+        ReservationHold.objects.create(
+            user=self.buyer, product=self.product, quantity=3, start_date=datetime.date(2026, 3, 1),
+            end_date=datetime.date(2026, 3, 3), expires_at=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        self.assertEqual(self.order(self.other_buyer, 3).status_code, status.HTTP_201_CREATED)
+        out = StringIO()
+        call_command('expire_holds', stdout=out)
+        self.assertIn('Released 1 expired holds.', out.getvalue())
+        self.assertFalse(ReservationHold.objects.exists())
+
+    def test_untracked_stock_keeps_exclusive_bookings(self):
+        self.product.stock_quantity = None
+        self.product.save()
+        self.assertEqual(self.order(self.buyer, 2).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.order(self.other_buyer, 1, start='2026-03-03', end='2026-03-04').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RentalCounterTests(APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='counter_customer')
+        self.shop = Shop.objects.create(owner=User.objects.create_user(username='counter_owner'), name='Toko Ramai', location='Depok')
+        self.quiet_shop = Shop.objects.create(owner=User.objects.create_user(username='counter_quiet'), name='Toko Sepi', location='Depok')
+        self.tent = AppProduct.objects.create(shop=self.shop, name='Tenda', description='-', price=Decimal('20.00'))
+        self.stove = AppProduct.objects.create(shop=self.shop, name='Kompor', description='-', price=Decimal('10.00'))
+        self.lamp = AppProduct.objects.create(shop=self.quiet_shop, name='Lampu', description='-', price=Decimal('5.00'))
+        self.today = timezone.localdate()
+
+    def create_order(self, products, status='pending'):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = RentalOrder.objects.create(user=self.customer, total_price=Decimal('0'), status=status)
+            for product in products:
+                OrderItem.objects.create(
+                    order=order, product=product, price_per_day_at_rental=product.price,
+                    start_date=self.today, end_date=self.today
+                )
+        return order
+
+    def transition(self, order, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            RentalOrder.objects.filter(pk=order.pk).transition(status)
+
+    def counters(self):
+        products = dict(AppProduct.objects.values_list('pk', 'total_individual_rentals'))
+        shops = dict(Shop.objects.values_list('pk', 'total_rentals'))
+        return products[self.tent.pk], products[self.stove.pk], products[self.lamp.pk], shops[self.shop.pk], shops[self.quiet_shop.pk]
+
+    def test_counters_follow_order_status(self):
+        order = self.create_order([self.tent, self.stove])
+        self.transition(order, 'confirmed')
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 0)) # Baru dihitung saat active
+        self.transition(order, 'active')
+        self.assertEqual(self.counters(), (1, 1, 0, 2, 0))
+        self.transition(order, 'completed')
+        self.assertEqual(self.counters(), (1, 1, 0, 2, 0))
+
+        other = self.create_order([self.tent], status='active')
+        self.assertEqual(self.counters(), (2, 1, 0, 3, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            other.status = 'cancelled'
+            other.save()
+        self.assertEqual(self.counters(), (1, 1, 0, 2, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 0))
+
+    def test_buffered_flush_batches_updates(self):
+        rental_counter_buffer.last_flush = time.monotonic()
+        self.addCleanup(rental_counter_buffer.flush, force=True)
+        with override_settings(MELAR_RENTAL_COUNTERS={'FLUSH_INTERVAL': 3600}):
+            for _ in range(3):
+                self.create_order([self.tent, self.lamp], status='active')
+            self.create_order([self.stove], status='active')
+            self.assertEqual(self.counters(), (0, 0, 0, 0, 0))
+            with CaptureQueriesContext(connection) as queries:
+                rental_counter_buffer.flush(force=True)
+        self.assertEqual(self.counters(), (3, 1, 3, 4, 3))
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        # Satu UPDATE per (tabel, nilai selisih): produk +3 dan +1, toko +4 dan +3
+        self.assertEqual(len(updates), 4)
+
+    def test_pending_deltas_are_flushed_by_timer(self):
+        flushed = threading.Event()
+        rental_counter_buffer.last_flush = time.monotonic()
+        with override_settings(MELAR_RENTAL_COUNTERS={'FLUSH_INTERVAL': 0.2}), \
+                mock.patch('melar_api.counters.apply_counter_deltas', side_effect=lambda deltas: flushed.set()) as apply:
+            rental_counter_buffer.add({AppProduct: {self.tent.pk: 1}, Shop: {self.shop.pk: 1}})
+            apply.assert_not_called() # Belum lewat FLUSH_INTERVAL
+            self.assertTrue(flushed.wait(5)) # Tanpa order baru pun selisihnya tetap ditulis
+        self.assertEqual(apply.call_args.args[0][AppProduct], {self.tent.pk: 1})
+
+    def test_reconcile_command(self):
+        self.create_order([self.tent, self.stove], status='completed')
+        self.create_order([self.lamp], status='confirmed')
+        AppProduct.objects.update(total_individual_rentals=7)
+        Shop.objects.update(total_rentals=7)
+        out = StringIO()
+        call_command('reconcile_rental_counters', stdout=out)
+        self.assertEqual(self.counters(), (1, 1, 0, 2, 0))
+        self.assertIn('Recomputed rental counters for 3 products and 2 shops.', out.getvalue())
+
+    def test_most_rented_ordering(self):
+        self.create_order([self.lamp], status='active')
+        self.create_order([self.lamp, self.stove], status='active')
+        response = self.client.get(reverse('appproduct-list'), {'ordering': '-total_individual_rentals'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.lamp.pk, self.stove.pk, self.tent.pk])
+        self.assertEqual(response.data['results'][0]['total_individual_rentals'], 2)
+
+        response = self.client.get(reverse('shop-list'), {'ordering': '-total_rentals'})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.quiet_shop.pk, self.shop.pk])
+        # ?ordering= daftar toko tidak berlaku untuk daftar produk sebuah toko
+        response = self.client.get(reverse('shop-products', kwargs={'pk': self.shop.pk}), {'ordering': '-total_rentals'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
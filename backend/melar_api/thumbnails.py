@@ -0,0 +1,184 @@
+"""
+Pipeline thumbnail untuk ProductImage.image dan Shop.image.
+
+Setelah upload di-commit, gambar asli diubah ukurannya menjadi beberapa lebar (lihat
+MELAR_THUMBNAILS['SIZES']) dalam format WebP dan JPEG, disimpan di sebelah file aslinya:
+`product_images/kamera.png` -> `product_images/kamera__small.webp`, `..._small.jpg`, dst.
+Proses berjalan di thread pool di luar request, lalu hasilnya dicatat di kolom JSON
+(`ProductImage.variants` / `Shop.image_variants`) sehingga serializer tidak perlu mengecek storage.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+
+from .cache import affected_objects, invalidate
+from .models import ProductImage, Shop
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SIZES': {'small': 320, 'medium': 640, 'large': 1280},
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+    'WORKERS': 2,
+    # False: variant dibuat langsung saat transaksi di-commit (dipakai oleh tes dan command --sync)
+    'ASYNC': True,
+}
+
+FILE_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def thumbnail_settings():
+    return {**DEFAULTS, **getattr(settings, 'MELAR_THUMBNAILS', {})}
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=thumbnail_settings()['WORKERS'], thread_name_prefix='melar-thumbnails'
+            )
+        return _executor
+
+
+def variant_name(name, size, image_format):
+    root, _ = os.path.splitext(name)
+    return f"{root}__{size}.{FILE_EXTENSIONS[image_format]}"
+
+
+def generate_variants(field_file):
+    """
+    Renders every configured size/format of `field_file` into its storage.
+    Sizes wider than the original are skipped (never upscaled); if all are, only the smallest
+    size is rendered, at the original width. Returns the `variants` dict to store on the model.
+    """
+    config = thumbnail_settings()
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    sizes = {name: width for name, width in config['SIZES'].items() if width < original.width}
+    if not sizes:
+        smallest = min(config['SIZES'], key=config['SIZES'].get)
+        sizes = {smallest: original.width}
+
+    rendered = {}
+    for size, width in sorted(sizes.items(), key=lambda item: item[1]):
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.LANCZOS)
+        entry = {'width': width, 'height': height}
+        for image_format in config['FORMATS']:
+            name = variant_name(field_file.name, size, image_format)
+            image = resized
+            if image_format == 'jpeg' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            buffer = io.BytesIO()
+            image.save(buffer, format=image_format.upper(), quality=config['QUALITY'])
+            if storage.exists(name):
+                storage.delete(name)
+            entry[image_format] = storage.save(name, ContentFile(buffer.getvalue()))
+        rendered[size] = entry
+    return {'source': field_file.name, 'sizes': rendered}
+
+
+def _process(model, pk, field, variants_field):
+    instance = model.objects.filter(pk=pk).only('pk', field).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, field)
+    if not field_file:
+        return None
+    if not field_file.storage.exists(field_file.name):
+        logger.info("Skipping thumbnails for %s(pk=%s): %s is missing", model.__name__, pk, field_file.name)
+        return None
+    variants = generate_variants(field_file)
+    # Update bersyarat: abaikan hasil jika gambar sudah diganti lagi selama proses berjalan
+    if model.objects.filter(pk=pk, **{field: field_file.name}).update(**{variants_field: variants}):
+        # .update() tidak memicu post_save, jadi naikkan versi cache respons secara manual
+        invalidate(model, affected_objects(model, instance))
+    return variants
+
+
+def process_product_image(pk):
+    return _process(ProductImage, pk, 'image', 'variants')
+
+
+def process_shop_image(pk):
+    return _process(Shop, pk, 'image', 'image_variants')
+
+
+def _run_in_worker(task, pk):
+    try:
+        task(pk)
+    except Exception:
+        logger.exception("Generating thumbnails failed for %s(pk=%s)", task.__name__, pk)
+    finally:
+        # Thread worker memakai koneksi database sendiri; tutup agar tidak bocor
+        close_old_connections()
+
+
+def schedule(task, pk):
+    """
+    Queues `task(pk)` to run after the current transaction commits, off the request path.
+    """
+    def submit():
+        if thumbnail_settings()['ASYNC']:
+            get_executor().submit(_run_in_worker, task, pk)
+        else:
+            task(pk)
+    transaction.on_commit(submit)
+
+
+def needs_variants(field_file, variants):
+    return bool(field_file) and (variants or {}).get('source') != field_file.name
+
+
+@receiver(post_save, sender=ProductImage)
+def queue_product_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw and needs_variants(instance.image, instance.variants):
+        schedule(process_product_image, instance.pk)
+
+
+@receiver(post_save, sender=Shop)
+def queue_shop_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw and needs_variants(instance.image, instance.image_variants):
+        schedule(process_shop_image, instance.pk)
+
+
+def variant_urls(variants, field_file, url_builder):
+    """
+    Public representation of stored variants: per-size URLs plus a ready-made `srcset`
+    per format. Returns None while variants for the current file are not generated yet.
+    """
+    if not field_file or (variants or {}).get('source') != field_file.name:
+        return None
+    storage = field_file.storage
+    sizes = variants.get('sizes', {})
+    representation = {}
+    srcset = {}
+    for size, entry in sorted(sizes.items(), key=lambda item: item[1]['width']):
+        urls = {}
+        for image_format in FILE_EXTENSIONS:
+            if image_format in entry:
+                url = url_builder(storage.url(entry[image_format]))
+                urls[image_format] = url
+                srcset.setdefault(image_format, []).append(f"{url} {entry['width']}w")
+        representation[size] = {'width': entry['width'], 'height': entry['height'], **urls}
+    representation['srcset'] = {image_format: ', '.join(items) for image_format, items in srcset.items()}
+    return representation
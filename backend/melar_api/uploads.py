@@ -0,0 +1,59 @@
+"""
+Upload banyak gambar produk dalam satu request multipart.
+
+File upload di-stream ke file sementara di disk (TemporaryFileUploadHandler) alih-alih
+ditampung di memori, lalu disalin ke storage per potongan (chunk) saat baris ProductImage
+dibuat. Semua baris dibuat dengan satu bulk insert dengan nilai `order` berurutan.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import Max
+
+from . import thumbnails
+from .cache import invalidate
+from .models import ProductImage
+
+DEFAULTS = {
+    'MAX_FILES': 30,
+    'MAX_FILE_SIZE': 10 * 1024 * 1024, # byte per gambar
+}
+
+
+def upload_settings():
+    return {**DEFAULTS, **getattr(settings, 'MELAR_UPLOADS', {})}
+
+
+def use_streaming_upload_handlers(request):
+    """
+    Makes the multipart parser write every uploaded file straight to a temporary file.
+    Must be called on the Django HttpRequest before its body is read.
+    """
+    request.upload_handlers = [TemporaryFileUploadHandler(request)]
+
+
+def add_product_images(product, files, alt_texts=()):
+    """
+    Stores `files` as new images of `product`, ordered after its existing images,
+    with one INSERT. Returns the created ProductImage instances.
+    """
+    if not files:
+        return []
+    alt_texts = list(alt_texts)
+    with transaction.atomic():
+        # Kunci urutan per produk: baris produk di-lock agar dua upload bersamaan tidak memakai `order` yang sama
+        type(product).objects.select_for_update().filter(pk=product.pk).values_list('pk').first()
+        last_order = product.product_images.aggregate(last=Max('order'))['last']
+        start = 0 if last_order is None else last_order + 1
+        images = ProductImage.objects.bulk_create([
+            ProductImage(
+                product=product, image=file, order=start + index,
+                alt_text=alt_texts[index] if index < len(alt_texts) else None,
+            )
+            for index, file in enumerate(files)
+        ])
+        # bulk_create tidak mengirim post_save: jadwalkan thumbnail dan naikkan versi cache secara manual
+        for image in images:
+            thumbnails.schedule(thumbnails.process_product_image, image.pk)
+        invalidate(ProductImage, {type(product): [product.pk]})
+    return images
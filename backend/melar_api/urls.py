@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 # Membuat router dan mendaftarkan ViewSet kita
 router = DefaultRouter()
@@ -12,11 +12,19 @@ router.register(r'products', views.AppProductViewSet, basename='appproduct')
 # router.register(r'product-images', views.ProductImageViewSet, basename='productimage') # Jika ingin API terpisah
 router.register(r'reviews', views.ProductReviewViewSet, basename='productreview')
 router.register(r'orders', views.RentalOrderViewSet, basename='rentalorder')
+router.register(r'holds', views.ReservationHoldViewSet, basename='reservationhold') # Hold stok saat checkout
 # router.register(r'order-items', views.OrderItemViewSet, basename='orderitem') # Biasanya tidak perlu
 
 # URL API akan otomatis dibuat oleh router.
 # Contoh: /api/categories/, /api/categories/{id}/, /api/shops/, /api/shops/{id}/products/
 urlpatterns = [
     path('', include(router.urls)),
+    # Jalur baca katalog versi async (ASGI), dengan JSON yang sama seperti endpoint di atas
+    path('async/products/', async_views.AsyncProductListView.as_view(), name='async-appproduct-list'),
+    path('async/products/<int:pk>/', async_views.AsyncProductDetailView.as_view(), name='async-appproduct-detail'),
+    path('async/shops/', async_views.AsyncShopListView.as_view(), name='async-shop-list'),
+    path('async/shops/<int:pk>/', async_views.AsyncShopDetailView.as_view(), name='async-shop-detail'),
+    path('async/categories/', async_views.AsyncCategoryListView.as_view(), name='async-category-list'),
+    path('async/reviews/', async_views.AsyncReviewListView.as_view(), name='async-productreview-list'),
     # Anda bisa menambahkan URL non-router lainnya di sini jika perlu
 ]
\ No newline at end of file
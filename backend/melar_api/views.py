@@ -1,23 +1,43 @@
+import datetime
+
 from django.contrib.auth.models import User
-from rest_framework import viewsets, permissions, status
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework import generics, mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from .models import (
     UserProfile, Category, Shop, AppProduct,
-    ProductImage, ProductReview, RentalOrder, OrderItem
+    ProductImage, ProductReview, RentalOrder, OrderItem, ReservationHold
 )
 from .serializers import (
     UserSerializer, UserProfileSerializer, CategorySerializer, ShopSerializer,
     AppProductSerializer, ProductImageSerializer, ProductReviewSerializer,
-    RentalOrderSerializer, OrderItemSerializer
+    RentalOrderSerializer, OrderItemSerializer, ProductImageUploadSerializer,
+    ReservationHoldSerializer, CheckoutHoldSerializer
 )
 # Mengimpor permission kustom yang telah kita buat
 from .permissions import (
     IsOwnerOrReadOnly, IsShopOwnerOrReadOnlyForProduct,
     IsReviewAuthorOrReadOnly, IsOrderOwner
 )
+from .pagination import CreatedAtCursorPagination
+from .filters import ProductFilterBackend, TieBreakOrderingFilter, parse_date_param
+from .availability import product_availability
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .uploads import add_product_images, use_streaming_upload_handlers
+from .fieldsets import SparseFieldsetViewMixin
+from .db_routers import ReplicaReadMixin
+from .analytics import shop_stats
+
+def local_day_start(day):
+    """
+    Start of `day` in the local time zone, so date filters stay index-friendly range filters.
+    """
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -54,28 +74,40 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             return UserProfile.objects.filter(user=user).select_related('user')
         return UserProfile.objects.none()
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows categories to be viewed or edited.
     Viewing is allowed for anyone. Creating/Editing/Deleting only for admins.
     """
     queryset = Category.objects.all().order_by('name')
     serializer_class = CategorySerializer
+    cache_dependencies = (Category,)
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
-class ShopViewSet(viewsets.ModelViewSet):
+class ShopViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows shops to be viewed or edited.
     - Anyone can list and retrieve shops.
     - Authenticated users can create a shop (if they don't own one already).
     - Only the shop owner or admin can update/delete their shop.
+    - `?fields=` / `?expand=` limit the returned fields (see melar_api/fieldsets.py).
+    - Lists can be sorted with `?ordering=` (e.g. `-total_rentals` for the most rented shops).
     """
-    queryset = Shop.objects.all().select_related('owner').prefetch_related('categories', 'products').order_by('-created_at')
+    queryset = Shop.objects.select_related('owner').prefetch_related('categories').order_by('-created_at')
     serializer_class = ShopSerializer
+    pagination_class = CreatedAtCursorPagination
+    cache_dependencies = (Shop, Category, AppProduct, ProductImage, ProductReview)
+    ordering_fields = ['created_at', 'rating', 'name', 'total_rentals']
+    ordering = ('-created_at', '-id')
+
+    @property
+    def filter_backends(self):
+        # ?ordering= hanya untuk daftar toko; action products/orders memakai paginator yang sama untuk model lain
+        return [TieBreakOrderingFilter] if self.action == 'list' else []
 
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -84,6 +116,13 @@ class ShopViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()] # Logika "hanya satu toko per user" ada di perform_create
         return [permissions.AllowAny()]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Subquery jumlah produk hanya dijalankan jika product_count memang diminta
+        if self.get_fieldset().includes('product_count'):
+            queryset = queryset.with_product_count()
+        return queryset
+
     def perform_create(self, serializer):
         # Memastikan user yang login belum punya toko (karena relasi OneToOneField di Shop.owner)
         if hasattr(self.request.user, 'shop') and self.request.user.shop is not None:
@@ -93,30 +132,113 @@ class ShopViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], url_path='products', permission_classes=[permissions.AllowAny])
     def products(self, request, pk=None):
         """
-        Returns a list of products for a given shop.
+        Returns a paginated list of products for a given shop.
         """
-        shop = self.get_object() # Ini akan menjalankan pemeriksaan permission objek jika ada
-        products = AppProduct.objects.filter(shop=shop).select_related('category').prefetch_related('product_images')
-        serializer = AppProductSerializer(products, many=True, context={'request': request})
-        return Response(serializer.data)
+        return self.cached_response(self._shop_products, request, pk=pk)
 
-class AppProductViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], url_path='stats', permission_classes=[permissions.IsAuthenticated])
+    def stats(self, request, pk=None):
+        """
+        Dashboard statistics of a shop for orders placed between `?from=` and `?to=`
+        (YYYY-MM-DD, inclusive; defaults to the last 30 days, at most 366 days).
+        Only the shop owner or an admin can see them.
+        """
+        shop = self._get_owned_shop(request, pk)
+        # Rollup memakai tanggal lokal (TIME_ZONE) saat order dibuat
+        end_date = parse_date_param(request, 'to', default=timezone.localdate())
+        start_date = parse_date_param(request, 'from', default=end_date - datetime.timedelta(days=29))
+        if end_date < start_date:
+            raise ValidationError({"to": "Must be on or after 'from'."})
+        if (end_date - start_date).days >= 366:
+            raise ValidationError({"to": "The requested range may not exceed 366 days."})
+        return Response(shop_stats(shop, start_date, end_date))
+
+    @action(detail=True, methods=['get'], url_path='orders', permission_classes=[permissions.IsAuthenticated])
+    def orders(self, request, pk=None):
+        """
+        Seller inbox: paginated orders containing this shop's products, newest first.
+        Each order only lists the items of this shop. Filters: `?status=` (comma-separated)
+        and `?from=` / `?to=` (YYYY-MM-DD, order creation date, inclusive).
+        Only the shop owner or an admin can see them.
+        """
+        shop = self._get_owned_shop(request, pk)
+        # Lewat OrderItem.shop (index shop+order), bukan join OrderItem -> produk -> toko
+        orders = RentalOrder.objects.filter(
+            id__in=OrderItem.objects.filter(shop=shop).values('order_id')
+        ).select_related('user').prefetch_related(Prefetch(
+            'items', queryset=OrderItem.objects.filter(shop=shop).select_related('product').prefetch_related('product__product_images')
+        ))
+
+        statuses = request.query_params.get('status')
+        if statuses:
+            statuses = [value.strip() for value in statuses.split(',') if value.strip()]
+            valid = {choice for choice, _ in RentalOrder.STATUS_CHOICES}
+            unknown = [value for value in statuses if value not in valid]
+            if unknown:
+                raise ValidationError({"status": f"Unknown status: {', '.join(unknown)}."})
+            orders = orders.filter(status__in=statuses)
+        start_date = parse_date_param(request, 'from')
+        end_date = parse_date_param(request, 'to')
+        if start_date and end_date and end_date < start_date:
+            raise ValidationError({"to": "Must be on or after 'from'."})
+        if start_date:
+            orders = orders.filter(created_at__gte=local_day_start(start_date))
+        if end_date:
+            orders = orders.filter(created_at__lt=local_day_start(end_date + datetime.timedelta(days=1)))
+
+        page = self.paginate_queryset(orders)
+        serializer = RentalOrderSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    def _get_owned_shop(self, request, pk):
+        shop = generics.get_object_or_404(Shop.objects.only('id', 'owner_id'), pk=pk)
+        if shop.owner_id != request.user.id and not request.user.is_staff:
+            raise PermissionDenied("Only the shop owner can access this.")
+        return shop
+
+    def _shop_products(self, request, pk=None):
+        # Hanya butuh id toko (action ini AllowAny); tidak perlu memuat kategori/relasi toko.
+        # get_object_or_404 milik DRF juga menjawab 404 untuk id yang bukan angka
+        shop = generics.get_object_or_404(Shop.objects.only('id'), pk=pk)
+        products = AppProduct.objects.filter(shop=shop).select_related('shop', 'category').prefetch_related('product_images')
+        products = AppProductSerializer.optimize_queryset(
+            products, AppProductSerializer.get_fieldset(request), keep=self.paginator.ordering
+        )
+        page = self.paginate_queryset(products)
+        serializer = AppProductSerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+class AppProductViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows products to be viewed or edited.
     - Anyone can list and retrieve products.
     - Authenticated shop owners can create products for their shop.
     - Only the shop owner (of the product's shop) or admin can update/delete products.
+    - Lists can be searched/filtered (see ProductFilterBackend) and sorted with `?ordering=`.
+    - `?fields=` / `?expand=` limit the returned fields (see melar_api/fieldsets.py).
     """
-    queryset = AppProduct.objects.all().select_related('shop', 'category').prefetch_related('product_images', 'reviews').order_by('-created_at')
+    queryset = AppProduct.objects.all().select_related('shop', 'category').prefetch_related('product_images').order_by('-created_at')
     serializer_class = AppProductSerializer
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ProductFilterBackend, TieBreakOrderingFilter]
+    ordering_fields = ['price', 'created_at', 'rating', 'name', 'total_individual_rentals']
+    ordering = ('-created_at', '-id')
+    cache_dependencies = (AppProduct, ProductImage, ProductReview, Shop, Category)
 
     def get_permissions(self):
-        if self.action in ['update', 'partial_update', 'destroy']:
+        if self.action in ['update', 'partial_update', 'destroy', 'upload_images']:
             return [permissions.IsAuthenticated(), IsShopOwnerOrReadOnlyForProduct()]
         elif self.action == 'create':
             return [permissions.IsAuthenticated()] # Validasi kepemilikan toko ada di perform_create
         return [permissions.AllowAny()]
 
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs) # Mengisi self.action
+        if self.action in ('create', 'upload_images'):
+            # Harus dipasang sebelum body dibaca (autentikasi/CSRF bisa membaca request.POST)
+            use_streaming_upload_handlers(request)
+        return drf_request
+
     def perform_create(self, serializer):
         shop_id_from_request = self.request.data.get('shop_id') # Ambil dari request.data
         if not shop_id_from_request:
@@ -124,28 +246,57 @@ class AppProductViewSet(viewsets.ModelViewSet):
         try:
             # User hanya bisa membuat produk untuk toko yang mereka miliki
             shop = Shop.objects.get(id=shop_id_from_request, owner=self.request.user)
-            serializer.save(shop=shop)
-            # Untuk handle upload multiple images jika menggunakan field 'uploaded_images' di serializer
-            # uploaded_images_data = self.request.FILES.getlist('uploaded_images')
-            # product_instance = serializer.instance
-            # for image_data in uploaded_images_data:
-            #     ProductImage.objects.create(product=product_instance, image=image_data)
+            serializer.save(shop=shop) # Gambar di field 'uploaded_images' disimpan oleh serializer
 
         except Shop.DoesNotExist:
             raise PermissionDenied("You do not own this shop, the shop does not exist, or shop_id is incorrect.")
         except ValueError: # Jika shop_id tidak valid (bukan integer)
              raise ValidationError({"shop_id": "Invalid Shop ID format."})
 
+    @action(detail=True, methods=['post'], url_path='images')
+    def upload_images(self, request, pk=None):
+        """
+        Adds several images to a product in one multipart request: repeat the `images` field
+        once per file, optionally with matching `alt_texts`. New images are ordered after
+        the existing ones.
+        """
+        product = self.get_object() # Memeriksa kepemilikan toko lewat has_object_permission
+        serializer = ProductImageUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        images = add_product_images(
+            product, serializer.validated_data['images'], serializer.validated_data['alt_texts']
+        )
+        return Response(
+            ProductImageSerializer(images, many=True, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['get'], url_path='availability', permission_classes=[permissions.AllowAny])
+    def availability(self, request, pk=None):
+        """
+        Returns booked and free date ranges of a product between `?from=` and `?to=`
+        (YYYY-MM-DD, inclusive). Defaults to the next 60 days; at most 366 days per request.
+        """
+        product = generics.get_object_or_404(AppProduct.objects.only('id', 'stock_quantity'), pk=pk)
+        start_date = parse_date_param(request, 'from', default=datetime.date.today())
+        end_date = parse_date_param(request, 'to', default=start_date + datetime.timedelta(days=59))
+        if end_date < start_date:
+            raise ValidationError({"to": "Must be on or after 'from'."})
+        if (end_date - start_date).days >= 366:
+            raise ValidationError({"to": "The requested range may not exceed 366 days."})
+        return Response(product_availability(product.id, start_date, end_date, product.stock_quantity))
+
 
-class ProductReviewViewSet(viewsets.ModelViewSet):
+class ProductReviewViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for product reviews.
     - Anyone can list and retrieve reviews.
     - Authenticated users can create reviews.
     - Only the review author or admin can update/delete their review.
     """
-    queryset = ProductReview.objects.all().select_related('product', 'user').order_by('-created_at')
+    queryset = ProductReview.objects.all().select_related('user').order_by('-created_at')
     serializer_class = ProductReviewSerializer
+    pagination_class = CreatedAtCursorPagination
 
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -178,7 +329,7 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(product_id=product_id)
         return queryset
 
-class RentalOrderViewSet(viewsets.ModelViewSet):
+class RentalOrderViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for rental orders.
     - Authenticated users can create orders.
@@ -187,6 +338,9 @@ class RentalOrderViewSet(viewsets.ModelViewSet):
     """
     queryset = RentalOrder.objects.all().select_related('user').prefetch_related('items', 'items__product', 'items__product__product_images').order_by('-created_at')
     serializer_class = RentalOrderSerializer
+    pagination_class = CreatedAtCursorPagination
+    fieldset_keep = ('user', 'status') # Dibaca oleh IsOrderOwner dan cancel_order
+    BULK_TRANSITION_LIMIT = 500 # Maksimum id per request bulk-transition
 
     def get_permissions(self):
         if self.action in ['retrieve', 'update', 'partial_update', 'destroy', 'cancel_order']:
@@ -195,6 +349,8 @@ class RentalOrderViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         elif self.action == 'list': # Hanya admin yang boleh list semua order
             return [permissions.IsAdminUser()]
+        elif self.action in ['transition', 'bulk_transition']: # Perubahan status oleh admin/operasional
+            return [permissions.IsAdminUser()]
         # Default, user harus terautentikasi, get_queryset akan memfilter lebih lanjut
         return [permissions.IsAuthenticated()]
 
@@ -217,20 +373,74 @@ class RentalOrderViewSet(viewsets.ModelViewSet):
         Allows the order owner or an admin to cancel an order if its status permits.
         """
         order = self.get_object() # Permission IsOrderOwner sudah dicek di sini
+        return self._transition_response(order, 'cancelled')
 
-        if order.status not in ['pending', 'confirmed']:
+    @action(detail=True, methods=['post'], url_path='transition')
+    def transition(self, request, pk=None):
+        """
+        Moves one order to `status` if RentalOrder.STATUS_TRANSITIONS allows it (admin only).
+        """
+        target = self._target_status(request)
+        return self._transition_response(self.get_object(), target)
+
+    @action(detail=False, methods=['post'], url_path='bulk-transition')
+    def bulk_transition(self, request):
+        """
+        Moves the orders in `ids` to `status` with one conditional UPDATE per previous status (admin only).
+        Orders whose current status does not allow the move are reported in `skipped`.
+        """
+        target = self._target_status(request)
+        ids = request.data.get('ids')
+        # bool adalah subclass int: true/false di JSON bukan id order
+        if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            raise ValidationError({'ids': 'Provide a non-empty list of order ids.'})
+        if len(ids) > self.BULK_TRANSITION_LIMIT:
+            raise ValidationError({'ids': f'At most {self.BULK_TRANSITION_LIMIT} orders per request.'})
+        changed = RentalOrder.objects.filter(pk__in=ids).transition(target)
+        return Response({
+            'status': target,
+            'updated': sorted(changed),
+            'skipped': sorted(set(ids) - set(changed)),
+        })
+
+    def _target_status(self, request):
+        target = request.data.get('status')
+        if target not in dict(RentalOrder.STATUS_CHOICES):
+            raise ValidationError({'status': f'Unknown order status "{target}".'})
+        return target
+
+    def _transition_response(self, order, target):
+        # Satu UPDATE bersyarat (WHERE status IN ...): dua request yang berlomba tidak bisa
+        # sama-sama lolos dari status yang sudah dibaca sebelumnya
+        if not RentalOrder.objects.filter(pk=order.pk).transition(target):
+            order.refresh_from_db(fields=['status'])
+            verb = 'cancelled' if target == 'cancelled' else f'moved to "{target}"'
             return Response(
-                {'detail': f'Order with status "{order.status}" cannot be cancelled.'},
+                {'detail': f'Order with status "{order.status}" cannot be {verb}.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        order.status = 'cancelled'
-        # Logika tambahan seperti mengembalikan ketersediaan produk bisa ditambahkan di sini
-        # for item in order.items.all():
-        #     product = item.product
-        #     product.available = True # atau logika penambahan stok
-        #     product.save()
-        order.save()
-        return Response(RentalOrderSerializer(order, context={'request': request}).data)
+        order.refresh_from_db(fields=['status', 'updated_at'])
+        return Response(RentalOrderSerializer(order, context={'request': self.request}).data)
+
+
+class ReservationHoldViewSet(mixins.ListModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Checkout holds of the current user (see melar_api/holds.py).
+    - POST {"items": [...]} holds the whole cart (all or nothing) and replaces earlier holds.
+    - GET lists the active holds; DELETE /{id}/ releases one early.
+    """
+    serializer_class = ReservationHoldSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None # Hanya isi satu keranjang
+
+    def get_queryset(self):
+        return ReservationHold.objects.active().filter(user=self.request.user).order_by('created_at', 'id')
+
+    def create(self, request, *args, **kwargs):
+        serializer = CheckoutHoldSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        holds = serializer.save()
+        return Response(self.get_serializer(holds, many=True).data, status=status.HTTP_201_CREATED)
 
 # ViewSet untuk ProductImage dan OrderItem biasanya tidak diekspos langsung
 # karena dikelola melalui model induknya (AppProduct dan RentalOrder).
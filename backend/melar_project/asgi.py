@@ -2,6 +2,8 @@
 ASGI config for melar_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with any ASGI server (e.g. ``uvicorn melar_project.asgi:application``); the async
+catalog endpoints under /api/v1/async/ then run without holding a worker thread per request.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -4,6 +4,7 @@ Django settings for melar_project project.
 
 from pathlib import Path
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -34,6 +35,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'melar_api.profiling.ProfilingMiddleware', # Tidak terpasang kecuali MELAR_PROFILING=1
+    'melar_api.metrics.MetricsMiddleware', # Metrik Prometheus di /metrics
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +74,32 @@ DATABASES = {
     }
 }
 
+# Profil SQLite produksi (opt-in): WAL + PRAGMA per koneksi (melar_api/sqlite.py), koneksi persisten,
+# dan BEGIN IMMEDIATE agar penulis antre lewat busy_timeout alih-alih gagal "database is locked".
+SQLITE_PROFILE = os.environ.get('MELAR_SQLITE_PROFILE', 'default')
+MELAR_SQLITE = {'ENABLED': SQLITE_PROFILE == 'production'}
+if SQLITE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('MELAR_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    })
+    MELAR_SQLITE['PRAGMAS'] = {
+        'busy_timeout': int(os.environ.get('MELAR_SQLITE_BUSY_TIMEOUT', 20000)),
+        'mmap_size': int(os.environ.get('MELAR_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': int(os.environ.get('MELAR_SQLITE_CACHE_SIZE', -64 * 1024)),
+    }
+
+# Replika baca untuk viewset katalog (melar_api/db_routers.py). Untuk SQLite cukup daftar path salinan
+# database: MELAR_SQLITE_REPLICAS=/data/replica1.sqlite3,/data/replica2.sqlite3. Alias lain (mis. replika
+# Postgres) bisa ditambahkan ke DATABASES lalu namanya dimasukkan ke MELAR_READ_REPLICAS.
+MELAR_READ_REPLICAS = []
+for index, name in enumerate(filter(None, os.environ.get('MELAR_SQLITE_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': name.strip(), 'TEST': {'MIRROR': 'default'}}
+    MELAR_READ_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['melar_api.db_routers.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -90,7 +119,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'melar_api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
@@ -101,6 +130,94 @@ REST_FRAMEWORK = {
     ) + (('rest_framework.renderers.BrowsableAPIRenderer',) if DEBUG else ()),
 }
 
+# Cache: version stamp cache katalog (melar_api/cache.py) dan cache token (melar_api/authentication.py)
+# harus terlihat oleh semua worker; cache per proses membuat worker lain tetap melayani respons basi dan
+# token yang sudah dicabut. Default: cache berbasis file yang dipakai bersama semua worker di satu mesin
+# (MELAR_CACHE_DIR). Untuk beberapa mesin set MELAR_REDIS_URL. MELAR_CACHE_BACKEND=locmem hanya untuk
+# deployment satu proses (mis. runserver tanpa worker lain).
+MELAR_SINGLE_PROCESS = os.environ.get('MELAR_CACHE_BACKEND') == 'locmem'
+if os.environ.get('MELAR_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['MELAR_REDIS_URL'],
+        }
+    }
+elif MELAR_SINGLE_PROCESS:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'melar',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('MELAR_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'melar-cache')),
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('MELAR_CACHE_MAX_ENTRIES', 10000))},
+        }
+    }
+# `manage.py test` memakai cache local-memory sendiri, bukan cache di atas (melar_project/test_runner.py)
+TEST_RUNNER = 'melar_project.test_runner.MelarTestRunner'
+
+# Cache respons katalog untuk user anonim (lihat melar_api/cache.py)
+MELAR_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('MELAR_RESPONSE_CACHE', 'True') == 'True',
+    'TIMEOUT': int(os.environ.get('MELAR_RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
+# Cache lookup token untuk CachedTokenAuthentication (detik)
+MELAR_AUTH_CACHE = {
+    'TTL': int(os.environ.get('MELAR_AUTH_CACHE_TTL', 300)),
+}
+
+# Ukuran halaman untuk cursor pagination di melar_api (lihat melar_api/pagination.py)
+MELAR_PAGINATION = {
+    'PAGE_SIZE': int(os.environ.get('MELAR_PAGE_SIZE', 20)),
+    'MAX_PAGE_SIZE': int(os.environ.get('MELAR_MAX_PAGE_SIZE', 100)),
+}
+
+# Lama hold stok sejak checkout dimulai (melar_api/holds.py), dalam detik
+MELAR_HOLDS = {
+    'TTL': int(os.environ.get('MELAR_HOLD_TTL', 15 * 60)),
+}
+
+# Counter rental produk/toko (melar_api/counters.py). FLUSH_INTERVAL > 0 menampung selisih di memori
+# lalu menulisnya per batch; jalankan reconcile_rental_counters secara berkala untuk memperbaiki selisih yang hilang.
+MELAR_RENTAL_COUNTERS = {
+    'FLUSH_INTERVAL': float(os.environ.get('MELAR_RENTAL_COUNTER_FLUSH_INTERVAL', 0)),
+}
+
+# Profiling per request (melar_api/profiling.py): header Server-Timing + log JSON untuk sebagian request
+MELAR_PROFILING = {
+    'ENABLED': os.environ.get('MELAR_PROFILING', '0') == '1',
+    'SAMPLE_RATE': float(os.environ.get('MELAR_PROFILING_SAMPLE_RATE', 0.01)),
+}
+
+# Metrik Prometheus (melar_api/metrics.py), dibaca dengan MELAR_METRICS_TOKEN atau sesi staf. Dengan beberapa worker, set MELAR_METRICS_DIR ke direktori
+# lokal yang dikosongkan saat start agar /metrics menjumlahkan semua worker.
+MELAR_METRICS = {
+    'ENABLED': os.environ.get('MELAR_METRICS', '1') == '1',
+    'DIR': os.environ.get('MELAR_METRICS_DIR') or None,
+    'TOKEN': os.environ.get('MELAR_METRICS_TOKEN') or None,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'melar_api.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Thumbnail WebP/JPEG untuk gambar produk dan toko (lihat melar_api/thumbnails.py)
+MELAR_THUMBNAILS = {
+    'WORKERS': int(os.environ.get('MELAR_THUMBNAIL_WORKERS', 2)),
+    'QUALITY': int(os.environ.get('MELAR_THUMBNAIL_QUALITY', 80)),
+}
+
 REST_AUTH = {
     'REGISTER_SERIALIZER': 'melar_api.serializers.CustomRegisterSerializer',
     'USER_DETAILS_SERIALIZER': 'melar_api.serializers.UserSerializer',
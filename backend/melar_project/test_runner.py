@@ -0,0 +1,31 @@
+"""
+Test runner proyek (settings.TEST_RUNNER).
+
+Cache default di luar test adalah cache berbasis file di direktori tmp yang dipakai bersama
+(lihat CACHES di settings), sedangkan test memanggil cache.clear(). Agar test tidak menghapus
+cache server yang sedang berjalan (atau run test lain), setiap run memakai cache local-memory
+miliknya sendiri sebagai deployment satu proses.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'melar-tests',
+    }
+}
+
+
+class MelarTestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that gives every test run its own process-local cache.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_override = override_settings(CACHES=TEST_CACHES, MELAR_SINGLE_PROCESS=True)
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -18,12 +18,14 @@ from django.contrib import admin
 from django.urls import path, include # Pastikan include diimpor
 from django.conf import settings # Untuk menyajikan file media di development
 from django.conf.urls.static import static # Untuk menyajikan file media di development
+from melar_api.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include('melar_api.urls')), # Menggunakan v1 untuk versioning API (opsional tapi baik)
     path('api/v1/auth/', include('dj_rest_auth.urls')),
     path('api/v1/auth/registration/', include('dj_rest_auth.registration.urls')),
+    path('metrics', metrics_view, name='metrics'), # Scrape endpoint Prometheus
 ]
 
 if settings.DEBUG: